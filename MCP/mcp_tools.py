@@ -1,17 +1,45 @@
-from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools
+import os
 from pathlib import Path
+from typing import Dict, List
+
+from autogen_ext.tools.mcp import (
+    SseServerParams,
+    StdioServerParams,
+    StreamableHttpServerParams,
+    mcp_server_tools,
+)
 
 # Dynamically compute the absolute path to MCP server
 PATH_TO_MCP_SERVER_SCRIPT = str((Path(__file__).parent / "server.py").resolve())
 
+# URL of a long-lived server started with `python MCP/server.py --transport http` (or sse).
+# When unset, a stdio server subprocess is spawned for each agent as before.
+MCP_SERVER_URL_ENV = "SURVEY_INSIGHT_MCP_URL"
+
+# Tool adapters per server URL; each tool call opens its own short HTTP session, so the
+# adapters can be shared between agents and the tool listing is only fetched once.
+_remote_tools: Dict[str, List] = {}
+
+
+def get_server_params(url: str = None):
+    url = url or os.getenv(MCP_SERVER_URL_ENV)
+    if not url:
+        return StdioServerParams(
+            command='python3',
+            args=[PATH_TO_MCP_SERVER_SCRIPT],
+            read_timeout_seconds=400
+        )
+    if url.rstrip("/").endswith("/sse"):
+        return SseServerParams(url=url, timeout=30, sse_read_timeout=400)
+    return StreamableHttpServerParams(url=url, timeout=30, sse_read_timeout=400)
 
 
-async def get_SurveyInsight_mcp_tools():
-    params = StdioServerParams(
-        command='python3',
-        args=[PATH_TO_MCP_SERVER_SCRIPT],
-        read_timeout_seconds=400
-      
-    )
+async def get_SurveyInsight_mcp_tools(url: str = None):
+    url = url or os.getenv(MCP_SERVER_URL_ENV)
+    if url and url in _remote_tools:
+        return _remote_tools[url]
+    params = get_server_params(url)
     mcp_tools = await mcp_server_tools(server_params=params)
-    return mcp_tools
\ No newline at end of file
+    if url:
+        _remote_tools[url] = mcp_tools
+    return mcp_tools
@@ -1,3 +1,4 @@
+import argparse
 import sys
 from pathlib import Path
 
@@ -12,7 +13,8 @@ load_dotenv()
 from tools.topics_extraction import TopicExtraction
 from tools.topic_clustering import TopicClustering
 from tools.cluster_labelling import ClusterLabelling
-from tools.business_insight import businessInsight
+from tools.business_insight import businessInsight, warm_render_pool
+from tools.insight_index import queryInsights
 
 
 mcp = FastMCP("SurveyInsight MCP Server")
@@ -22,7 +24,32 @@ mcp.tool(TopicExtraction)
 mcp.tool(TopicClustering)
 mcp.tool(ClusterLabelling)
 mcp.tool(businessInsight)
+mcp.tool(queryInsights)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SurveyInsight MCP server")
+    parser.add_argument(
+        "--transport",
+        default="stdio",
+        choices=["stdio", "http", "sse"],
+        help="stdio (spawned per agent) or http / sse (long-lived local service)",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default=None, help="endpoint path (default /mcp for http, /sse for sse)")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    args = parse_args()
+    if args.transport == "stdio":
+        mcp.run()
+    else:
+        # Long-lived service: start the plot workers now so the first businessInsight call
+        # doesn't pay for spawning them. Tool calls from several agents run concurrently on
+        # the server's event loop; CPU-heavy steps already run off-loop in threads/processes.
+        # The cluster model and embedding store default to cache/ next to each call's files, so
+        # clients writing to different directories (e.g. job workspaces) never share a model.
+        warm_render_pool()
+        mcp.run(transport=args.transport, host=args.host, port=args.port, path=args.path)
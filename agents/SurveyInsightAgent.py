@@ -5,11 +5,6 @@ from models.openai_model_client import get_model_client
 from MCP.mcp_tools import get_SurveyInsight_mcp_tools
 from dotenv import load_dotenv
 
-from tools.topics_extraction import TopicExtraction
-from tools.topic_clustering import TopicClustering
-from tools.cluster_labelling import ClusterLabelling
-from tools.business_insight import businessInsight
-
 async def getSurveyInsightAgent():
     model_client= get_model_client()
     SurveyInsight_mcp_tools = await get_SurveyInsight_mcp_tools()
@@ -20,7 +15,6 @@ async def getSurveyInsightAgent():
         description = " an agent that is to run a 4-step, end-to-end pipeline that converts raw customer survey CSV data into an enriched, analytics-ready CSV and a concise set of decision-ready insights for senior leadership ",
         system_message= SurveyInsightAgent_message,
         tools=SurveyInsight_mcp_tools,
-        # tools=[TopicExtraction, TopicClustering, ClusterLabelling, businessInsight],
         reflect_on_tool_use=True
         )
     return survey_insight_agent
@@ -0,0 +1,204 @@
+"""
+Benchmark: the four pipeline tools end to end against the local mock OpenAI server.
+
+Generates (or reads) a survey CSV, starts benchmarks/mock_openai.py in a subprocess with the
+requested latency / error rate, points the OpenAI clients at it and runs TopicExtraction ->
+TopicClustering -> ClusterLabelling -> businessInsight into `--work-dir`. For every step it
+reports wall time, peak resident memory (sampled) and the step's own counters; the mock's
+request counts are printed at the end. Nothing under data/ is touched unless --work-dir
+points there, and no real API calls are made.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_pipeline --rows 10000 --latency-ms 300 --max-concurrency 32
+    python -m benchmarks.bench_pipeline --rows 100000 --batch-size 20 --json-out bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_surveys import generate_surveys
+from tools.metrics import METRICS_DIR_ENV
+
+
+def _rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class PeakMemory:
+    """Samples RSS in a background thread while a step runs."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.start_mb = self.peak_mb = _rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+
+    def __enter__(self) -> "PeakMemory":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+async def timed(fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    with PeakMemory() as mem:
+        start = time.perf_counter()
+        result = await fn()
+        elapsed = time.perf_counter() - start
+    return result, {
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(mem.peak_mb, 1),
+        "rss_growth_mb": round(mem.peak_mb - mem.start_mb, 1),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(latency_ms: float, jitter_ms: float, error_rate: float, dim: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_openai", "--port", str(port), "--latency-ms", str(latency_ms),
+         "--jitter-ms", str(jitter_ms), "--error-rate", str(error_rate), "--dim", str(dim)],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/v1"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=1).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("mock OpenAI server did not start")
+
+
+async def run_steps(args: argparse.Namespace, input_csv: str) -> Dict[str, Dict[str, Any]]:
+    # Imported after the environment points the clients at the mock.
+    from tools.business_insight import businessInsight
+    from tools.cluster_labelling import ClusterLabelling
+    from tools.topic_clustering import TopicClustering
+    from tools.topics_extraction import TopicExtraction
+
+    work = Path(args.work_dir)
+    cache_path = str(work / "cache" / "llm_cache.sqlite")
+    model_dir = str(work / "cache" / "cluster_model")
+    topics_csv, clusters_csv, output_csv = (str(work / f) for f in ("df_with_topics.csv", "df_with_clusters.csv", "output.csv"))
+
+    steps = {
+        "TopicExtraction": lambda: TopicExtraction(
+            input_csv_path=input_csv, output_csv_path=topics_csv, max_concurrency=args.max_concurrency,
+            use_cache=args.use_cache, cache_path=cache_path, batch_size=args.batch_size, file_format=args.format,
+        ),
+        "TopicClustering": lambda: TopicClustering(
+            input_csv_path=topics_csv, output_csv_path=clusters_csv, num_clusters=args.num_clusters,
+            embedding_store_dir=str(work / "cache" / "embeddings"), model_dir=model_dir,
+            max_concurrency=args.max_concurrency, file_format=args.format,
+        ),
+        "ClusterLabelling": lambda: ClusterLabelling(
+            input_csv_path=clusters_csv, output_csv_path=output_csv, model_dir=model_dir,
+            max_concurrency=args.max_concurrency, use_cache=args.use_cache, cache_path=cache_path,
+            file_format=args.format,
+        ),
+        "businessInsight": lambda: businessInsight(
+            input_csv_path=output_csv, file_format=args.format, output_dir=str(work / "plots"),
+        ),
+    }
+    report: Dict[str, Dict[str, Any]] = {}
+    for name, step in steps.items():
+        result, measured = await timed(step)
+        counters = {k: v for k, v in result.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        step_metrics = result.get("metrics", {})
+        if step_metrics.get("llm_calls"):
+            counters.update({
+                "llm_p50_s": step_metrics["llm_latency_s"]["p50"],
+                "llm_p95_s": step_metrics["llm_latency_s"]["p95"],
+                "prompt_tokens": step_metrics["prompt_tokens"],
+                "completion_tokens": step_metrics["completion_tokens"],
+                "retries": step_metrics["retries"],
+            })
+        report[name] = {**measured, **counters}
+        print(f"{name:17s} {measured['seconds']:9.2f}s  peak RSS {measured['peak_rss_mb']:8.1f} MB"
+              f"  (+{measured['rss_growth_mb']:.1f})  {json.dumps(counters)}", flush=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="synthetic rows to generate")
+    parser.add_argument("--input", default=None, help="use this survey CSV instead of generating one")
+    parser.add_argument("--unique-fraction", type=float, default=0.2)
+    parser.add_argument("--work-dir", default="data/bench/run")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dim", type=int, default=256, help="mock embedding dimensions")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--num-clusters", type=int, default=12)
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--use-cache", action="store_true", help="keep the LLM cache between runs")
+    parser.add_argument("--json-out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    work = Path(args.work_dir)
+    work.mkdir(parents=True, exist_ok=True)
+    input_csv = args.input
+    if input_csv is None:
+        input_csv = str(work / f"input_{args.rows}.csv")
+        if not Path(input_csv).exists():
+            generate_surveys(args.rows, unique_fraction=args.unique_fraction).to_csv(input_csv, index=False)
+
+    proc, url = start_mock(args.latency_ms, args.jitter_ms, args.error_rate, args.dim)
+    os.environ.update({"OPENAI_BASE_URL": url, "OPENAI_API_KEY": "mock", "OPENAI_EMBEDDING_API_KEY": "mock"})
+    # Step metrics of mock runs go to the work dir, not over the real data/metrics scrape output.
+    os.environ[METRICS_DIR_ENV] = str(work / "metrics")
+    try:
+        print(f"input={input_csv}  mock={url}  latency={args.latency_ms:g}±{args.jitter_ms:g}ms  "
+              f"errors={args.error_rate:g}  concurrency={args.max_concurrency}  batch_size={args.batch_size}")
+        start = time.perf_counter()
+        report = asyncio.run(run_steps(args, input_csv))
+        total = time.perf_counter() - start
+        mock_stats = json.loads(urllib.request.urlopen(f"{url}/stats", timeout=5).read())
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"{'total':17s} {total:9.2f}s")
+    print(f"mock requests: {json.dumps(mock_stats)}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "steps": report, "total_seconds": round(total, 3), "mock": mock_stats}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: MCP server start-up (cold process -> tool list available).
+
+Measures, over several fresh interpreter processes:
+  - import : time to import MCP/server.py (tools registered, nothing run yet), and which
+             heavy dependencies were loaded by that import (they should load on first use);
+  - ready  : time from spawning `python MCP/server.py` over stdio to `list_tools()` returning.
+
+The slowest imports from `python -X importtime` are listed so regressions can be traced.
+Exits non-zero if a heavy dependency is imported at start-up or the median ready time
+exceeds --max-ready.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_startup --repeat 5 --max-ready 3.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).parent.parent
+SERVER_SCRIPT = ROOT / "MCP" / "server.py"
+
+# Dependencies that must only be imported when a tool needs them.
+LAZY_MODULES = ("sklearn", "matplotlib", "autogen_ext", "autogen_core", "openai")
+
+_IMPORT_PROBE = """
+import json, runpy, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+runpy.run_path({script!r}, run_name="bench_startup")
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import() -> Dict:
+    code = _IMPORT_PROBE.format(root=str(ROOT), script=str(SERVER_SCRIPT), lazy=LAZY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+async def _ready_once() -> Tuple[float, int]:
+    from fastmcp import Client
+    from fastmcp.client.transports import PythonStdioTransport
+
+    with open(os.devnull, "w") as server_log:
+        transport = PythonStdioTransport(str(SERVER_SCRIPT), cwd=str(ROOT), log_file=server_log)
+        start = time.perf_counter()
+        async with Client(transport) as client:
+            tools = await client.list_tools()
+        return time.perf_counter() - start, len(tools)
+
+
+def slowest_imports(top: int) -> List[Tuple[int, str]]:
+    """Cumulative import time (ms) of the slowest top-level packages imported by the server."""
+    code = f"import runpy, sys; sys.path.insert(0, {str(ROOT)!r}); runpy.run_path({str(SERVER_SCRIPT)!r}, run_name='bench_startup')"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    totals: Dict[str, int] = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("  ") or not cumulative.strip().isdigit():
+            continue  # nested import; already counted in its parent
+        totals[name.strip()] = int(cumulative) // 1000
+    return sorted(((ms, name) for name, ms in totals.items()), reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    parser.add_argument("--max-ready", type=float, default=None, help="fail if median ready time exceeds this (s)")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.repeat)]
+    ready = [asyncio.run(_ready_once()) for _ in range(args.repeat)]
+    import_s = statistics.median(r["seconds"] for r in imports)
+    ready_s = statistics.median(r[0] for r in ready)
+    loaded = sorted({m for r in imports for m in r["loaded"]})
+
+    print(f"import : median {import_s:6.2f}s over {args.repeat} runs")
+    print(f"ready  : median {ready_s:6.2f}s over {args.repeat} runs ({ready[0][1]} tools listed)")
+    print("slowest imports at start-up:")
+    for ms, name in slowest_imports(args.top):
+        print(f"  {ms:6d} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at start-up but should be lazy: {', '.join(loaded)}")
+        failed = True
+    if args.max_ready is not None and ready_s > args.max_ready:
+        print(f"FAIL: ready time {ready_s:.2f}s exceeds --max-ready {args.max_ready:.2f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Local stand-in for the OpenAI chat-completions and embeddings endpoints (stdlib only).
+
+Replies are deterministic and shaped like the real API, so the tools run unchanged with
+OPENAI_BASE_URL pointed here:
+  - topic extraction (single and batched), cluster labels and the executive summary are
+    answered from the prompt with keyword heuristics;
+  - embeddings are hashed bag-of-words vectors, so topics sharing words land close together.
+
+Latency (`--latency-ms` +/- `--jitter-ms`) and an error rate (`--error-rate`, answered with
+429 or 500) are configurable to exercise concurrency and retry paths. With `--rpm-limit` /
+`--tpm-limit`, each endpoint also enforces a continuously replenished per-minute quota: replies
+carry the OpenAI x-ratelimit-* headers and requests over the quota get a 429.
+GET /stats returns request counters.
+
+Usage (from the repo root):
+    python -m benchmarks.mock_openai --port 8799 --latency-ms 300 --error-rate 0.02
+    export OPENAI_BASE_URL=http://127.0.0.1:8799/v1 OPENAI_API_KEY=mock OPENAI_EMBEDDING_API_KEY=mock
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Keyword -> topic phrase used for extraction replies.
+TOPIC_KEYWORDS = [
+    ("billing", "Billing errors"),
+    ("charge", "Incorrect charges"),
+    ("premium", "Unexpected premium increase"),
+    ("refund", "Delayed refunds"),
+    ("claim", "Slow claim processing"),
+    ("missing item", "Missing items"),
+    ("wrong item", "Wrong items delivered"),
+    ("renewal", "Policy renewal issues"),
+    ("login", "App login problems"),
+    ("website", "Website reliability issues"),
+    ("online", "Online service problems"),
+    ("address", "Account update failures"),
+    ("wording", "Confusing policy wording"),
+    ("hold", "Long phone hold times"),
+    ("card", "Membership card issues"),
+    ("branch", "Poor branch service"),
+    ("escalation", "No escalation process"),
+    ("call", "No follow-up calls"),
+    ("transferred", "Repeated transfers between teams"),
+    ("communication", "Unclear support communication"),
+    ("conflicting", "Inconsistent information from staff"),
+    ("unresolved", "Unresolved issues"),
+    ("slow", "Slow resolution times"),
+    ("friendly", "Helpful friendly staff"),
+    ("quickly", "Fast issue resolution"),
+]
+NEGATIVE = ("frustrat", "not great", "unresolved", "no proper", "confusing", "worse", "switching", "inconvenience")
+POSITIVE = ("pleased", "satisfied", "friendly", "clearly", "thanks", "fixed it")
+
+
+def _extract(text: str) -> Dict[str, Any]:
+    lower = text.lower()
+    topics = [topic for key, topic in TOPIC_KEYWORDS if key in lower][:4]
+    if len(topics) < 2:
+        topics.append(" ".join(text.split()[:4]).strip(".,") or "General feedback")
+    neg = sum(k in lower for k in NEGATIVE)
+    pos = sum(k in lower for k in POSITIVE)
+    sentiment = "Negative" if neg > pos else "Positive" if pos > neg else "Neutral"
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+    return {
+        "topics": topics,
+        "supporting_quote": (sentences[0] if sentences else text)[:160],
+        "reason": f"The customer mentions {topics[0].lower()}.",
+        "sentiment": sentiment,
+    }
+
+
+def chat_reply(messages: List[Dict[str, Any]]) -> str:
+    system = str(messages[0].get("content", "")) if messages else ""
+    user = str(messages[-1].get("content", "")) if messages else ""
+    if "theme label" in system:
+        sample = user.split(":", 1)[-1].split(";")[0].strip()
+        return json.dumps({"label": sample.title()[:60] or "General Feedback"})
+    if '"results"' in system and "Responses:" in user:
+        items = json.loads(user.split("Responses:", 1)[1])
+        return json.dumps({"results": [{"survey_id": it["survey_id"], **_extract(it["text"])} for it in items]})
+    if "Text:" in user:
+        return json.dumps(_extract(user.split("Text:", 1)[1].strip()))
+    return "Executive summary (mock): the top themes are listed in the supplied facts."
+
+
+_word_vectors: Dict[str, np.ndarray] = {}
+_word_lock = threading.Lock()
+
+
+def embed(text: str, dim: int) -> np.ndarray:
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()) or [text]:
+        with _word_lock:
+            wv = _word_vectors.get(word)
+            if wv is None:
+                seed = int(hashlib.md5(word.encode()).hexdigest()[:8], 16)
+                wv = _word_vectors[word] = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+        vec += wv
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _request_tokens(request: Dict[str, Any]) -> int:
+    if "messages" in request:
+        return sum(_tokens(str(m.get("content", ""))) for m in request["messages"])
+    inputs = request.get("input", [])
+    return sum(_tokens(str(t)) for t in ([inputs] if isinstance(inputs, str) else inputs))
+
+
+class MockState:
+    def __init__(
+        self,
+        latency_ms: float,
+        jitter_ms: float,
+        error_rate: float,
+        dim: int,
+        seed: int = 0,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.dim = dim
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, Dict[str, float]] = {}  # endpoint -> requests / tokens left
+        self.stats = {"chat": 0, "embeddings": 0, "embedded_inputs": 0, "errors": 0, "rate_limited": 0}
+
+    def admit(self, endpoint: str, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """Take a request from the endpoint's per-minute quota; returns (admitted, x-ratelimit-* headers)."""
+        if not (self.rpm_limit or self.tpm_limit):
+            return True, {}
+        now = time.monotonic()
+        with self.lock:
+            limits = {"requests": self.rpm_limit, "tokens": self.tpm_limit}
+            need = {"requests": 1, "tokens": tokens}
+            buckets = self.buckets.setdefault(endpoint, {"requests": float(self.rpm_limit), "tokens": float(self.tpm_limit), "at": now})
+            # Like the real API, the quota replenishes continuously up to the per-minute limit.
+            for unit, limit in limits.items():
+                buckets[unit] = min(limit, buckets[unit] + (now - buckets["at"]) * limit / 60.0)
+            buckets["at"] = now
+            admitted = all(not limit or buckets[unit] >= min(need[unit], limit) for unit, limit in limits.items())
+            if admitted:
+                for unit, limit in limits.items():
+                    buckets[unit] -= need[unit] if limit else 0
+            else:
+                self.stats["rate_limited"] += 1
+            headers = {}
+            for unit, limit in limits.items():
+                if limit:
+                    headers[f"x-ratelimit-limit-{unit}"] = str(limit)
+                    headers[f"x-ratelimit-remaining-{unit}"] = str(max(0, int(buckets[unit])))
+                    headers[f"x-ratelimit-reset-{unit}"] = f"{(limit - buckets[unit]) * 60.0 / limit:.3f}s"
+        return admitted, headers
+
+    def delay(self) -> float:
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self) -> int:
+        with self.lock:
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return self.rng.choice((429, 500))
+        return 0
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += n
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args) -> None:
+            pass
+
+        rate_headers: Dict[str, str] = {}
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in {**self.rate_headers, **(headers or {})}.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/").endswith("/stats"):
+                with state.lock:
+                    self._send(200, dict(state.stats))
+            else:
+                self._send(200, {"status": "ok"})
+
+        def do_POST(self) -> None:
+            self.rate_headers = {}
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(state.delay())
+            status = state.should_fail()
+            if status:
+                kind = "rate_limit_exceeded" if status == 429 else "server_error"
+                self._send(status, {"error": {"message": f"mock {kind}", "type": kind, "code": kind}}, {"Retry-After": "0"})
+                return
+            endpoint = "chat" if self.path.endswith("/chat/completions") else "embeddings" if self.path.endswith("/embeddings") else None
+            if endpoint is None:
+                self._send(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+                return
+            admitted, self.rate_headers = state.admit(endpoint, _request_tokens(request))
+            if not admitted:
+                kind = "rate_limit_exceeded"
+                self._send(429, {"error": {"message": f"mock {kind}", "type": "requests", "code": kind}})
+                return
+            if endpoint == "chat":
+                self._chat(request)
+            else:
+                self._embeddings(request)
+
+        def _chat(self, request: Dict[str, Any]) -> None:
+            state.count("chat")
+            messages = request.get("messages", [])
+            content = chat_reply(messages)
+            prompt_tokens = sum(_tokens(str(m.get("content", ""))) for m in messages)
+            completion_tokens = _tokens(content)
+            self._send(200, {
+                "id": f"chatcmpl-mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+        def _embeddings(self, request: Dict[str, Any]) -> None:
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+            state.count("embeddings")
+            state.count("embedded_inputs", len(inputs))
+            as_base64 = request.get("encoding_format") == "base64"
+            data = []
+            for i, text in enumerate(inputs):
+                vec = embed(str(text), state.dim)
+                value = base64.b64encode(vec.astype("<f4").tobytes()).decode() if as_base64 else vec.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": value})
+            tokens = sum(_tokens(str(t)) for t in inputs)
+            self._send(200, {
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "mock"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+    return Handler
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    dim: int = 256,
+    rpm_limit: int = 0,
+    tpm_limit: int = 0,
+) -> ThreadingHTTPServer:
+    """A ready-to-serve mock; `port=0` picks a free port (see `server.server_address`)."""
+    state = MockState(latency_ms, jitter_ms, error_rate, dim, rpm_limit=rpm_limit, tpm_limit=tpm_limit)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 429/500")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimensions")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="requests per minute per endpoint (0 = unlimited)")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="prompt tokens per minute per endpoint (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.dim, args.rpm_limit, args.tpm_limit
+    )
+    host, port = server.server_address[:2]
+    print(f"mock OpenAI listening on http://{host}:{port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic survey generator with the same columns as data/input.csv
+(survey_id, Date, ANI, DNIS, channel, product, state, call_transcrpt).
+
+Transcripts are assembled from issue / experience / closing phrase pools, so topic
+structure and sentiment resemble the real data. `--unique-fraction` controls how many
+transcripts get a distinguishing reference number (the rest repeat phrasing, like real
+survey dumps do).
+
+Usage (from the repo root):
+    python -m benchmarks.synthetic_surveys --rows 100000 --out data/bench/input_100k.csv
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CHANNELS = ["Phone", "Branch", "Email", "Online", "App"]
+PRODUCTS = ["Combined", "Ambulance Cover", "Travel", "Hospital", "Extras", "Car", "Home"]
+STATES = ["NSW", "VIC", "QLD", "SA", "WA", "TAS", "ACT", "NT"]
+
+ISSUES = [
+    "a billing error", "a missing item", "a wrong item sent", "a delayed claim payment",
+    "a rejected claim", "a policy renewal mix-up", "an incorrect premium increase",
+    "a refund that never arrived", "a cancelled direct debit", "an app login problem",
+    "a website crash during payment", "a change of address not being recorded",
+    "confusing policy wording", "a long hold time on the phone", "a duplicate charge",
+    "an expired membership card", "a lost claim form", "a pre-approval delay",
+    "an unhelpful branch visit", "a broken online quote tool",
+]
+EXPERIENCES = [
+    "It took longer than expected to get a resolution, and the communication from your support team was not clear enough.",
+    "I had to contact support multiple times and it still remains unresolved.",
+    "While the agent tried to help, the process was confusing and slow, making the whole experience frustrating.",
+    "It seems like there is no proper escalation process or accountability within the team.",
+    "The agent was friendly and sorted it out on the first call.",
+    "Nobody called me back even though I was promised a follow-up.",
+    "I was transferred between departments several times and had to repeat my story.",
+    "The online form kept timing out before I could submit it.",
+    "The staff member explained everything clearly and fixed it quickly.",
+    "I received conflicting information from different people.",
+]
+OPENINGS = [
+    "I faced {issue} recently and it caused significant inconvenience.",
+    "I'm frustrated about how {issue} was addressed.",
+    "I am quite neutral with how {issue} was handled.",
+    "The overall experience was not great due to {issue}.",
+    "I was pleased with how {issue} was resolved.",
+    "I contacted you about {issue}.",
+]
+CLOSINGS = [
+    "I expected better service quality.",
+    "Please improve your processes.",
+    "I am considering switching providers.",
+    "Overall I am satisfied.",
+    "",
+    "Thanks for the help.",
+]
+
+
+def _phone_numbers(rng: np.random.Generator, n: int) -> list:
+    parts = rng.integers(0, 1000, (3, n)).tolist()
+    return [f"04{a % 100:02d} {b:03d} {c:03d}" for a, b, c in zip(*parts)]
+
+
+def generate_surveys(rows: int, seed: int = 0, unique_fraction: float = 0.0) -> pd.DataFrame:
+    """Return `rows` synthetic survey responses shaped like data/input.csv."""
+    rng = np.random.default_rng(seed)
+    openings = rng.integers(0, len(OPENINGS), rows)
+    issues = rng.integers(0, len(ISSUES), rows)
+    experiences = rng.integers(0, len(EXPERIENCES), rows)
+    closings = rng.integers(0, len(CLOSINGS), rows)
+    unique = rng.random(rows) < unique_fraction
+
+    transcripts = [
+        " ".join(filter(None, (
+            OPENINGS[o].format(issue=ISSUES[i]),
+            EXPERIENCES[e],
+            CLOSINGS[c],
+            f"My reference number is {100000 + n}." if u else "",
+        )))
+        for n, (o, i, e, c, u) in enumerate(zip(openings, issues, experiences, closings, unique))
+    ]
+    # Same d/mm/yyyy format as the sample data, drawn from one year of days.
+    calendar = [f"{d.day}/{d.month:02d}/{d.year}" for d in pd.date_range("2025-01-01", "2025-12-31")]
+    return pd.DataFrame({
+        "survey_id": [f"S{i:07d}" for i in range(1, rows + 1)],
+        "Date": np.asarray(calendar, dtype=object)[rng.integers(0, len(calendar), rows)],
+        "ANI": _phone_numbers(rng, rows),
+        "DNIS": _phone_numbers(rng, rows),
+        "channel": rng.choice(CHANNELS, rows),
+        "product": rng.choice(PRODUCTS, rows),
+        "state": rng.choice(STATES, rows),
+        "call_transcrpt": transcripts,
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--out", default="data/bench/input.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique-fraction", type=float, default=0.0, help="share of transcripts made unique")
+    args = parser.parse_args()
+
+    df = generate_surveys(args.rows, args.seed, args.unique_fraction)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(args.out, index=False)
+    print(f"wrote {len(df):,} rows ({df['call_transcrpt'].nunique():,} distinct transcripts) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
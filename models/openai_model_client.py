@@ -1,14 +1,37 @@
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from config.constants import MODEL_OPENAI
+from tools.llm_utils import estimate_request_tokens, usage_tokens
+from tools.quota import get_governor, shared_http_client
 import os 
 from dotenv import load_dotenv
 load_dotenv() 
 
+# Expected reply size of an agent turn, reserved from the tokens-per-minute quota.
+AGENT_COMPLETION_TOKENS = 500
+
+
+class GovernedChatCompletionClient(OpenAIChatCompletionClient):
+    """Chat client whose calls draw on the shared chat quota at interactive priority."""
+
+    async def create(self, messages, *args, **kwargs):
+        governor = get_governor("chat")
+        tokens = estimate_request_tokens(messages, AGENT_COMPLETION_TOKENS)
+        await governor.acquire(tokens, priority="interactive")
+        try:
+            result = await super().create(messages, *args, **kwargs)
+        except Exception:
+            await governor.settle(tokens, None)
+            raise
+        actual = usage_tokens(result.usage)
+        await governor.settle(tokens, tokens if actual is None else actual)
+        return result
+
 
 def get_model_client():
-    openai_model_client = OpenAIChatCompletionClient(
+    openai_model_client = GovernedChatCompletionClient(
         model = MODEL_OPENAI,
-        api_key= os.getenv('OPENAI_API_KEY')
+        api_key= os.getenv('OPENAI_API_KEY'),
+        http_client= shared_http_client()
 
     )
     return openai_model_client
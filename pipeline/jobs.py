@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_STATES = ("queued", "running", "success", "error")
+
+# Root for per-job workspaces and the default number of jobs run at once.
+JOBS_DIR = "data/jobs"
+MAX_JOBS_ENV = "SURVEY_INSIGHT_MAX_JOBS"
+DEFAULT_MAX_JOBS = 2
+
+PIPELINE_TASK = (
+    "Run the full 4-step pipeline on {ws}/input.csv. Use this job's workspace for every file: "
+    "output_csv_path {ws}/df_with_topics.csv, then {ws}/df_with_clusters.csv, then {ws}/output.csv; "
+    "model_dir {ws}/cache/cluster_model and embedding_store_dir {ws}/cache/embeddings; "
+    "businessInsight with input_csv_path {ws}/output.csv and output_dir {ws}/plots; "
+    "queryInsights with index_dir {ws}/insight_index."
+)
+
+
+class PipelineJob:
+    """
+    State of one background run. The worker thread writes it; UIs poll it.
+
+    Each job owns a workspace directory holding its input, intermediates, outputs, plots and
+    cluster model, plus `job.json` with the current status, so concurrent jobs never share files.
+    """
+
+    def __init__(self, kind: str, root: str = JOBS_DIR):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.workspace = Path(root) / self.id
+        self.status = "queued"
+        self.messages: List[str] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        """Path of `name` inside this job's workspace."""
+        return str(self.workspace / name)
+
+    def log(self, message: str) -> None:
+        with self._lock:
+            self.messages.append(message)
+
+    def messages_since(self, index: int = 0) -> List[str]:
+        with self._lock:
+            return self.messages[index:]
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("success", "error")
+
+    @property
+    def elapsed_s(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+
+    def artifacts(self) -> Dict[str, str]:
+        """Output files in the workspace (relative name -> path), excluding the input and caches."""
+        if not self.workspace.exists():
+            return {}
+        found = {}
+        for path in sorted(self.workspace.rglob("*")):
+            name = path.relative_to(self.workspace).as_posix()
+            if path.is_file() and name not in ("input.csv", "job.json") and not name.startswith("cache/"):
+                found[name] = str(path)
+        return found
+
+    def status_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "workspace": str(self.workspace),
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "elapsed_s": round(self.elapsed_s, 1),
+            "error": self.error,
+            "artifacts": list(self.artifacts()) if self.done else [],
+        }
+
+    def save_status(self) -> None:
+        self.workspace.mkdir(parents=True, exist_ok=True)
+        tmp = self.workspace / "job.json.tmp"
+        tmp.write_text(json.dumps(self.status_dict(), indent=2), encoding="utf-8")
+        os.replace(tmp, self.workspace / "job.json")
+
+
+def default_max_jobs() -> int:
+    return max(1, int(os.getenv(MAX_JOBS_ENV, DEFAULT_MAX_JOBS)))
+
+
+class JobRunner:
+    """
+    Runs async pipeline work on a pool of background threads, each job with its own event loop
+    and workspace under `root`. The caller (e.g. the Streamlit script thread) only submits and
+    polls; jobs beyond `max_workers` wait in the queue.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, root: str = JOBS_DIR):
+        self.max_workers = max_workers or default_max_jobs()
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline-job")
+        self._jobs: Dict[str, PipelineJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        kind: str,
+        work: Callable[[PipelineJob], Awaitable[Optional[Dict[str, Any]]]],
+        input_path: Optional[str] = None,
+        input_bytes: Optional[bytes] = None,
+    ) -> PipelineJob:
+        """Create the job's workspace, copy the input into it as `input.csv` and queue `work(job)`."""
+        job = PipelineJob(kind, self.root)
+        job.workspace.mkdir(parents=True, exist_ok=True)
+        try:
+            if input_bytes is not None:
+                Path(job.path("input.csv")).write_bytes(input_bytes)
+            elif input_path is not None:
+                shutil.copyfile(input_path, job.path("input.csv"))
+        except OSError:
+            shutil.rmtree(job.workspace, ignore_errors=True)
+            raise
+        job.save_status()
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: Optional[str]) -> Optional[PipelineJob]:
+        with self._lock:
+            return self._jobs.get(job_id) if job_id else None
+
+    def jobs(self) -> List[PipelineJob]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [job.status_dict() for job in self.jobs()]
+
+    def _run(self, job: PipelineJob, work: Callable[[PipelineJob], Awaitable[Optional[Dict[str, Any]]]]) -> None:
+        job.status = "running"
+        job.started_at = datetime.now()
+        job.save_status()
+        try:
+            job.result = asyncio.run(work(job))
+            job.status = "success"
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.log(traceback.format_exc())
+            job.status = "error"
+        finally:
+            job.finished_at = datetime.now()
+            job.save_status()
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def agent_pipeline_job(job: PipelineJob) -> Dict[str, Any]:
+    """The agent team run, pointed at the job's workspace, streaming its messages into the job log."""
+    from teams.survey_insight import get_survey_insight_team
+
+    team = await get_survey_insight_team()
+    async for message in team.run_stream(task=PIPELINE_TASK.format(ws=job.workspace.as_posix())):
+        job.log(str(message))
+    return {"output_path": job.path("output.csv")}
+
+
+async def direct_pipeline_job(job: PipelineJob, **pipeline_kwargs: Any) -> Dict[str, Any]:
+    """`run_pipeline` on the job's workspace; step completions and the executive summary go to the job log."""
+    from pipeline.runner import run_pipeline
+
+    paths = {
+        "input_csv_path": job.path("input.csv"),
+        "output_csv_path": job.path("output.csv"),
+        "topics_csv_path": job.path("df_with_topics.csv"),
+        "clusters_csv_path": job.path("df_with_clusters.csv"),
+        "plots_dir": job.path("plots"),
+        "model_dir": job.path("cache/cluster_model"),
+        "embedding_store_dir": job.path("cache/embeddings"),
+    }
+    result = await run_pipeline(progress=job.log, **{**paths, **pipeline_kwargs})
+    if result.get("summary"):
+        job.log(result["summary"])
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the direct pipeline on several survey files concurrently.")
+    parser.add_argument("inputs", nargs="+", help="survey CSVs, one job each")
+    parser.add_argument("--max-jobs", type=int, default=None, help=f"jobs run at once (default ${MAX_JOBS_ENV} or {DEFAULT_MAX_JOBS})")
+    parser.add_argument("--jobs-dir", default=JOBS_DIR)
+    parser.add_argument("--no-summary", action="store_true", help="skip the LLM executive summary")
+    args = parser.parse_args()
+    missing = [path for path in args.inputs if not os.path.isfile(path)]
+    if missing:
+        parser.error(f"input not found: {', '.join(missing)}")
+
+    runner = JobRunner(args.max_jobs, args.jobs_dir)
+    work = lambda job: direct_pipeline_job(job, summarize=not args.no_summary)
+    jobs = {runner.submit("direct", work, input_path=path).id: path for path in args.inputs}
+    while not all(job.done for job in runner.jobs()):
+        time.sleep(1)
+    runner.shutdown(wait=True)
+    for status in runner.status():
+        print(json.dumps({"input": jobs[status["id"]], **status}, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from autogen_core.models import SystemMessage, UserMessage
+
+from models.openai_model_client import get_model_client
+from prompts.system_prompt import ExecutiveSummary_message
+from tools.business_insight import INSIGHT_COLUMNS, build_insight_plots
+from tools.cluster_labelling import assign_cluster_labels, explode_topics
+from tools.insight_index import InsightIndex, index_dir_for
+from tools.llm_utils import call_with_retries
+from tools.metrics import track_step
+from tools.normalized_output import OUTPUT_LAYOUTS, build_normalized, mentions_frame, normalized_dir_for, write_normalized
+from tools.table_io import read_table, resolve_path, write_table
+from tools.topic_clustering import cluster_topics
+from tools.topics_extraction import extract_topics
+
+
+def insight_facts(out_df: pd.DataFrame, top_n: int = 5) -> Dict[str, Any]:
+    """Compact numbers the executive summary is written from (top themes overall / by product / by channel)."""
+    themes = out_df["general_topic_l1"]
+    top = themes.value_counts().head(top_n)
+    by_dim: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for dim in ("product", "channel"):
+        if dim not in out_df.columns:
+            continue
+        counts = out_df.groupby([dim, "general_topic_l1"], observed=True).size()
+        by_dim[dim] = {
+            str(value): {str(k): int(v) for k, v in grp.droplevel(0).sort_values(ascending=False).head(3).items()}
+            for value, grp in counts.groupby(level=0, observed=True)
+        }
+    negative_share = {}
+    if "customer_sentiment" in out_df.columns:
+        neg = out_df["customer_sentiment"].eq("Negative").groupby(themes, observed=True).mean()
+        negative_share = {str(t): round(float(neg.get(t, 0.0)), 3) for t in top.index}
+    return {
+        "responses": int(out_df["survey_id"].nunique()) if "survey_id" in out_df.columns else None,
+        "topic_mentions": int(len(out_df)),
+        "themes": int(themes.nunique()),
+        "top_themes": {str(k): int(v) for k, v in top.items()},
+        "top_themes_by_product": by_dim.get("product", {}),
+        "top_themes_by_channel": by_dim.get("channel", {}),
+        "negative_share_of_top_themes": negative_share,
+    }
+
+
+async def summarize_insights(facts: Dict[str, Any]) -> str:
+    """Single LLM call that turns the computed facts into the executive summary."""
+    client = get_model_client()
+    messages = [
+        SystemMessage(content=ExecutiveSummary_message),
+        UserMessage(content=json.dumps(facts, indent=2), source="user"),
+    ]
+    try:
+        result = await call_with_retries(lambda: client.create(messages))
+    finally:
+        await client.close()
+    return result.content if isinstance(result.content, str) else str(result.content)
+
+
+async def run_pipeline(
+    input_csv_path: str = "data/input.csv",
+    output_csv_path: str = "data/output.csv",
+    topics_csv_path: Optional[str] = "data/df_with_topics.csv",
+    clusters_csv_path: Optional[str] = "data/df_with_clusters.csv",
+    text_column: str = "call_transcrpt",
+    num_clusters: int = 12,
+    engine: str = "auto",
+    top_n: int = 5,
+    max_concurrency: int = 8,
+    use_cache: bool = True,
+    file_format: str = "csv",
+    summarize: bool = True,
+    batch_size: int = 1,
+    dedup: str = "exact",
+    local_model_path: Optional[str] = None,
+    local_threshold: float = 0.9,
+    canonicalize: str = "lemma",
+    fuzzy_threshold: Optional[float] = None,
+    output_layout: str = "exploded",
+    plots_dir: str = "data",
+    model_dir: str = "data/cache/cluster_model",
+    embedding_store_dir: str = "data/cache/embeddings",
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Deterministic in-process pipeline: TopicExtraction → TopicClustering → ClusterLabelling →
+    businessInsight, called directly with DataFrames passed in memory (no agent, no MCP hop).
+
+    Intermediates are still written to `topics_csv_path` / `clusters_csv_path` for inspection
+    (pass None to skip them); plots go to `plots_dir`. `output_layout` is "exploded" (one row per
+    topic in `output_csv_path`), "normalized" (the fact / dimension tables in
+    `<output stem>_normalized/`, see ClusterLabelling) or "both". The LLM is only used by the steps themselves and, if `summarize`,
+    once at the end for the executive summary. `progress`, if given, is called with a short
+    message as each step finishes.
+    """
+    if output_layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unknown output_layout '{output_layout}' (expected one of {OUTPUT_LAYOUTS})")
+    steps: Dict[str, Dict[str, Any]] = {}
+    timings: Dict[str, float] = {}
+
+    def finished(step: str, started: float) -> None:
+        timings[step] = time.perf_counter() - started
+        if progress is not None:
+            progress(f"{step} finished in {timings[step]:.1f}s")
+
+    start = time.perf_counter()
+    with track_step("TopicExtraction") as metrics:
+        df = read_table(input_csv_path)
+        df, steps["TopicExtraction"] = await extract_topics(
+            df, text_column=text_column, max_concurrency=max_concurrency, use_cache=use_cache, batch_size=batch_size,
+            dedup=dedup, local_model_path=local_model_path, local_threshold=local_threshold,
+        )
+        if topics_csv_path:
+            write_table(df, resolve_path(topics_csv_path, file_format))
+        metrics.count_fields(steps["TopicExtraction"])
+    steps["TopicExtraction"]["metrics"] = metrics.summary()
+    finished("TopicExtraction", start)
+
+    start = time.perf_counter()
+    with track_step("TopicClustering") as metrics:
+        df, steps["TopicClustering"] = await cluster_topics(
+            df, num_clusters=num_clusters, engine=engine, model_dir=model_dir, embedding_store_dir=embedding_store_dir,
+            canonicalize=canonicalize, fuzzy_threshold=fuzzy_threshold,
+        )
+        if clusters_csv_path:
+            write_table(df, resolve_path(clusters_csv_path, file_format))
+        metrics.count_fields(steps["TopicClustering"])
+    steps["TopicClustering"]["metrics"] = metrics.summary()
+    finished("TopicClustering", start)
+
+    start = time.perf_counter()
+    with track_step("ClusterLabelling") as metrics:
+        cluster_labels, canonical, steps["ClusterLabelling"] = await assign_cluster_labels(
+            df, model_dir=model_dir, max_concurrency=max_concurrency, use_cache=use_cache
+        )
+        index_dir = InsightIndex.build(df, cluster_labels).save(index_dir_for(output_csv_path))
+        if output_layout != "normalized":
+            out_df = explode_topics(df, df["all_topics_discussed"], df["topic_cluster_ids"], cluster_labels, canonical)
+            write_table(out_df, output_csv_path)
+            if file_format == "parquet":
+                write_table(out_df, resolve_path(output_csv_path, "parquet"))
+        if output_layout != "exploded":
+            tables = build_normalized(df, cluster_labels, canonical=canonical)
+            write_normalized(tables, normalized_dir_for(output_csv_path), file_format)
+            if output_layout == "normalized":
+                output_csv_path = normalized_dir_for(output_csv_path)
+                out_df = mentions_frame(tables, ["survey_id", *INSIGHT_COLUMNS, "channel"])
+        steps["ClusterLabelling"]["total_rows"] = len(out_df)
+        steps["ClusterLabelling"]["insight_index_dir"] = index_dir
+        metrics.count_fields(steps["ClusterLabelling"])
+    steps["ClusterLabelling"]["metrics"] = metrics.summary()
+    finished("ClusterLabelling", start)
+
+    start = time.perf_counter()
+    with track_step("businessInsight"):
+        plots: List[str] = await asyncio.to_thread(build_insight_plots, out_df[INSIGHT_COLUMNS], top_n, output_dir=plots_dir)
+        facts = insight_facts(out_df, top_n)
+        facts["output_path"] = output_csv_path
+        facts["plots"] = plots
+    finished("businessInsight", start)
+
+    summary = None
+    if summarize:
+        start = time.perf_counter()
+        with track_step("summary") as metrics:
+            summary = await summarize_insights(facts)
+        steps["summary"] = {"metrics": metrics.summary()}
+        finished("summary", start)
+
+    return {
+        "status": "success",
+        "output_path": output_csv_path,
+        "plots": plots,
+        "insights": facts,
+        "summary": summary,
+        "steps": steps,
+        "timings_s": {k: round(v, 3) for k, v in timings.items()},
+    }
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import json
+
+from pipeline.runner import run_pipeline
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the 4-step survey insight pipeline directly (no agent orchestration)."
+    )
+    parser.add_argument("--input", default="data/input.csv", help="survey CSV to analyse")
+    parser.add_argument("--output", default="data/output.csv", help="enriched, exploded CSV to write")
+    parser.add_argument("--num-clusters", type=int, default=12, help="number of themes (0 = choose automatically)")
+    parser.add_argument("--engine", default="auto", choices=["auto", "kmeans", "minibatch"])
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="LLM requests in flight")
+    parser.add_argument("--batch-size", type=int, default=1, help="transcripts per extraction request")
+    parser.add_argument("--dedup", default="exact", choices=["none", "exact", "near"], help="group duplicate transcripts before extraction")
+    parser.add_argument("--local-model", default=None, help="local TF-IDF model (python -m tools.local_cascade) for confident rows")
+    parser.add_argument("--local-threshold", type=float, default=0.9, help="confidence needed to skip the LLM")
+    parser.add_argument("--canonicalize", default="lemma", choices=["none", "normalize", "lemma"], help="merge topic phrase variants before clustering")
+    parser.add_argument("--fuzzy-threshold", type=float, default=None, help="also merge near-identical topic spellings (e.g. 0.85)")
+    parser.add_argument("--output-layout", default="exploded", choices=["exploded", "normalized", "both"], help="normalized = responses + topic_mentions tables in <output>_normalized/")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"], help="intermediate file format")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the LLM result cache")
+    parser.add_argument("--no-summary", action="store_true", help="skip the LLM executive summary")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    result = await run_pipeline(
+        input_csv_path=args.input,
+        output_csv_path=args.output,
+        num_clusters=args.num_clusters,
+        engine=args.engine,
+        top_n=args.top_n,
+        max_concurrency=args.max_concurrency,
+        use_cache=not args.no_cache,
+        file_format=args.format,
+        summarize=not args.no_summary,
+        batch_size=args.batch_size,
+        dedup=args.dedup,
+        local_model_path=args.local_model,
+        local_threshold=args.local_threshold,
+        canonicalize=args.canonicalize,
+        fuzzy_threshold=args.fuzzy_threshold,
+        output_layout=args.output_layout,
+    )
+    summary = result.pop("summary")
+    print(json.dumps(result, indent=2, default=str))
+    if summary:
+        print()
+        print(summary)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
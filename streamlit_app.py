@@ -1,85 +1,184 @@
-import asyncio
-import streamlit as st
-import pandas as pd
+import functools
+import hashlib
+import io
+import os
 from pathlib import Path
-from PIL import Image
+from typing import Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from pipeline.jobs import JobRunner, PipelineJob, agent_pipeline_job, direct_pipeline_job
+
+PLOT_FILES = [
+    ("Top Pain Points", "plots/plot_top_pain_points.png"),
+    ("Pain Points by Product", "plots/heatmap_pain_points_by_product.png"),
+    ("Theme Severity", "plots/theme_severity_stacked.png"),
+    ("Trends Over Time", "plots/theme_trends_over_time.png"),
+]
+POLL_SECONDS = 2
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+@st.cache_resource
+def get_job_runner() -> JobRunner:
+    # One runner per server process, shared by every session. Each job works in its own
+    # workspace under data/jobs/; SURVEY_INSIGHT_MAX_JOBS of them run at once, the rest queue.
+    return JobRunner()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _hash_file(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Content hash of `path`, recomputed only when its size or mtime changes (None if missing)."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _hash_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_plot(path: str, digest: str) -> bytes:
+    return Path(path).read_bytes()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def count_rows(path: str, digest: str) -> int:
+    # Reads one column in chunks, so large files are never held in memory.
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=200_000))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_page(path: str, digest: str, page: int, page_size: int) -> pd.DataFrame:
+    start = page * page_size
+    return pd.read_csv(path, skiprows=range(1, start + 1), nrows=page_size)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def upload_summary(file_id: str, _data: bytes) -> Tuple[int, pd.DataFrame]:
+    """Row count and first rows of an upload, computed once per uploaded file."""
+    rows = sum(len(chunk) for chunk in pd.read_csv(io.BytesIO(_data), usecols=[0], chunksize=200_000))
+    return rows, pd.read_csv(io.BytesIO(_data), nrows=10)
+
+
+def show_job_log(job, limit: int = 200) -> None:
+    messages = job.messages_since(0)
+    if len(messages) > limit:
+        st.caption(f"Showing the last {limit} of {len(messages)} messages")
+    for text in messages[-limit:]:
+        st.markdown(text)
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def job_progress(job_id: str) -> None:
+    """Polls the background job; re-runs the whole page once it has finished."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return
+    if job.done:
+        st.rerun(scope="app")
+    label = "Waiting for an earlier run to finish..." if job.status == "queued" else f"Running ({job.elapsed_s:.0f}s)..."
+    with st.status(label, expanded=True):
+        show_job_log(job)
+
+
+def show_plots(job: PipelineJob) -> None:
+    cols = st.columns(2)
+    for idx, (title, name) in enumerate(PLOT_FILES):
+        path = job.path(name)
+        digest = file_digest(path)
+        if digest is None:
+            continue
+        with cols[idx % 2]:
+            st.markdown(f"**{title}**")
+            st.image(load_plot(path, digest), width="stretch")
+
+
+def show_output_preview(job: PipelineJob) -> None:
+    output_path = job.path("output.csv")
+    digest = file_digest(output_path)
+    if digest is None:
+        return
+    st.markdown("---")
+    st.subheader("Enriched Output Data Preview")
+    total = count_rows(output_path, digest)
+    size_col, page_col = st.columns(2)
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=1)
+    pages = max(1, -(-total // page_size))
+    page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+    st.dataframe(load_page(output_path, digest, int(page) - 1, page_size))
+    st.caption(f"{total:,} rows in {output_path}")
+
+    st.download_button(
+        label="Download Output CSV",
+        # Deferred: the file is only read when the button is clicked.
+        data=functools.partial(Path(output_path).read_bytes),
+        file_name="output.csv",
+        mime="text/csv",
+    )
+
+
+def show_job(job: PipelineJob) -> None:
+    if not job.done:
+        job_progress(job.id)
+    elif job.status == "error":
+        st.error(f"Pipeline failed after {job.elapsed_s:.0f}s: {job.error}")
+        with st.expander("Log"):
+            show_job_log(job)
+    else:
+        st.success(f"Pipeline Complete! ({job.elapsed_s:.0f}s)")
+        with st.expander("Log"):
+            show_job_log(job)
+
+        # Display plots
+        st.markdown("---")
+        st.subheader("Generated Insights")
+        show_plots(job)
+
+        # Display output CSV
+        show_output_preview(job)
 
-from teams.survey_insight import get_survey_insight_team
 
 st.set_page_config(page_title="Survey Insight Agent", layout="wide")
 
 st.title("Customer Survey Insight Pipeline")
 st.markdown("Upload survey data and generate insights with AI-powered analysis")
 
+runner = get_job_runner()
+session_jobs = st.session_state.setdefault("job_ids", [])
+
 # File upload
 uploaded_file = st.file_uploader("Upload Survey CSV", type=["csv"])
 
 if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-    st.success(f"Uploaded {len(df)} survey responses")
-    
+    rows, head = upload_summary(uploaded_file.file_id, uploaded_file.getvalue())
+    st.success(f"Uploaded {rows:,} survey responses")
+
     with st.expander("Preview Data"):
-        st.dataframe(df.head(10))
-    
-    # Save as input.csv
-    Path("data").mkdir(exist_ok=True)
-    df.to_csv("data/input.csv", index=False)
-    
+        st.dataframe(head)
+
+    mode = st.radio("Run with", ["Agent (MCP tools)", "Direct pipeline (fastest)"], horizontal=True)
     if st.button("Run Analysis Pipeline", type="primary"):
-        st.markdown("---")
-        st.subheader("Pipeline Progress")
-        
-        message_container = st.container()
-        
-        async def run_pipeline():
-            team = await get_survey_insight_team()
-            messages = []
-            
-            async for message in team.run_stream(task="Run the full 4-step pipeline on data/input.csv"):
-                msg_text = str(message)
-                messages.append(msg_text)
-                with message_container:
-                    st.markdown(msg_text)
-            
-            return messages
-        
-        # Run the pipeline
-        with st.spinner("Running AI pipeline..."):
-            asyncio.run(run_pipeline())
-        
-        st.success("Pipeline Complete!")
-        
-        # Display plots
-        st.markdown("---")
-        st.subheader("Generated Insights")
-        
-        plot_files = [
-            ("Top Pain Points", "data/plot_top_pain_points.png"),
-            ("Pain Points by Product", "data/heatmap_pain_points_by_product.png"),
-            ("Theme Severity", "data/theme_severity_stacked.png"),
-            ("Trends Over Time", "data/theme_trends_over_time.png"),
-        ]
-        
-        cols = st.columns(2)
-        for idx, (title, path) in enumerate(plot_files):
-            if Path(path).exists():
-                with cols[idx % 2]:
-                    st.markdown(f"**{title}**")
-                    img = Image.open(path)
-                    st.image(img, use_container_width=True)
-        
-        # Display output CSV
-        if Path("data/output.csv").exists():
-            st.markdown("---")
-            st.subheader("Enriched Output Data Preview")
-            output_df = pd.read_csv("data/output.csv")
-            st.dataframe(output_df.head(50))
-            
-            st.download_button(
-                label="Download Output CSV",
-                data=output_df.to_csv(index=False),
-                file_name="output.csv",
-                mime="text/csv",
-            )
-else:
+        work = agent_pipeline_job if mode.startswith("Agent") else direct_pipeline_job
+        job = runner.submit(mode.split()[0].lower(), work, input_bytes=uploaded_file.getvalue())
+        session_jobs.append(job.id)
+elif not session_jobs:
     st.info("Upload a CSV file to begin")
+
+if session_jobs:
+    st.markdown("---")
+    st.subheader("Pipeline Progress")
+    with st.expander(f"All jobs on this server ({len(runner.jobs())})"):
+        st.dataframe(pd.DataFrame(runner.status()).drop(columns=["artifacts"]), hide_index=True)
+    labels = {job_id: f"{job_id} ({runner.get(job_id).status})" for job_id in reversed(session_jobs) if runner.get(job_id)}
+    if labels:
+        selected = st.selectbox("Job", list(labels), format_func=labels.get)
+        show_job(runner.get(selected))
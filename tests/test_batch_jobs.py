@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+import pandas as pd
+
+from tools.batch_jobs import get_batch_backend
+from tools.topics_extraction import TopicExtraction
+
+
+def respond(body):
+    text = body["messages"][-1]["content"].split("Text:", 1)[1].strip()
+    return json.dumps({"topics": [text], "supporting_quote": text, "reason": "r", "sentiment": "Negative"})
+
+
+def test_offline_batch_pending_then_resumed(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("SURVEY_INSIGHT_METRICS_DIR", "")
+    input_csv, output_csv, job_dir = tmp_path / "in.csv", str(tmp_path / "out.csv"), str(tmp_path / "batch")
+    pd.DataFrame({"survey_id": ["s1", "s2", "s3"], "call_transcrpt": ["late refund", "rude agent", "late refund"]}).to_csv(
+        input_csv, index=False
+    )
+
+    def run():
+        return asyncio.run(TopicExtraction(
+            str(input_csv), output_csv, use_cache=False, offline_backend="local", batch_job_dir=job_dir,
+            poll_interval=0.01, batch_timeout_s=0.05,
+        ))
+
+    pending = run()
+    assert pending["status"] == "pending"
+    assert run()["batch_id"] == pending["batch_id"]  # the submitted batch is reused, not resubmitted
+
+    # An external worker completes the batch; the next call joins it back by custom_id.
+    assert asyncio.run(get_batch_backend("local", job_dir, respond).poll(pending["batch_id"])) is not None
+    done = run()
+    assert done["status"] == "success"
+    assert done["offline_requests"] == 2 and done["api_calls"] == 0
+
+    out = pd.read_csv(output_csv)
+    assert out["survey_id"].tolist() == ["s1", "s2", "s3"]
+    assert out["supporting_quote"].tolist() == ["late refund", "rude agent", "late refund"]
+    assert not list((tmp_path / "batch").glob("*.state.json"))
@@ -0,0 +1,45 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+
+import tools.cluster_labelling
+from tools.cluster_labelling import assign_cluster_labels
+
+
+class FakeClient:
+    """Replies with `labels[first topic]`; a missing entry gets a reply without a label."""
+
+    def __init__(self, labels):
+        self.labels = labels
+
+    async def create(self, messages):
+        first = messages[-1].content.split(": ", 1)[1].split("; ")[0]
+        label = self.labels.get(first)
+        return SimpleNamespace(content=json.dumps({"label": label} if label else {"theme": "?"}), usage=None)
+
+    async def close(self):
+        pass
+
+
+def label(df, tmp_path, monkeypatch, labels):
+    monkeypatch.setattr(tools.cluster_labelling, "make_chat_client", lambda: FakeClient(labels))
+    return asyncio.run(assign_cluster_labels(
+        df, model_dir=str(tmp_path / "model"), cache_path=str(tmp_path / "cache.sqlite")
+    ))
+
+
+def test_malformed_label_reply_falls_back_and_is_not_cached(tmp_path, monkeypatch):
+    df = pd.DataFrame({
+        "all_topics_discussed": [["slow claims", "late refund"], ["slow claims"]],
+        "topic_cluster_ids": [[0, 1], [0]],
+    })
+
+    labels, _, stats = label(df, tmp_path, monkeypatch, {"slow claims": "Claims delays"})
+    assert labels == {0: "Claims delays", 1: "late refund"}
+    assert stats["labels_fallback"] == 1
+
+    labels, _, stats = label(df, tmp_path, monkeypatch, {"late refund": "Refund delays"})
+    assert labels == {0: "Claims delays", 1: "Refund delays"}
+    assert (stats["labels_cached"], stats["labels_requested"], stats["labels_fallback"]) == (1, 1, 0)
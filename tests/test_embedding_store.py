@@ -0,0 +1,36 @@
+import numpy as np
+
+from tools.embedding_store import EmbeddingStore
+
+
+def test_two_instances_keep_their_rows(tmp_path):
+    a = EmbeddingStore(str(tmp_path), "m")
+    b = EmbeddingStore(str(tmp_path), "m")
+    a.add(["x"], np.ones((1, 4)))
+    b.add(["y"], np.full((1, 4), 2.0))
+
+    assert b.get(["y"]).tolist() == [[2.0] * 4]
+    assert b.get(["x"]).tolist() == [[1.0] * 4]
+    assert a.get(["y"]).tolist() == [[2.0] * 4]
+    fresh = EmbeddingStore(str(tmp_path), "m")
+    assert fresh.get(["x", "y"]).tolist() == [[1.0] * 4, [2.0] * 4]
+
+
+def test_topic_added_by_another_instance_is_not_missing(tmp_path):
+    a = EmbeddingStore(str(tmp_path), "m")
+    b = EmbeddingStore(str(tmp_path), "m")
+    a.add(["x"], np.ones((1, 4)))
+    assert b.missing(["x", "y"]) == ["y"]
+    b.add(["x", "y"], np.full((2, 4), 3.0))
+    assert len(EmbeddingStore(str(tmp_path), "m")) == 2
+    assert b.get(["x"]).tolist() == [[1.0] * 4]
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    a = EmbeddingStore(str(tmp_path), "m")
+    a.add(["x"], np.ones((1, 4)))
+    with open(a.dir / "vectors.f32", "ab") as f:
+        f.write(np.zeros(4, dtype=np.float32).tobytes())  # vector written, topic line never was
+    b = EmbeddingStore(str(tmp_path), "m")
+    b.add(["y"], np.full((1, 4), 2.0))
+    assert EmbeddingStore(str(tmp_path), "m").get(["x", "y"]).tolist() == [[1.0] * 4, [2.0] * 4]
@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from tools.cluster_labelling import explode_topics
+from tools.insight_index import THEME, InsightIndex, queryInsights
+
+LABELS = {0: "Claims delays", 1: "Billing errors", 2: "Rude staff"}
+
+
+def labelled_run(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [rng.integers(0, 3, rng.integers(1, 4)).tolist() for _ in range(n)]
+    df = pd.DataFrame({
+        "survey_id": [f"s{i}" for i in range(n)],
+        "product": rng.choice(["Home", "Motor"], n),
+        "channel": rng.choice(["Phone", "Web", "Email"], n),
+        "state": rng.choice(["NSW", "VIC"], n),
+        "customer_sentiment": rng.choice(["Negative", "Neutral", "Positive"], n),
+        "Date": rng.choice(["2024-01-15", "2024-02-03", "2024-03-28"], n),
+        "all_topics_discussed": [[f"topic {c}" for c in lst] for lst in ids],
+        "topic_cluster_ids": ids,
+    })
+    exploded = explode_topics(df, df["all_topics_discussed"], df["topic_cluster_ids"], LABELS)
+    return df, exploded
+
+
+def query(index_dir, monkeypatch, **kwargs):
+    monkeypatch.setenv("SURVEY_INSIGHT_METRICS_DIR", "")
+    return asyncio.run(queryInsights(index_dir=index_dir, top_n=100, **kwargs))
+
+
+def test_theme_counts_match_the_exploded_output(tmp_path, monkeypatch):
+    df, exploded = labelled_run()
+    index_dir = InsightIndex.build(df, LABELS).save(str(tmp_path / "insight_index"))
+
+    result = query(index_dir, monkeypatch)
+    got = {r[THEME]: (r["mentions"], r["responses"]) for r in result["rows"]}
+    mentions = exploded.groupby(THEME).size()
+    responses = exploded.drop_duplicates(["survey_id", THEME]).groupby(THEME).size()
+    assert got == {theme: (mentions[theme], responses[theme]) for theme in mentions.index}
+    assert result["total_responses"] == len(df)
+    assert result["total_mentions"] == len(exploded)
+
+
+def test_filtered_breakdowns_match_the_exploded_output(tmp_path, monkeypatch):
+    df, exploded = labelled_run()
+    index_dir = InsightIndex.build(df, LABELS).save(str(tmp_path / "insight_index"))
+
+    result = query(index_dir, monkeypatch, group_by=["channel", THEME], filters={"product": "motor"})
+    motor = exploded[exploded["product"] == "Motor"]
+    expected = motor.groupby(["channel", THEME]).size().to_dict()
+    assert {(r["channel"], r[THEME]): r["mentions"] for r in result["rows"]} == expected
+
+    result = query(index_dir, monkeypatch, group_by=["product"], start_month="2024-02")
+    later = df[df["Date"] >= "2024-02"]
+    assert {r["product"]: r["responses"] for r in result["rows"]} == later.groupby("product").size().to_dict()
+    assert {r["product"]: r["mentions"] for r in result["rows"]} == (
+        exploded[exploded["Date"] >= "2024-02"].groupby("product").size().to_dict()
+    )
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from tools.local_cascade import LocalExtractor
+
+
+def trained_model():
+    df = pd.DataFrame({
+        "call_transcrpt": ["my claim was slow"] * 6 + ["the app keeps crashing"] * 6,
+        "all_topics_discussed": [["Slow claims"]] * 6 + [["App crashes"]] * 6,
+        "customer_sentiment": ["Negative", "Neutral"] * 6,
+    })
+    return LocalExtractor.fit(df)
+
+
+def test_loads_only_from_the_model_dir(tmp_path, monkeypatch):
+    model_dir, outside = tmp_path / "models", tmp_path / "elsewhere"
+    monkeypatch.setenv("SURVEY_INSIGHT_LOCAL_MODEL_DIR", str(model_dir))
+    model = trained_model()
+    model.save(str(model_dir / "local.joblib"))
+    model.save(str(outside / "local.joblib"))
+
+    assert LocalExtractor.load(str(model_dir / "local.joblib")).topic_labels == model.topic_labels
+    for path in (outside / "local.joblib", model_dir / ".." / "elsewhere" / "local.joblib"):
+        with pytest.raises(ValueError, match="only loaded from"):
+            LocalExtractor.load(str(path))
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from tools.cluster_labelling import explode_topics
+from tools.normalized_output import build_normalized, mentions_frame, read_mentions, write_normalized
+
+LABELS = {0: "Claims delays", 1: "Staff attitude"}
+CANONICAL = {"Claim delays": "Claim delays", "claim delay": "Claim delays", "Rude staff": "Rude staff"}
+
+
+def labelled_run():
+    return pd.DataFrame({
+        "survey_id": ["s1", "s2", "s3"],
+        "product": ["Home", "Motor", "Home"],
+        "call_transcrpt": ["Slow, and rude.", "Claim took ages", "Staff were rude"],
+        "all_topics_discussed": [["Claim delays", "Rude staff"], ["claim delay"], ["Rude staff"]],
+        "topic_cluster_ids": [[0, 1], [0], [1]],
+    })
+
+
+def as_plain(df):
+    # Labels come back dictionary-encoded and strings as whichever dtype the reader picks.
+    return df.astype(object).reset_index(drop=True)
+
+
+def test_tables_join_back_to_the_exploded_output():
+    df = labelled_run()
+    exploded = explode_topics(df, df["all_topics_discussed"], df["topic_cluster_ids"], LABELS, CANONICAL)
+    tables = build_normalized(df, LABELS, canonical=CANONICAL)
+
+    assert len(tables["topic_mentions"]) == len(exploded)
+    assert tables["topics"]["topic_discussed"].is_unique and len(tables["themes"]) == len(LABELS)
+    columns = ["survey_id", "product", "call_transcrpt", "topic_discussed", "topic_canonical", "general_topic_l1"]
+    pd.testing.assert_frame_equal(as_plain(mentions_frame(tables, columns)), as_plain(exploded[columns]))
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_written_tables_read_back_as_the_exploded_output(tmp_path, file_format):
+    df = labelled_run()
+    exploded = explode_topics(df, df["all_topics_discussed"], df["topic_cluster_ids"], LABELS)
+    write_normalized(build_normalized(df, LABELS), str(tmp_path / "out"), file_format)
+
+    columns = ["survey_id", "product", "call_transcrpt", "topic_discussed", "general_topic_l1"]
+    pd.testing.assert_frame_equal(as_plain(read_mentions(str(tmp_path / "out"), columns)), as_plain(exploded[columns]))
+
+
+def test_duplicate_survey_ids_are_rejected():
+    df = labelled_run().assign(survey_id=["s1", "s1", "s3"])
+    with pytest.raises(ValueError, match="unique"):
+        build_normalized(df, LABELS)
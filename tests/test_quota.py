@@ -0,0 +1,68 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import tools.quota
+from tools.quota import QuotaGovernor, _FileState
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tools.quota.time, "time", lambda: now[0])
+    return now
+
+
+def test_bucket_refills_at_the_per_minute_rate(clock):
+    governor = QuotaGovernor("chat", rpm=60, tpm=600)
+    assert governor._try_take(500, "interactive") == 0
+    # 100 tokens left, refilled at 10 per second.
+    assert governor._try_take(400, "interactive") == pytest.approx(30.0)
+    clock[0] += 30
+    assert governor._try_take(400, "interactive") == 0
+
+
+def test_batch_leaves_the_interactive_reserve(clock):
+    governor = QuotaGovernor("chat", tpm=600)
+    assert governor._try_take(500, "interactive") == 0
+    assert governor._try_take(50, "batch") > 0  # would dip into the last 10% (60 tokens)
+    assert governor._try_take(50, "interactive") == 0
+
+
+def test_settle_corrects_and_refunds_the_estimate(clock):
+    governor = QuotaGovernor("chat", tpm=600)
+    assert governor._try_take(500, "batch") == 0
+    asyncio.run(governor.settle(500, 200))
+    assert governor.snapshot()["tokens_available"] == 400
+    assert governor._try_take(300, "batch") == 0
+    asyncio.run(governor.settle(300, None))
+    assert governor.snapshot()["tokens_available"] == 400
+
+
+def run_in_subprocess(path, code):
+    script = (
+        "from pathlib import Path\n"
+        "from tools.quota import QuotaGovernor, _FileState\n"
+        f"governor = QuotaGovernor('chat', rpm=60, tpm=600, state=_FileState(Path({str(path)!r})))\n"
+        f"print({code})\n"
+    )
+    return subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+
+def test_processes_share_the_file_state(tmp_path):
+    path = tmp_path / "chat.json"
+    governor = QuotaGovernor("chat", rpm=60, tpm=600, state=_FileState(path))
+
+    assert float(run_in_subprocess(path, "governor._try_take(500, 'batch')")) == 0
+    # A few seconds of refill at most, far from the 600 a separate bucket would have.
+    assert governor.snapshot()["tokens_available"] < 200
+
+    # An interactive call waiting in another process holds back batch callers here.
+    assert float(run_in_subprocess(path, "governor._try_take(600, 'interactive')")) > 0
+    assert governor._try_take(1, "batch") > 0
+    assert governor._try_take(1, "interactive") == 0
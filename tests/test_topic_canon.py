@@ -0,0 +1,56 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+import tools.topic_clustering
+from tools.topic_canon import INDEX_FILE, TopicIndex
+from tools.topic_clustering import cluster_topics
+
+
+def test_alias_variants_collapse_to_one_canonical(tmp_path):
+    index = TopicIndex("lemma")
+    canonical = index.update(["Claim delays", "claim delay ", "Claim delays", "Delays of claims", "Rude staff"])
+    assert canonical == {
+        "Claim delays": "Claim delays", "claim delay ": "Claim delays", "Delays of claims": "Claim delays",
+        "Rude staff": "Rude staff",
+    }
+
+    index.save(str(tmp_path))
+    reloaded = TopicIndex.load(str(tmp_path), "lemma")
+    assert reloaded.lookup("claims delayed") == reloaded.lookup("CLAIM DELAY") == "Claim delays"
+    assert TopicIndex.load(str(tmp_path), "normalize") is None
+
+
+def test_fuzzy_threshold_merges_misspellings():
+    index = TopicIndex("lemma")
+    canonical = index.update(["Claim processing delay"] * 2 + ["claim procesing delay"], fuzzy_threshold=0.6)
+    assert set(canonical.values()) == {"Claim processing delay"}
+
+
+async def fake_embed(store, topics, **kwargs):
+    missing = store.missing(topics)
+    rng = np.random.default_rng(len(missing))
+    store.add(missing, rng.normal(size=(len(missing), 8)))
+    return len(missing)
+
+
+def test_index_is_removed_when_canonicalization_is_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools.topic_clustering, "embed_missing_topics", fake_embed)
+    topics = [["Claim delays", "Rude staff"], ["claim delay", "App crashes"], ["Slow refunds"], ["Rude staff"]]
+    model_dir, store_dir = str(tmp_path / "model"), str(tmp_path / "embeddings")
+
+    def run(canonicalize):
+        df = pd.DataFrame({"all_topics_discussed": topics})
+        return asyncio.run(cluster_topics(
+            df, num_clusters=2, model_dir=model_dir, embedding_store_dir=store_dir, canonicalize=canonicalize,
+        ))
+
+    _, stats = run("lemma")
+    assert stats["topic_aliases_merged"] == 1
+    assert (tmp_path / "model" / INDEX_FILE).exists()
+
+    _, stats = run("none")
+    assert stats["topic_aliases_merged"] == 0
+    assert not (tmp_path / "model" / INDEX_FILE).exists()
+    assert TopicIndex.load(model_dir) is None
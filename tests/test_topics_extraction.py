@@ -0,0 +1,93 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import tools.topics_extraction
+from tools.topics_extraction import TopicExtraction, _enrich_frame
+
+
+class FakeClient:
+    """Batched (JSON-mode) requests fail; single-row requests answer from the transcript."""
+
+    def __init__(self):
+        self.single_calls = 0
+
+    async def create(self, messages, json_output=None):
+        if json_output:
+            raise ValueError("context length exceeded")
+        self.single_calls += 1
+        text = messages[-1].content.split("Text:", 1)[1].strip()
+        reply = {"topics": [text], "supporting_quote": text, "reason": "r", "sentiment": "Negative"}
+        return SimpleNamespace(content=json.dumps(reply), usage=None)
+
+    async def close(self):
+        pass
+
+
+class CrashingClient(FakeClient):
+    """Fails every single-row request after the first `calls_before_crash`."""
+
+    def __init__(self, calls_before_crash):
+        super().__init__()
+        self.calls_before_crash = calls_before_crash
+
+    async def create(self, messages, json_output=None):
+        if self.single_calls >= self.calls_before_crash:
+            raise ValueError("connection lost")
+        return await super().create(messages, json_output)
+
+
+def test_failed_batch_falls_back_to_single_rows():
+    df = pd.DataFrame({"survey_id": ["a", "b", "c"], "call_transcrpt": ["late refund", "rude agent", "app crash"]})
+    client = FakeClient()
+    stats = asyncio.run(
+        _enrich_frame(df, client, None, "call_transcrpt", asyncio.Semaphore(4), max_retries=0, batch_size=2)
+    )
+
+    assert client.single_calls == 3
+    assert stats["batched_requests"] == 2
+    assert stats["individual_retries"] == 3
+    assert df["all_topics_discussed"].tolist() == [["late refund"], ["rude agent"], ["app crash"]]
+
+
+def test_near_duplicate_members_quote_their_own_text():
+    first = "The refund for my order took three weeks to arrive, and I had to call twice. Support was polite though."
+    member = "The refund for my order took three weeks to arrive, and I had to call twice. The agent was polite though."
+    df = pd.DataFrame({"survey_id": ["a", "b"], "call_transcrpt": [first, member]})
+    asyncio.run(
+        _enrich_frame(df, FakeClient(), None, "call_transcrpt", asyncio.Semaphore(4), max_retries=0, dedup="near", near_threshold=0.5)
+    )
+
+    assert df["all_topics_discussed"].tolist() == [[first], [first]]
+    assert df["supporting_quote"].tolist() == [
+        first, "The refund for my order took three weeks to arrive, and I had to call twice."
+    ]
+
+
+def test_streaming_resumes_after_a_crash_mid_chunk(tmp_path, monkeypatch):
+    monkeypatch.setenv("SURVEY_INSIGHT_METRICS_DIR", "")
+    ids = [f"s{i}" for i in range(8)]
+    input_csv, output_csv = tmp_path / "in.csv", tmp_path / "out.csv"
+    pd.DataFrame({"survey_id": ids, "call_transcrpt": [f"issue {i}" for i in ids]}).to_csv(input_csv, index=False)
+
+    def run(client):
+        monkeypatch.setattr(tools.topics_extraction, "make_chat_client", lambda: client)
+        return asyncio.run(TopicExtraction(str(input_csv), str(output_csv), use_cache=False, chunk_size=3))
+
+    with pytest.raises(ValueError, match="connection lost"):
+        run(CrashingClient(calls_before_crash=4))  # the second chunk fails after one row
+    with open(output_csv, "a", encoding="utf-8") as f:
+        f.write("s3,issue s3,half-written")  # a chunk interrupted mid-append
+
+    client = FakeClient()
+    result = run(client)
+
+    assert result["resumed_from"] == "s2"
+    assert client.single_calls == 5
+    out = pd.read_csv(output_csv)
+    assert out["survey_id"].tolist() == ids
+    assert out["all_topics_discussed"].tolist() == [str([f"issue {i}"]) for i in ids]
+    assert output_csv.read_text(encoding="utf-8").count("survey_id,") == 1
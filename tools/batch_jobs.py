@@ -0,0 +1,224 @@
+import asyncio
+import inspect
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config.constants import MODEL_OPENAI
+from tools.llm_cache import make_cache_key
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+BATCH_BACKENDS = ("openai", "local")
+
+# How long a tool call waits for its batch before returning status "pending" (rerun to collect it).
+DEFAULT_BATCH_TIMEOUT_S = 600.0
+
+
+class BatchPending(Exception):
+    """The batch was submitted but has not finished yet; rerun with the same inputs to collect it."""
+
+    def __init__(self, batch_id: str, job_file: str, state: str = "in_progress"):
+        super().__init__(f"Batch {batch_id} is still {state} ({job_file})")
+        self.batch_id = batch_id
+        self.job_file = job_file
+        self.state = state
+
+
+def build_chat_request(custom_id: str, system: str, user: str, model: str = MODEL_OPENAI) -> Dict[str, Any]:
+    """One line of a Batch API job file: a JSON-mode chat completion tagged with `custom_id`."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": {
+            "model": model,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
+            "response_format": {"type": "json_object"},
+        },
+    }
+
+
+def parse_batch_output(text: str) -> Dict[str, Optional[str]]:
+    """Map custom_id -> assistant message content (None for rows that errored) from a batch output file."""
+    results: Dict[str, Optional[str]] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        content = None
+        if not row.get("error") and response.get("status_code", 200) == 200:
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices:
+                content = choices[0].get("message", {}).get("content")
+        results[str(row.get("custom_id"))] = content
+    return results
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: upload the job file, create a batch, poll it and download the output file."""
+
+    name = "openai"
+
+    def __init__(self, completion_window: str = "24h"):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.completion_window = completion_window
+
+    async def submit(self, job_file: str) -> str:
+        with open(job_file, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        """Results once the batch has finished, None while it is still running."""
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} {batch.status}: {batch.errors}")
+        if batch.status not in ("completed", "expired"):
+            return None
+        # Expired batches still return whatever finished; the caller retries the rest.
+        results: Dict[str, Optional[str]] = {}
+        if batch.output_file_id:
+            content = await self.client.files.content(batch.output_file_id)
+            results.update(parse_batch_output(content.text))
+        return results
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for a batch endpoint, for tests and offline runs.
+
+    `submit` copies the job file to `<work_dir>/<batch_id>/input.jsonl`. The batch is complete
+    once `output.jsonl` (Batch API output format) exists next to it. With a `responder`
+    (request body -> reply content, sync or async) the backend writes that file itself on the
+    first poll; without one, any external worker can produce it.
+    """
+
+    name = "local"
+
+    def __init__(self, work_dir: str = "data/batch/local", responder: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.work_dir = Path(work_dir)
+        self.responder = responder
+
+    async def submit(self, job_file: str) -> str:
+        batch_id = f"local-{uuid.uuid4().hex[:12]}"
+        batch_dir = self.work_dir / batch_id
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(job_file, batch_dir / "input.jsonl")
+        return batch_id
+
+    async def _respond(self, batch_dir: Path) -> None:
+        lines: List[str] = []
+        with open(batch_dir / "input.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                row: Dict[str, Any] = {"custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    content = self.responder(request["body"])
+                    if inspect.isawaitable(content):
+                        content = await content
+                    row["response"] = {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    }
+                except Exception as exc:
+                    row["error"] = {"message": str(exc)}
+                lines.append(json.dumps(row))
+        tmp = batch_dir / "output.jsonl.tmp"
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, batch_dir / "output.jsonl")
+
+    async def poll(self, batch_id: str) -> Optional[Dict[str, Optional[str]]]:
+        batch_dir = self.work_dir / batch_id
+        output = batch_dir / "output.jsonl"
+        if not output.exists() and self.responder is not None:
+            await self._respond(batch_dir)
+        if not output.exists():
+            return None
+        return parse_batch_output(output.read_text(encoding="utf-8"))
+
+    async def close(self) -> None:
+        pass
+
+
+def get_batch_backend(name: str, job_dir: str = "data/batch", responder: Optional[Callable[[Dict[str, Any]], Any]] = None):
+    """
+    Backend by name. "local" keeps its batches under `<job_dir>/local`; without a `responder` they
+    stay pending until an external worker writes their output.jsonl.
+    """
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend(os.path.join(job_dir, "local"), responder)
+    raise ValueError(f"Unknown batch backend '{name}' (expected one of {BATCH_BACKENDS})")
+
+
+class OfflineBatch:
+    """
+    Runs a set of chat requests as one batch job and returns `{custom_id: content or None}`.
+
+    The job file and a small state file (`<kind>-<hash>.jsonl` / `.state.json`) are written to
+    `job_dir`; the hash covers every request, so rerunning the same work after a timeout or crash
+    picks up the already-submitted batch instead of submitting it again. Both files are removed
+    once the results are collected.
+    """
+
+    def __init__(
+        self,
+        backend,
+        job_dir: str = "data/batch",
+        poll_interval: float = 30.0,
+        timeout_s: Optional[float] = None,
+    ):
+        self.backend = backend
+        self.job_dir = Path(job_dir)
+        self.poll_interval = poll_interval
+        self.timeout_s = timeout_s
+
+    async def run(self, kind: str, requests: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        if not requests:
+            return {}
+        lines = [json.dumps(r, ensure_ascii=False, sort_keys=True) for r in requests]
+        job_hash = make_cache_key(kind, self.backend.name, *lines)[:16]
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        job_file = self.job_dir / f"{kind}-{job_hash}.jsonl"
+        state_file = self.job_dir / f"{kind}-{job_hash}.state.json"
+
+        if state_file.exists():
+            batch_id = json.loads(state_file.read_text(encoding="utf-8"))["batch_id"]
+        else:
+            job_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            batch_id = await self.backend.submit(str(job_file))
+            tmp = state_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"batch_id": batch_id, "backend": self.backend.name, "requests": len(lines)}), encoding="utf-8")
+            os.replace(tmp, state_file)
+
+        start = time.monotonic()
+        while True:
+            results = await self.backend.poll(batch_id)
+            if results is not None:
+                break
+            if self.timeout_s is not None and time.monotonic() - start >= self.timeout_s:
+                raise BatchPending(batch_id, str(job_file))
+            await asyncio.sleep(self.poll_interval)
+
+        for path in (state_file, job_file):
+            if path.exists():
+                path.unlink()
+        return results
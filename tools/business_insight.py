@@ -1,13 +1,37 @@
-from typing import Dict, Any, List
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
+from tools.metrics import instrumented
+from tools.normalized_output import is_normalized, read_mentions
+from tools.table_io import read_table, resolve_path
 
+# Only these columns are needed for the aggregates; Parquet inputs read nothing else.
+INSIGHT_COLUMNS = ["general_topic_l1", "topic_discussed", "product", "customer_sentiment", "Date"]
+
+# File names of the four charts, in the order they are returned.
+PLOT_FILES = (
+    "plot_top_pain_points.png",
+    "heatmap_pain_points_by_product.png",
+    "theme_severity_stacked.png",
+    "theme_trends_over_time.png",
+)
+
+
+@instrumented("businessInsight")
 async def businessInsight(
     input_csv_path: str = "data/output.csv",
     top_n: int = 5,
+    file_format: str = "csv",
+    parallel: bool = True,
+    dpi: int = 150,
+    output_dir: str = "data",
 ) -> Dict[str, Any]:
     """
     Step 4: Business Insights & Plots 
@@ -19,27 +43,117 @@ async def businessInsight(
       3) Theme Severity (100% stacked bar by sentiment share)
       4) Theme Trends Over Time (line chart by month for top N themes)
 
-    Saves PNGs to the data/ directory and returns their file paths.
+    Saves PNGs to `output_dir` (the data/ directory by default) and returns their file paths.
+    With `file_format="parquet"` the `.parquet` sibling of `input_csv_path` is read, columns only.
+    `input_csv_path` may also be a normalized output directory from ClusterLabelling
+    (`output_layout="normalized"`); the mention rows are then joined from its tables.
+
+    All four plots are drawn from one theme x product x sentiment x month count cube computed in a
+    single pass; with `parallel=True` they are rendered concurrently in worker processes.
     """
-    df = pd.read_csv(input_csv_path)
+    if is_normalized(input_csv_path):
+        df = await asyncio.to_thread(read_mentions, input_csv_path, columns=INSIGHT_COLUMNS)
+    else:
+        input_csv_path = resolve_path(input_csv_path, file_format)
+        df = await asyncio.to_thread(read_table, input_csv_path, columns=INSIGHT_COLUMNS, list_columns=[])
+    plots = await asyncio.to_thread(build_insight_plots, df, top_n, parallel, dpi, output_dir)
+
+    return {
+        "status": "success",
+        "plots": plots,
+        "top_n": int(top_n),
+        "input_path": input_csv_path,
+    }
+
+
+def to_month(dates: pd.Series) -> pd.Series:
+    """First day of the month of each date string (NaT if unparsable)."""
+    # Parse each distinct date string once instead of once per (exploded) row.
+    unique_dates = pd.unique(dates.dropna())
+    months = pd.to_datetime(pd.Series(unique_dates), errors="coerce").dt.to_period("M").dt.to_timestamp()
+    return pd.to_datetime(dates.map(pd.Series(months.to_numpy(), index=unique_dates)))
+
+
+def build_insight_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Single groupby over the exploded frame: mention counts per
+    (general_topic_l1, product, customer_sentiment, month). Missing keys (e.g. unparsable dates)
+    are kept as NaN so every plot can be derived from the cube alone.
+    """
+    keys = pd.DataFrame({
+        "general_topic_l1": df["general_topic_l1"].astype("category"),
+        "product": df["product"].astype("category"),
+        "customer_sentiment": df["customer_sentiment"].astype("category"),
+        "month": to_month(df["Date"]),
+    })
+    return (
+        keys.groupby(list(keys.columns), observed=True, dropna=False)
+        .size()
+        .rename("count")
+        .reset_index()
+    )
+
+
+def _plot_data(cube: pd.DataFrame, top_n: int) -> Tuple[pd.Series, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Derive the four plot inputs (top themes, product heatmap, sentiment shares, monthly trend) from the cube."""
+    themed = cube.dropna(subset=["general_topic_l1"])
 
     # 1) Top N Customer Pain Points
-    top_counts = (
-        df.groupby("general_topic_l1").size().sort_values(ascending=False).head(top_n)
+    top_counts = themed.groupby("general_topic_l1", observed=True)["count"].sum().sort_values(ascending=False).head(top_n)
+    top_themes = top_counts.index.tolist()
+
+    # 2) Pain Points by Product (heatmap)
+    cross = (
+        themed.dropna(subset=["product"])
+        .groupby(["general_topic_l1", "product"], observed=True)["count"].sum()
+        .unstack(fill_value=0)
     )
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
-    top_counts.iloc[::-1].plot(kind="barh", ax=ax1, color="#4C78A8")
+
+    # 3) Theme Severity (Negative Share) - 100% stacked bar by sentiment
+    sentiment_counts = (
+        themed.dropna(subset=["customer_sentiment"])
+        .groupby(["general_topic_l1", "customer_sentiment"], observed=True)["count"].sum()
+        .unstack(fill_value=0)
+    )
+    sentiment_counts = sentiment_counts.reindex(columns=["Negative", "Neutral", "Positive"], fill_value=0)
+    sentiment_props = sentiment_counts.div(sentiment_counts.sum(axis=1), axis=0).fillna(0)
+    # limit to top N themes by volume for readability
+    sentiment_props_top = sentiment_props.loc[[t for t in sentiment_props.index if t in top_themes]]
+
+    # 4) Theme Trends Over Time (monthly counts by theme for top N)
+    dated = themed.dropna(subset=["month"])
+    trend = (
+        dated[dated["general_topic_l1"].isin(top_themes)]
+        .groupby(["month", "general_topic_l1"], observed=True)["count"].sum()
+        .reset_index()
+    )
+    trend["general_topic_l1"] = trend["general_topic_l1"].astype(str)
+    return top_counts, cross, sentiment_props_top, trend
+
+
+def _figure(figsize: Tuple[float, float]):
+    # matplotlib is only imported once something is actually rendered.
+    from matplotlib.figure import Figure
+
+    return Figure(figsize=figsize)
+
+
+def _render_top_pain_points(top_counts: pd.Series, top_n: int, path: str, dpi: int) -> str:
+    fig1 = _figure(figsize=(10, 6))
+    ax1 = fig1.subplots()
+    bars = top_counts.iloc[::-1]
+    ax1.barh([str(t) for t in bars.index], bars.values, color="#4C78A8")
     ax1.set_title(f"Top {top_n} Customer Pain Points")
     ax1.set_xlabel("Count")
     ax1.set_ylabel("Theme (general_topic_l1)")
     fig1.tight_layout()
-    p1 = "data/plot_top_pain_points.png"
-    fig1.savefig(p1, dpi=150)
-    plt.close(fig1)
+    fig1.savefig(path, dpi=dpi)
+    return path
 
-    # 2) Pain Points by Product (heatmap)
-    cross = df.pivot_table(index="general_topic_l1", columns="product", values="topic_discussed", aggfunc="count", fill_value=0)
-    fig2, ax2 = plt.subplots(figsize=(max(8, 0.6 * (cross.shape[1] + 4)), max(6, 0.4 * (cross.shape[0] + 4))))
+
+def _render_product_heatmap(cross: pd.DataFrame, path: str, dpi: int) -> str:
+    fig2 = _figure(figsize=(max(8, 0.6 * (cross.shape[1] + 4)), max(6, 0.4 * (cross.shape[0] + 4))))
+    ax2 = fig2.subplots()
     im = ax2.imshow(cross.values, aspect="auto", cmap="Blues")
     ax2.set_yticks(range(cross.shape[0]))
     ax2.set_yticklabels(cross.index.tolist())
@@ -48,57 +162,119 @@ async def businessInsight(
     ax2.set_title("Pain Points by Product (Counts)")
     fig2.colorbar(im, ax=ax2, label="Count")
     fig2.tight_layout()
-    p2 = "data/heatmap_pain_points_by_product.png"
-    fig2.savefig(p2, dpi=150)
-    plt.close(fig2)
+    fig2.savefig(path, dpi=dpi)
+    return path
 
-    # 3) Theme Severity (Negative Share) - 100% stacked bar by sentiment
-    sentiment_counts = df.groupby(["general_topic_l1", "customer_sentiment"]).size().unstack(fill_value=0)
-    sentiment_counts = sentiment_counts.reindex(columns=["Negative", "Neutral", "Positive"], fill_value=0)
-    sentiment_props = sentiment_counts.div(sentiment_counts.sum(axis=1), axis=0).fillna(0)
-    # limit to top N themes by volume for readability
-    top_themes = top_counts.index.tolist()
-    sentiment_props_top = sentiment_props.loc[[t for t in sentiment_props.index if t in top_themes]]
-    fig3, ax3 = plt.subplots(figsize=(10, 6))
+
+def _render_theme_severity(sentiment_props_top: pd.DataFrame, path: str, dpi: int) -> str:
+    fig3 = _figure(figsize=(10, 6))
+    ax3 = fig3.subplots()
     bottom = np.zeros(len(sentiment_props_top))
     colors = {"Negative": "#E45756", "Neutral": "#F2CF5B", "Positive": "#72B7B2"}
+    labels = [str(t) for t in sentiment_props_top.index]
     for sent in ["Negative", "Neutral", "Positive"]:
         vals = sentiment_props_top[sent].values
-        ax3.bar(sentiment_props_top.index, vals, bottom=bottom, label=sent, color=colors[sent])
+        ax3.bar(labels, vals, bottom=bottom, label=sent, color=colors[sent])
         bottom += vals
     ax3.set_title("Theme Severity by Sentiment (Share)")
     ax3.set_ylabel("Share of Mentions")
     ax3.set_xlabel("Theme (Top)")
     ax3.legend(title="Sentiment")
-    plt.setp(ax3.get_xticklabels(), rotation=30, ha="right")
+    for label in ax3.get_xticklabels():
+        label.set_rotation(30)
+        label.set_ha("right")
     fig3.tight_layout()
-    p3 = "data/theme_severity_stacked.png"
-    fig3.savefig(p3, dpi=150)
-    plt.close(fig3)
+    fig3.savefig(path, dpi=dpi)
+    return path
 
-    # 4) Theme Trends Over Time (monthly counts by theme for top N)
-    dft = df.copy()
-    dft["Date"] = pd.to_datetime(dft["Date"], errors="coerce")
-    dft = dft.dropna(subset=["Date"])  # minimal; no extra handling
-    dft["month"] = dft["Date"].dt.to_period("M").dt.to_timestamp()
-    dft_top = dft[dft["general_topic_l1"].isin(top_themes)]
-    trend = dft_top.groupby(["month", "general_topic_l1"]).size().reset_index(name="count")
-    fig4, ax4 = plt.subplots(figsize=(10, 6))
+
+def _render_theme_trends(trend: pd.DataFrame, top_themes: List[str], path: str, dpi: int) -> str:
+    fig4 = _figure(figsize=(10, 6))
+    ax4 = fig4.subplots()
     for theme in top_themes:
-        sub = trend[trend["general_topic_l1"] == theme]
+        sub = trend[trend["general_topic_l1"] == str(theme)]
         ax4.plot(sub["month"], sub["count"], marker="o", label=theme)
     ax4.set_title("Theme Trends Over Time (Top Themes)")
     ax4.set_ylabel("Mentions per Month")
     ax4.set_xlabel("Month")
     ax4.legend(title="Theme", bbox_to_anchor=(1.04, 1), loc="upper left")
     fig4.tight_layout()
-    p4 = "data/theme_trends_over_time.png"
-    fig4.savefig(p4, dpi=150)
-    plt.close(fig4)
+    fig4.savefig(path, dpi=dpi)
+    return path
 
-    return {
-        "status": "success",
-        "plots": [p1, p2, p3, p4],
-        "top_n": int(top_n),
-        "input_path": input_csv_path,
-    }
+
+def _call(job: Tuple[Any, tuple]) -> str:
+    fn, args = job
+    return fn(*args)
+
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+# Jobs render from several threads at once; only one of them may create (or drop) the pool.
+_render_pool_lock = threading.Lock()
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Long-lived pool of spawned workers (spawn avoids forking a threaded server process)."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _render_pool
+
+
+def _drop_render_pool(pool: Optional[ProcessPoolExecutor]) -> None:
+    """Forget a broken pool so the next call starts a new one (unless another thread already did)."""
+    global _render_pool
+    with _render_pool_lock:
+        if pool is not None and _render_pool is pool:
+            _render_pool = None
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def warm_render_pool() -> None:
+    """Spawn the plot workers (and import this module in them) ahead of the first request."""
+    if RENDER_WORKERS <= 1:
+        return
+    pool = None
+    try:
+        pool = _get_render_pool()
+        list(pool.map(_worker_pid, range(RENDER_WORKERS)))
+    except (OSError, RuntimeError):
+        _drop_render_pool(pool)
+
+
+def build_insight_plots(
+    df: pd.DataFrame,
+    top_n: int = 5,
+    parallel: bool = True,
+    dpi: int = 150,
+    output_dir: str = "data",
+) -> List[str]:
+    """In-memory Step 4: draws the four plots from the exploded frame into `output_dir` and returns their paths."""
+    cube = build_insight_cube(df)
+    top_counts, cross, sentiment_props_top, trend = _plot_data(cube, top_n)
+
+    os.makedirs(output_dir, exist_ok=True)
+    top_path, heatmap_path, severity_path, trends_path = (os.path.join(output_dir, f) for f in PLOT_FILES)
+    jobs = [
+        (_render_top_pain_points, (top_counts, top_n, top_path, dpi)),
+        (_render_product_heatmap, (cross, heatmap_path, dpi)),
+        (_render_theme_severity, (sentiment_props_top, severity_path, dpi)),
+        (_render_theme_trends, (trend, top_counts.index.tolist(), trends_path, dpi)),
+    ]
+    if parallel and RENDER_WORKERS > 1:
+        pool = None
+        try:
+            pool = _get_render_pool()
+            return list(pool.map(_call, jobs))
+        except (OSError, RuntimeError):
+            # No worker processes available (sandbox, broken pool): fall back to rendering inline.
+            _drop_render_pool(pool)
+    return [_call(job) for job in jobs]
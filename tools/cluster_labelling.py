@@ -1,22 +1,267 @@
-import ast
-import json
-from typing import Dict, Any, List
+import asyncio
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_core.models import SystemMessage, UserMessage, ModelInfo
 from dotenv import load_dotenv
 
 from config.constants import MODEL_OPENAI
+from tools.batch_jobs import DEFAULT_BATCH_TIMEOUT_S, BatchPending, OfflineBatch, build_chat_request, get_batch_backend
+from tools.cluster_model import ClusterModel, model_dir_for
+from tools.insight_index import InsightIndex, index_dir_for
+from tools.llm_cache import LLMCache, make_cache_key
+from tools.llm_utils import call_with_retries, estimate_request_tokens, make_chat_client, parse_json_content
+from tools.metrics import instrumented
+from tools.normalized_output import OUTPUT_LAYOUTS, build_normalized, normalized_dir_for, write_normalized
+from tools.table_io import read_table, resolve_path, write_table
+from tools.topic_canon import TopicIndex
+
+if TYPE_CHECKING:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
 
 load_dotenv()
 
 
+LABEL_PROMPT = (
+    "You assign a single short, business-friendly theme label for a cluster of insurance survey topics.\n"
+    "You will be given a semicolon-separated sample of topic phrases from the `all_topics_discussed` column that all belong to the SAME cluster.\n"
+    "Requirements:\n"
+    "- 2–5 words, noun phrase, business-friendly.\n"
+    "- Generalize across the listed topics (no quotes, no IDs, no counts).\n"
+    "- Avoid product/channel names and sentiment words unless central to the theme.\n"
+    "- Capture the shared theme succinctly; avoid repeating the example phrases verbatim.\n"
+    "Return STRICT JSON only (no markdown fences, no extra text): {\"label\": \"<Label>\"}.\n\n"
+    "Example 1:\n"
+    "Topics in cluster (from all_topics_discussed): Confusing claims process; Unclear claim steps; Too many claim forms\n"
+    "Output: {\"label\": \"Claims process complexity\"}\n\n"
+    "Example 2:\n"
+    "Topics in cluster (from all_topics_discussed): Long claim processing time; Slow payouts\n"
+    "Output: {\"label\": \"Claims turnaround delays\"}"
+)
+
+# Number of most frequent topics shown to the model (and fingerprinted) per cluster.
+REPRESENTATIVE_TOPICS = 12
+
+# Expected size of a {"label": ...} reply, reserved from the tokens-per-minute quota.
+LABEL_COMPLETION_TOKENS = 20
+
+
+def _representative_topics(topics: List[str]) -> List[str]:
+    """Most frequent distinct topics of a cluster (ties broken alphabetically), deterministic across runs."""
+    counts = Counter(topics)
+    return sorted(counts, key=lambda t: (-counts[t], t))[:REPRESENTATIVE_TOPICS]
+
+
+def _label_user_message(topics: List[str]) -> str:
+    return f"Topics in cluster (from all_topics_discussed): {'; '.join(topics)}"
+
+
+def _parse_label(content: Any) -> Optional[str]:
+    """The label from a JSON reply, or None if the reply is missing or malformed."""
+    try:
+        data = parse_json_content(content) if content else None
+    except ValueError:
+        return None
+    label = data.get("label") if isinstance(data, dict) else None
+    return label.strip() if isinstance(label, str) and label.strip() else None
+
+
+async def _label_one(
+    client: "OpenAIChatCompletionClient",
+    topics: List[str],
+    semaphore: asyncio.Semaphore,
+    max_retries: int,
+) -> Optional[str]:
+    """The label for one cluster, or None if the reply is not a usable {"label": ...} object."""
+    from autogen_core.models import SystemMessage, UserMessage
+
+    messages = [
+        SystemMessage(content=LABEL_PROMPT),
+        UserMessage(content=_label_user_message(topics), source="user"),
+    ]
+    async with semaphore:
+        result = await call_with_retries(
+            lambda: client.create(messages), max_retries=max_retries,
+            quota="chat", tokens=estimate_request_tokens(messages, LABEL_COMPLETION_TOKENS),
+        )
+    return _parse_label(result.content)
+
+
+def explode_topics(
+    df: pd.DataFrame,
+    topics_series: pd.Series,
+    cluster_ids_series: pd.Series,
+    cluster_labels: Dict[int, str],
+    canonical: Optional[Dict[str, str]] = None,
+) -> pd.DataFrame:
+    """
+    One row per (response, topic): repeats each response row once per topic and adds
+    `topic_discussed` and `general_topic_l1` (plus `topic_canonical` when a `canonical` alias map
+    is given). Works column-wise on the already parsed list series instead of building a dict per
+    topic row.
+    """
+    topic_lists = topics_series.tolist()
+    id_lists = cluster_ids_series.tolist()
+    # Topics and ids are parallel lists; zip semantics if they ever disagree in length.
+    counts = np.fromiter((min(len(t), len(c)) for t, c in zip(topic_lists, id_lists)), dtype=np.int64, count=len(df))
+
+    out_df = df.iloc[np.repeat(np.arange(len(df)), counts)].reset_index(drop=True)
+    out_df["topic_discussed"] = [t for lst, n in zip(topic_lists, counts) for t in lst[:n]]
+    cluster_ids = pd.Series([int(c) for lst, n in zip(id_lists, counts) for c in lst[:n]], dtype="int64")
+    out_df["general_topic_l1"] = cluster_ids.map(cluster_labels).to_numpy()
+    if canonical is not None:
+        out_df["topic_canonical"] = out_df["topic_discussed"].map(canonical).to_numpy()
+    return out_df
+
+
+async def assign_cluster_labels(
+    df: pd.DataFrame,
+    topics_column: str = "all_topics_discussed",
+    cluster_ids_column: str = "topic_cluster_ids",
+    delta: bool = False,
+    model_dir: str = "data/cache/cluster_model",
+    max_concurrency: int = 8,
+    max_retries: int = 5,
+    use_cache: bool = True,
+    cache_path: str = "data/cache/llm_cache.sqlite",
+    offline: Optional[OfflineBatch] = None,
+) -> Tuple[Dict[int, str], Optional[Dict[str, str]], Dict[str, Any]]:
+    """
+    Labels the clusters of `df` (list columns already parsed). Returns cluster id -> label, the
+    topic -> canonical phrase map (None without a topic index) and the labelling stats.
+    With `offline`, the label requests go through a batch job (custom_id `cluster-<id>`).
+    """
+    topics_series = df[topics_column]
+    cluster_ids_series = df[cluster_ids_column]
+
+    # Count topics by their canonical phrase (from TopicClustering's index), so spelling variants
+    # neither crowd out other representatives nor change a cluster's fingerprint.
+    index = TopicIndex.load(model_dir)
+    canonical = {t: index.lookup(t) for t in {str(t) for lst in topics_series for t in lst}} if index else None
+    clusters: Dict[int, List[str]] = {}
+    for topics, ids in zip(topics_series, cluster_ids_series):
+        for t, cid in zip(topics, ids):
+            t = str(t)
+            clusters.setdefault(int(cid), []).append(canonical[t] if canonical else t)
+
+    model = ClusterModel.load(model_dir)
+    cluster_labels: Dict[int, str] = {}
+    if delta and model is not None:
+        cluster_labels = {cid: model.labels[cid] for cid in clusters if cid in model.labels}
+    reused = len(cluster_labels)
+
+    # Fingerprint each cluster by its representative topics so unchanged clusters reuse their label.
+    representatives = {cid: _representative_topics(tlist) for cid, tlist in clusters.items()}
+    fingerprints = {
+        cid: make_cache_key("cluster_label", LABEL_PROMPT, MODEL_OPENAI, "\n".join(sorted(reps)))
+        for cid, reps in representatives.items()
+    }
+    cache = LLMCache(cache_path) if use_cache else None
+    cached = cache.get_many(fingerprints[cid] for cid in clusters if cid not in cluster_labels) if cache else {}
+    for cid in clusters:
+        if cid not in cluster_labels and fingerprints[cid] in cached:
+            cluster_labels[cid] = cached[fingerprints[cid]]
+    cached_count = len(cluster_labels) - reused
+    to_label = {cid: representatives[cid] for cid in clusters if cid not in cluster_labels}
+
+    client = make_chat_client()
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+    fallbacks = set()
+
+    async def run_one(cid: int, topics: List[str]) -> None:
+        label = await _label_one(client, topics, semaphore, max_retries)
+        if label is None:
+            # A malformed reply must not discard the other labels: use the cluster's most frequent
+            # topic, neither cached nor saved on the model, so the next run asks again.
+            fallbacks.add(cid)
+            cluster_labels[cid] = topics[0]
+        else:
+            store(cid, label)
+
+    def store(cid: int, label: str) -> None:
+        cluster_labels[cid] = label
+        if cache:
+            cache.put(fingerprints[cid], label)
+
+    try:
+        remaining = dict(to_label)
+        if offline is not None and remaining:
+            requests = [
+                build_chat_request(f"cluster-{cid}", LABEL_PROMPT, _label_user_message(topics))
+                for cid, topics in remaining.items()
+            ]
+            replies = await offline.run("cluster_labelling", requests)
+            for cid in list(remaining):
+                label = _parse_label(replies.get(f"cluster-{cid}"))
+                if label:
+                    store(cid, label)
+                    del remaining[cid]
+        outcomes = await asyncio.gather(*(run_one(cid, t) for cid, t in remaining.items()), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+    finally:
+        await client.close()
+        if cache:
+            cache.close()
+
+    if model is not None:
+        # Save onto the model as it is now: a concurrent call may have refit it while labels were
+        # requested, and those clusters are not the ones labelled here.
+        latest = ClusterModel.load(model_dir)
+        if latest is not None and latest.fitted_at == model.fitted_at:
+            latest.labels.update({cid: label for cid, label in cluster_labels.items() if cid not in fallbacks})
+            latest.save(model_dir)
+
+    return cluster_labels, canonical, {
+        "clusters": len(cluster_labels),
+        "model": MODEL_OPENAI,
+        "labels_reused": int(reused),
+        "labels_cached": int(cached_count),
+        "labels_requested": int(len(to_label)),
+        "labels_offline": int(len(to_label) - len(remaining)) if offline is not None else 0,
+        "labels_fallback": len(fallbacks),
+    }
+
+
+async def label_clusters(
+    df: pd.DataFrame,
+    topics_column: str = "all_topics_discussed",
+    cluster_ids_column: str = "topic_cluster_ids",
+    **label_kwargs: Any,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    In-memory Step 3: labels the clusters of `df` and returns the exploded one-row-per-topic frame
+    with the labelling stats. See assign_cluster_labels / ClusterLabelling for the options.
+    """
+    cluster_labels, canonical, stats = await assign_cluster_labels(df, topics_column, cluster_ids_column, **label_kwargs)
+    out_df = explode_topics(df, df[topics_column], df[cluster_ids_column], cluster_labels, canonical)
+    return out_df, {**stats, "total_rows": len(out_df)}
+
+
+@instrumented("ClusterLabelling")
 async def ClusterLabelling(
     input_csv_path: str = "data/df_with_clusters.csv",
     output_csv_path: str = "data/output.csv",
     topics_column: str = "all_topics_discussed",
     cluster_ids_column: str = "topic_cluster_ids",
+    delta: bool = False,
+    model_dir: Optional[str] = None,
+    max_concurrency: int = 8,
+    max_retries: int = 5,
+    use_cache: bool = True,
+    cache_path: str = "data/cache/llm_cache.sqlite",
+    file_format: str = "csv",
+    offline_backend: Optional[str] = None,
+    batch_job_dir: str = "data/batch",
+    poll_interval: float = 30.0,
+    batch_timeout_s: Optional[float] = DEFAULT_BATCH_TIMEOUT_S,
+    output_layout: str = "exploded",
+    normalized_dir: Optional[str] = None,
+    build_index: bool = True,
+    index_dir: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Step 3: Cluster Labelling / Theme Definition (simple, straightforward implementation)
@@ -24,70 +269,99 @@ async def ClusterLabelling(
     - Reads the clustered CSV from Step 2 containing per-row topics and parallel cluster IDs.
     - Builds cluster -> topics mapping and uses an LLM to assign a short business-friendly label per cluster.
     - Explodes to one row per topic with columns: `topic_discussed` and `general_topic_l1` (cluster label).
+    - If TopicClustering saved a topic index in `model_dir`, clusters are summarised by canonical topic
+      phrases and a `topic_canonical` column is added.
     - Writes the enriched, labeled CSV to `output_csv_path`.
-    """
-    df = pd.read_csv(input_csv_path)
 
-    topics_series = df[topics_column].apply(ast.literal_eval)
-    cluster_ids_series = df[cluster_ids_column].apply(ast.literal_eval)
+    Labels are saved alongside the cluster model in `model_dir` (default `cache/cluster_model/` next
+    to the input, where TopicClustering saved it). With `delta=True`, clusters that
+    already have a saved label keep it and only new clusters are sent to the LLM.
 
-    clusters: Dict[int, List[str]] = {}
-    for topics, ids in zip(topics_series, cluster_ids_series):
-        for t, cid in zip(topics, ids):
-            clusters.setdefault(int(cid), []).append(str(t))
+    Label requests run concurrently (at most `max_concurrency` in flight) and are cached by a
+    fingerprint of each cluster's representative topics, so unchanged clusters reuse their label.
 
-    client = OpenAIChatCompletionClient(
-        model=MODEL_OPENAI,
-        model_info=ModelInfo(vision=False, function_calling=True, json_output=True, structured_output=True, family="openai"),
-    )
+    `file_format="parquet"` reads the Parquet output of Step 2 and additionally writes the labelled
+    data as Parquet next to `output_csv_path`; the CSV is always produced as the final export.
 
-    cluster_labels: Dict[int, str] = {}
-    for cid, tlist in clusters.items():
-        prompt = (
-            "You assign a single short, business-friendly theme label for a cluster of insurance survey topics.\n"
-            "You will be given a semicolon-separated sample of topic phrases from the `all_topics_discussed` column that all belong to the SAME cluster.\n"
-            "Requirements:\n"
-            "- 2–5 words, noun phrase, business-friendly.\n"
-            "- Generalize across the listed topics (no quotes, no IDs, no counts).\n"
-            "- Avoid product/channel names and sentiment words unless central to the theme.\n"
-            "- Capture the shared theme succinctly; avoid repeating the example phrases verbatim.\n"
-            "Return STRICT JSON only (no markdown fences, no extra text): {\"label\": \"<Label>\"}.\n\n"
-            "Example 1:\n"
-            "Topics in cluster (from all_topics_discussed): Confusing claims process; Unclear claim steps; Too many claim forms\n"
-            "Output: {\"label\": \"Claims process complexity\"}\n\n"
-            "Example 2:\n"
-            "Topics in cluster (from all_topics_discussed): Long claim processing time; Slow payouts\n"
-            "Output: {\"label\": \"Claims turnaround delays\"}"
+    `offline_backend="openai"` / `"local"` sends the label requests as one batch job (see
+    TopicExtraction); labels the batch fails to return are requested directly. If the batch is
+    still running after `batch_timeout_s`, `status="pending"` is returned and nothing is written.
+
+    `output_layout="normalized"` writes, instead of the exploded CSV, a directory (`normalized_dir`,
+    default `<output stem>_normalized/`) with a `responses` table (one row per survey_id), a compact
+    `topic_mentions` fact table (survey_id, topic_id, cluster_id) and the `topics` / `themes` label
+    dimensions, as CSV or Parquet per `file_format`; `output_path` is then that directory, which
+    businessInsight reads directly. `"both"` writes the exploded CSV and the normalized tables.
+
+    With `build_index=True` the theme x product x channel x state x sentiment x month aggregates are
+    saved to `index_dir` (default `insight_index/` next to the output) for the queryInsights tool.
+    """
+    if output_layout not in OUTPUT_LAYOUTS:
+        raise ValueError(f"Unknown output_layout '{output_layout}' (expected one of {OUTPUT_LAYOUTS})")
+    input_csv_path = resolve_path(input_csv_path, file_format)
+    model_dir = model_dir or model_dir_for(input_csv_path)
+    # Reading, exploding and writing run in worker threads so concurrent tool calls on the server keep going.
+    df = await asyncio.to_thread(read_table, input_csv_path, list_columns=[topics_column, cluster_ids_column])
+
+    offline = None
+    if offline_backend:
+        offline = OfflineBatch(
+            get_batch_backend(offline_backend, batch_job_dir), batch_job_dir, poll_interval, batch_timeout_s
         )
-        sample = "; ".join(list(dict.fromkeys(tlist))[:12])
-        messages = [
-            SystemMessage(content=prompt),
-            UserMessage(content=f"Topics in cluster (from all_topics_discussed): {sample}", source="user"),
-        ]
-        result = await client.create(messages)
-        content = result.content if isinstance(result.content, str) else "{}"
-        label = json.loads(content)["label"]
-        cluster_labels[int(cid)] = label
-
-    await client.close()
-
-    rows = []
-    for _, row in df.iterrows():
-        topics = ast.literal_eval(row[topics_column])
-        ids = ast.literal_eval(row[cluster_ids_column])
-        for t, cid in zip(topics, ids):
-            r = row.to_dict()
-            r["topic_discussed"] = t
-            r["general_topic_l1"] = cluster_labels[int(cid)]
-            rows.append(r)
+    try:
+        cluster_labels, canonical, stats = await assign_cluster_labels(
+            df,
+            topics_column=topics_column,
+            cluster_ids_column=cluster_ids_column,
+            delta=delta,
+            model_dir=model_dir,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            use_cache=use_cache,
+            cache_path=cache_path,
+            offline=offline,
+        )
+    except BatchPending as pending:
+        return {
+            "status": "pending",
+            "batch_id": pending.batch_id,
+            "job_file": pending.job_file,
+            "output_path": output_csv_path,
+            "message": "Batch submitted and still running; call ClusterLabelling again with the same input to collect it.",
+        }
+    finally:
+        if offline:
+            await offline.backend.close()
 
-    out_df = pd.DataFrame(rows)
-    out_df.to_csv(output_csv_path, index=False)
+    parquet_path = None
+    normalized_paths = None
+    if output_layout != "normalized":
+        out_df = await asyncio.to_thread(
+            explode_topics, df, df[topics_column], df[cluster_ids_column], cluster_labels, canonical
+        )
+        stats["total_rows"] = len(out_df)
+        await asyncio.to_thread(write_table, out_df, output_csv_path, list_columns=[topics_column, cluster_ids_column])
+        if file_format == "parquet":
+            parquet_path = resolve_path(output_csv_path, "parquet")
+            await asyncio.to_thread(write_table, out_df, parquet_path, list_columns=[topics_column, cluster_ids_column])
+    if output_layout != "exploded":
+        normalized_dir = normalized_dir or normalized_dir_for(output_csv_path)
+        tables = await asyncio.to_thread(build_normalized, df, cluster_labels, topics_column, cluster_ids_column, canonical)
+        normalized_paths = await asyncio.to_thread(write_normalized, tables, normalized_dir, file_format)
+        stats["total_rows"] = len(tables["topic_mentions"])
+    if build_index:
+        index_dir = index_dir or index_dir_for(output_csv_path)
+        index = await asyncio.to_thread(InsightIndex.build, df, cluster_labels, cluster_ids_column)
+        await asyncio.to_thread(index.save, index_dir)
+    if output_layout == "normalized":
+        output_csv_path = normalized_dir
 
     return {
         "status": "success",
-        "clusters": len(cluster_labels),
+        "clusters": stats.pop("clusters"),
         "output_path": output_csv_path,
-        "total_rows": len(out_df),
-        "model": MODEL_OPENAI,
+        "parquet_path": parquet_path,
+        "normalized_paths": normalized_paths,
+        "insight_index_dir": index_dir if build_index else None,
+        **stats,
     }
@@ -0,0 +1,119 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def model_dir_for(data_path: str) -> str:
+    """Default model location next to the Step 2 output: data/df_with_clusters.csv -> data/cache/cluster_model."""
+    return str(Path(data_path).parent / "cache" / "cluster_model")
+
+
+class ClusterModel:
+    """
+    Persisted clustering state used by delta runs.
+
+    - centroids        : float32 (k x dim) cluster centres in embedding space
+    - topic_to_cluster : cluster id of every topic assigned so far
+    - labels           : cluster id -> theme label (filled in by ClusterLabelling)
+    - radius           : 95th percentile distance of fitted topics to their centroid; new topics
+                         farther than this count towards drift
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        topic_to_cluster: Dict[str, int],
+        radius: float,
+        embedding_model: str,
+        labels: Optional[Dict[int, str]] = None,
+        fitted_at: Optional[str] = None,
+    ):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.topic_to_cluster = topic_to_cluster
+        self.radius = float(radius)
+        self.embedding_model = embedding_model
+        self.labels: Dict[int, str] = labels or {}
+        self.fitted_at = fitted_at or datetime.now().isoformat(timespec="seconds")
+
+    @property
+    def num_clusters(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def fit_from_assignments(
+        cls,
+        topics: list,
+        embeddings: np.ndarray,
+        assignments: np.ndarray,
+        embedding_model: str,
+    ) -> "ClusterModel":
+        """Build a model from a fresh clustering: centroids are the member means in embedding space."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        assignments = np.asarray(assignments)
+        cluster_ids = np.unique(assignments)
+        centroids = np.zeros((int(cluster_ids.max()) + 1, embeddings.shape[1]), dtype=np.float32)
+        for cid in cluster_ids:
+            centroids[cid] = embeddings[assignments == cid].mean(axis=0)
+        distances = np.linalg.norm(embeddings - centroids[assignments], axis=1)
+        radius = float(np.percentile(distances, 95)) if len(distances) else 0.0
+        return cls(
+            centroids=centroids,
+            topic_to_cluster={t: int(c) for t, c in zip(topics, assignments)},
+            radius=radius,
+            embedding_model=embedding_model,
+        )
+
+    def assign(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest-centroid cluster ids and distances for `embeddings`."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(embeddings) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32)
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, without materialising n x k x dim.
+        sq = (
+            (embeddings ** 2).sum(axis=1, keepdims=True)
+            - 2.0 * embeddings @ self.centroids.T
+            + (self.centroids ** 2).sum(axis=1)
+        )
+        ids = sq.argmin(axis=1)
+        distances = np.sqrt(np.maximum(sq[np.arange(len(ids)), ids], 0.0))
+        return ids, distances
+
+    def drift(self, distances: np.ndarray) -> float:
+        """Share of new topics that fall outside the fitted cluster radius."""
+        if len(distances) == 0:
+            return 0.0
+        return float((np.asarray(distances) > self.radius).mean())
+
+    def save(self, model_dir: str) -> None:
+        path = Path(model_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "centroids.npy", self.centroids)
+        meta = {
+            "embedding_model": self.embedding_model,
+            "radius": self.radius,
+            "fitted_at": self.fitted_at,
+            "labels": {str(k): v for k, v in self.labels.items()},
+            "topic_to_cluster": self.topic_to_cluster,
+        }
+        tmp = path / "model.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path / "model.json")
+
+    @classmethod
+    def load(cls, model_dir: str) -> Optional["ClusterModel"]:
+        path = Path(model_dir)
+        if not (path / "model.json").exists() or not (path / "centroids.npy").exists():
+            return None
+        meta = json.loads((path / "model.json").read_text())
+        return cls(
+            centroids=np.load(path / "centroids.npy"),
+            topic_to_cluster={t: int(c) for t, c in meta["topic_to_cluster"].items()},
+            radius=meta["radius"],
+            embedding_model=meta["embedding_model"],
+            labels={int(k): v for k, v in meta.get("labels", {}).items()},
+            fitted_at=meta.get("fitted_at"),
+        )
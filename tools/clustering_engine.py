@@ -0,0 +1,149 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.metrics import silhouette_score
+from sklearn.random_projection import GaussianRandomProjection
+
+# Above this many topics the "auto" engine switches from KMeans to MiniBatchKMeans.
+MINIBATCH_THRESHOLD = 20_000
+
+
+def reduce_dimensions(
+    embeddings: np.ndarray,
+    reduce_dim: Optional[int],
+    reduction: str = "pca",
+    random_state: int = 0,
+    fit_sample_size: int = 20_000,
+) -> np.ndarray:
+    """Optionally project embeddings down to `reduce_dim` dimensions (PCA or Gaussian random projection)."""
+    if not reduce_dim or reduce_dim >= embeddings.shape[1] or reduce_dim >= len(embeddings):
+        return embeddings
+    if reduction == "pca":
+        reducer = PCA(n_components=int(reduce_dim), svd_solver="randomized", random_state=random_state)
+    elif reduction == "random":
+        reducer = GaussianRandomProjection(n_components=int(reduce_dim), random_state=random_state)
+    else:
+        raise ValueError(f"Unknown reduction '{reduction}' (expected 'pca' or 'random')")
+    # Fitting on a sample is enough to find the principal directions and far cheaper at 100k+ rows.
+    if len(embeddings) > fit_sample_size:
+        rng = np.random.default_rng(random_state)
+        reducer.fit(embeddings[rng.choice(len(embeddings), size=fit_sample_size, replace=False)])
+    else:
+        reducer.fit(embeddings)
+    return reducer.transform(embeddings).astype(np.float32, copy=False)
+
+
+def _make_estimator(engine: str, k: int, n_samples: int, random_state: int):
+    if engine == "auto":
+        engine = "minibatch" if n_samples > MINIBATCH_THRESHOLD else "kmeans"
+    if engine == "kmeans":
+        return KMeans(n_clusters=k, random_state=random_state, n_init=10)
+    if engine == "minibatch":
+        return MiniBatchKMeans(
+            n_clusters=k,
+            random_state=random_state,
+            n_init=3,
+            batch_size=1024,
+        )
+    raise ValueError(f"Unknown clustering engine '{engine}' (expected 'auto', 'kmeans' or 'minibatch')")
+
+
+def _candidate_ks(min_clusters: int, max_clusters: int, n_samples: int) -> List[int]:
+    hi = max(2, min(max_clusters, n_samples - 1))
+    lo = max(2, min(min_clusters, hi))
+    step = max(1, (hi - lo) // 10)
+    ks = list(range(lo, hi + 1, step))
+    if ks[-1] != hi:
+        ks.append(hi)
+    return ks
+
+
+def _pick_elbow(ks: List[int], inertias: List[float]) -> int:
+    """Elbow of the inertia curve: the k farthest below the line joining the first and last point."""
+    if len(ks) < 3:
+        return ks[0]
+    x = np.asarray(ks, dtype=float)
+    y = np.asarray(inertias, dtype=float)
+    x = (x - x[0]) / max(x[-1] - x[0], 1e-12)
+    y = (y - y[-1]) / max(y[0] - y[-1], 1e-12)
+    return int(ks[int(np.argmax((1 - x) - y))])
+
+
+def select_num_clusters(
+    embeddings: np.ndarray,
+    min_clusters: int = 4,
+    max_clusters: int = 30,
+    method: str = "silhouette",
+    sample_size: int = 10_000,
+    random_state: int = 0,
+) -> Tuple[int, Dict[int, float]]:
+    """
+    Choose k on a random sample of the embeddings using MiniBatchKMeans fits.
+    `method` is "silhouette" (highest score wins) or "inertia" (elbow of the inertia curve).
+    """
+    rng = np.random.default_rng(random_state)
+    n = len(embeddings)
+    sample = embeddings[rng.choice(n, size=sample_size, replace=False)] if n > sample_size else embeddings
+    ks = _candidate_ks(min_clusters, max_clusters, len(sample))
+
+    scores: Dict[int, float] = {}
+    for k in ks:
+        est = _make_estimator("minibatch", k, len(sample), random_state)
+        labels = est.fit_predict(sample)
+        if method == "silhouette":
+            n_labels = len(np.unique(labels))
+            if n_labels < 2 or n_labels >= len(sample):
+                continue
+            scores[k] = float(silhouette_score(sample, labels, sample_size=min(len(sample), 3000), random_state=random_state))
+        elif method == "inertia":
+            scores[k] = float(est.inertia_)
+        else:
+            raise ValueError(f"Unknown k selection method '{method}' (expected 'silhouette' or 'inertia')")
+
+    if not scores:
+        return ks[0], scores
+    if method == "silhouette":
+        return max(scores, key=scores.get), scores
+    return _pick_elbow(list(scores), list(scores.values())), scores
+
+
+def fit_clusters(
+    embeddings: np.ndarray,
+    num_clusters: int = 12,
+    engine: str = "auto",
+    reduce_dim: Optional[int] = None,
+    reduction: str = "pca",
+    k_selection: str = "silhouette",
+    max_clusters: int = 30,
+    sample_size: int = 10_000,
+    random_state: int = 0,
+) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Cluster float32 embeddings and return (labels, info).
+
+    - `engine`: "kmeans" (full batch, 10 inits), "minibatch" (MiniBatchKMeans) or "auto"
+      (MiniBatchKMeans above MINIBATCH_THRESHOLD topics).
+    - `reduce_dim`: optional PCA / random projection before clustering.
+    - `num_clusters` <= 0 picks k automatically via `k_selection` on a sample.
+    """
+    X = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n = len(X)
+    X = reduce_dimensions(X, reduce_dim, reduction, random_state)
+
+    info: Dict[str, Any] = {"dimensions": int(X.shape[1])}
+    if num_clusters is None or num_clusters <= 0:
+        k, scores = select_num_clusters(X, max_clusters=max_clusters, method=k_selection, sample_size=sample_size, random_state=random_state)
+        info["k_selection"] = k_selection
+        info["k_scores"] = {int(key): round(v, 4) for key, v in scores.items()}
+    else:
+        k = int(num_clusters)
+    # KMeans needs at least as many points as clusters.
+    k = max(1, min(k, n))
+
+    est = _make_estimator(engine, k, n, random_state)
+    labels = est.fit_predict(X)
+    info["engine"] = type(est).__name__
+    info["num_clusters"] = int(k)
+    return labels, info
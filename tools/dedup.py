@@ -0,0 +1,137 @@
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+DEDUP_MODES = ("none", "exact", "near")
+
+# MinHash signature length and word-shingle size.
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+
+_NON_WORD = re.compile(r"[^\w]+")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_transcript(text: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form used to detect exact duplicates."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _shingles(normalized: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    words = normalized.split()
+    if len(words) < size:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def _minhash(shingles: Set[int], a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # Multiply-shift hashing: (a * x + b) mod 2**64 (uint64 wrap-around), keeping the high 32 bits.
+    with np.errstate(over="ignore"):
+        return ((np.outer(a, x) + b[:, None]) >> np.uint64(32)).min(axis=1)
+
+
+def lsh_bands(threshold: float, min_recall: float = 0.95) -> int:
+    """
+    Number of LSH bands (of NUM_PERM // bands rows) for `threshold`: the fewest bands, i.e. the
+    most selective buckets, that still make a pair at `threshold` a candidate with `min_recall`.
+    """
+    for bands in (4, 8, 16, 32, 64):
+        rows = NUM_PERM // bands
+        if 1 - (1 - threshold ** rows) ** bands >= min_recall:
+            return bands
+    return NUM_PERM
+
+
+def dedup_groups(
+    texts: Sequence[str],
+    mode: str = "exact",
+    threshold: float = 0.9,
+    seed: int = 0,
+) -> Tuple[List[int], Dict[str, int]]:
+    """
+    Representative row index for every text, plus group statistics.
+
+    "exact" groups texts whose `normalize_transcript` forms are equal. "near" additionally merges
+    a text into an earlier representative when their word-shingle Jaccard similarity, estimated
+    from MinHash signatures, is at least `threshold`; candidates come from LSH buckets, so the cost
+    stays close to linear in the number of distinct texts. Representatives are always the first
+    occurrence, and members are compared with the representative itself (not with other members),
+    so groups do not drift by chaining.
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{mode}' (expected one of {DEDUP_MODES})")
+    if mode == "none":
+        return list(range(len(texts))), {
+            "distinct_transcripts": len(texts), "duplicate_groups": 0, "deduplicated_rows": 0, "near_duplicate_rows": 0,
+        }
+
+    normalized = [normalize_transcript(t) for t in texts]
+    first_by_form: Dict[str, int] = {}
+    rep = [first_by_form.setdefault(form, i) for i, form in enumerate(normalized)]
+
+    near_rows = 0
+    if mode == "near":
+        rng = np.random.default_rng(seed)
+        a = rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        b = rng.integers(0, 1 << 64, NUM_PERM, dtype=np.uint64, endpoint=False)
+        n_bands = lsh_bands(threshold)
+        rows_per_band = NUM_PERM // n_bands
+        buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(n_bands)]
+        reps: List[int] = []
+        rep_sigs = np.empty((max(1, len(first_by_form)), NUM_PERM), dtype=np.uint64)
+        merged: Dict[int, int] = {}
+        for i in first_by_form.values():
+            sig = _minhash(_shingles(normalized[i]), a, b)
+            bands = [sig[k * rows_per_band:(k + 1) * rows_per_band].tobytes() for k in range(n_bands)]
+            target = None
+            cands = set().union(*(band.get(key, ()) for band, key in zip(buckets, bands)))
+            if cands:
+                cands = np.fromiter(cands, dtype=np.int64, count=len(cands))
+                # The share of equal MinHash values estimates the shingle Jaccard similarity
+                # (sd <= 0.045 at 128 permutations); join the most similar representative.
+                estimate = (rep_sigs[cands] == sig).mean(axis=1)
+                best = int(np.argmax(estimate))
+                if estimate[best] >= threshold:
+                    target = reps[cands[best]]
+            if target is None:
+                # Only representatives go into the index (as positions in `reps`).
+                for band, key in zip(buckets, bands):
+                    band.setdefault(key, []).append(len(reps))
+                rep_sigs[len(reps)] = sig
+                reps.append(i)
+            else:
+                merged[i] = target
+        near_rows = sum(1 for r in rep if r in merged)
+        rep = [merged.get(r, r) for r in rep]
+
+    sizes: Dict[int, int] = {}
+    for r in rep:
+        sizes[r] = sizes.get(r, 0) + 1
+    stats = {
+        "distinct_transcripts": len(sizes),
+        "duplicate_groups": sum(1 for n in sizes.values() if n > 1),
+        "deduplicated_rows": len(texts) - len(sizes),
+        "near_duplicate_rows": near_rows,
+    }
+    return rep, stats
+
+
+def relocate_quote(quote: str, text: str) -> str:
+    """
+    A verbatim quote from `text` for a quote taken from another member of its group: `quote` itself
+    if it occurs in `text`, else the sentence of `text` sharing the most words with it ("" if none).
+    """
+    if not quote or quote in text:
+        return quote
+    words = set(normalize_transcript(quote).split())
+    best, overlap = "", 0
+    for sentence in _SENTENCE_SPLIT.split(text):
+        shared = len(words & set(normalize_transcript(sentence).split()))
+        if shared > overlap:
+            best, overlap = sentence.strip(), shared
+    return best[:160]
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# One lock per store directory, shared by every EmbeddingStore of this process; the flock on
+# `.lock` in the directory serializes writers across processes.
+_dir_locks: Dict[str, threading.Lock] = {}
+_dir_locks_guard = threading.Lock()
+
+
+def _dir_lock(path: Path) -> threading.Lock:
+    with _dir_locks_guard:
+        return _dir_locks.setdefault(str(path.resolve()), threading.Lock())
+
+
+def store_dir_for(data_path: str) -> str:
+    """Default store location next to the pipeline files: data/df_with_topics.csv -> data/cache/embeddings."""
+    return str(Path(data_path).parent / "cache" / "embeddings")
+
+
+class EmbeddingStore:
+    """
+    Persistent topic -> embedding store.
+
+    Layout under `<store_dir>/<model>/`:
+      - topics.jsonl : one JSON-encoded topic per line, row i of the matrix
+      - vectors.f32  : raw float32 matrix (n_topics x dim), memory-mapped on read
+      - meta.json    : {"model": ..., "dim": ...}
+
+    Vectors are appended before their topics, so a crash mid-append leaves trailing bytes that
+    are truncated by the next writer instead of misaligning the two files. Several stores (threads,
+    processes) may share a directory: appends hold an exclusive lock and first read the topics the
+    others added, so every topic keeps the row its vector was written to.
+    """
+
+    def __init__(self, store_dir: str = "data/cache/embeddings", model: str = "text-embedding-3-small"):
+        self.dir = Path(store_dir) / model.replace("/", "_")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self._topics_path = self.dir / "topics.jsonl"
+        self._vectors_path = self.dir / "vectors.f32"
+        self._meta_path = self.dir / "meta.json"
+
+        self._thread_lock = _dir_lock(self.dir)
+
+        self.dim: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._topics_offset = 0  # bytes of topics.jsonl already read into _index
+        self._matrix: Optional[np.memmap] = None
+        self._refresh()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        import fcntl
+
+        with self._thread_lock, open(self.dir / ".lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Read topics appended to topics.jsonl (by this or another store) since the last read."""
+        if self.dim is None and self._meta_path.exists():
+            self.dim = int(json.loads(self._meta_path.read_text())["dim"])
+        if not self._topics_path.exists():
+            return
+        with open(self._topics_path, "rb") as f:
+            f.seek(self._topics_offset)
+            data = f.read()
+        # Only complete lines; a line still being written is picked up next time.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            if line:
+                self._index.setdefault(json.loads(line), len(self._index))
+        if end:
+            self._topics_offset += end
+            self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, topic: str) -> bool:
+        return topic in self._index
+
+    def missing(self, topics: Sequence[str]) -> List[str]:
+        self._refresh()
+        return [t for t in dict.fromkeys(topics) if t not in self._index]
+
+    def add(self, topics: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(topics) != len(vectors):
+            raise ValueError("topics and vectors must have the same length")
+        with self._locked():
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._meta_path.write_text(json.dumps({"model": self.model, "dim": self.dim}))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            new = {t: v for t, v in zip(topics, vectors) if t not in self._index}
+            if not new:
+                return
+            # Rows start after the last complete topic; bytes beyond it are from an interrupted append.
+            expected = len(self._index) * self.dim * 4
+            if self._vectors_path.exists() and os.path.getsize(self._vectors_path) != expected:
+                with open(self._vectors_path, "r+b") as f:
+                    f.truncate(expected)
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(self._topics_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(t) + "\n" for t in new))
+            self._refresh()
+
+    def matrix(self) -> np.memmap:
+        """Read-only memory map over all stored vectors."""
+        if self._matrix is None:
+            if self.dim is None:
+                raise ValueError("Embedding store is empty")
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._index), self.dim))
+        return self._matrix
+
+    def get(self, topics: Sequence[str]) -> np.ndarray:
+        """float32 array of vectors for `topics`, in the given order."""
+        if any(t not in self._index for t in topics):
+            self._refresh()
+        rows = [self._index[t] for t in topics]
+        if not rows:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self.matrix()[rows], dtype=np.float32)
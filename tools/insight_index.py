@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from tools.business_insight import to_month
+from tools.metrics import instrumented
+
+# Response-level dimensions of the index; every response has exactly one value of each.
+RESPONSE_DIMENSIONS = ("product", "channel", "state", "customer_sentiment", "month")
+THEME = "general_topic_l1"
+DIMENSIONS = (THEME, *RESPONSE_DIMENSIONS)
+
+UNKNOWN = "Unknown"
+DEFAULT_INDEX_DIR = "data/insight_index"
+
+# Loaded indexes by directory, reused while the files are unchanged.
+_loaded: Dict[str, Tuple[float, "InsightIndex"]] = {}
+_load_lock = threading.Lock()
+
+
+def index_dir_for(output_csv_path: str) -> str:
+    """Default index location next to the Step 3 output: data/output.csv -> data/insight_index."""
+    return str(Path(output_csv_path).parent / "insight_index")
+
+
+def _response_keys(df: pd.DataFrame) -> pd.DataFrame:
+    keys = {}
+    for dim in RESPONSE_DIMENSIONS:
+        if dim == "month":
+            values = to_month(df["Date"]).dt.strftime("%Y-%m") if "Date" in df.columns else None
+        else:
+            values = df[dim] if dim in df.columns else None
+        keys[dim] = UNKNOWN if values is None else values.astype(object).where(values.notna(), UNKNOWN).astype(str)
+    return pd.DataFrame(keys, index=df.index)
+
+
+def _as_text(table: pd.DataFrame) -> pd.DataFrame:
+    # Stored dictionary-encoded; queried as plain strings so filters and merges stay simple.
+    for dim in DIMENSIONS:
+        if dim in table.columns:
+            table[dim] = table[dim].astype(str)
+    return table
+
+
+class InsightIndex:
+    """
+    Precomputed aggregates of a labelled run, small enough to query in milliseconds.
+
+    - mentions  : theme x product x channel x state x sentiment x month -> `mentions` (topic
+                  mentions) and `responses` (responses mentioning the theme at least once)
+    - responses : product x channel x state x sentiment x month -> `responses` (all responses)
+
+    Because each response has a single product / channel / state / sentiment / month, response
+    counts stay exact under any filter; `responses` of a theme is never double-counted.
+    """
+
+    def __init__(self, mentions: pd.DataFrame, responses: pd.DataFrame, meta: Optional[Dict[str, Any]] = None):
+        self.mentions = mentions
+        self.responses = responses
+        self.meta = meta or {}
+
+    @classmethod
+    def build(
+        cls,
+        df: pd.DataFrame,
+        cluster_labels: Dict[int, str],
+        cluster_ids_column: str = "topic_cluster_ids",
+    ) -> "InsightIndex":
+        """Aggregate the per-response frame of Step 3 (cluster id lists parsed) with its theme labels."""
+        keys = _response_keys(df.reset_index(drop=True))
+        responses = keys.groupby(list(RESPONSE_DIMENSIONS), observed=True).size().rename("responses").reset_index()
+
+        id_lists = df[cluster_ids_column].tolist()
+        counts = np.fromiter((len(ids) for ids in id_lists), dtype=np.int64, count=len(df))
+        pairs = pd.DataFrame({
+            "row": np.repeat(np.arange(len(df)), counts),
+            THEME: pd.Series([int(c) for ids in id_lists for c in ids], dtype="int64").map(cluster_labels).fillna(UNKNOWN).to_numpy(),
+        })
+        # One entry per (response, theme), with the number of mentions.
+        per_response = pairs.groupby(["row", THEME], observed=True).size().rename("mentions").reset_index()
+        per_response = pd.concat([per_response, keys.iloc[per_response["row"].to_numpy()].reset_index(drop=True)], axis=1)
+        mentions = (
+            per_response.groupby(list(DIMENSIONS), observed=True)
+            .agg(mentions=("mentions", "sum"), responses=("row", "size"))
+            .reset_index()
+        )
+        mentions[THEME] = mentions[THEME].astype(str)
+        meta = {
+            "built_at": datetime.now().isoformat(timespec="seconds"),
+            "responses": int(len(df)),
+            "topic_mentions": int(counts.sum()),
+            "themes": int(mentions[THEME].nunique()),
+        }
+        return cls(mentions, responses, meta)
+
+    def save(self, index_dir: str) -> str:
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, table in (("mentions", self.mentions), ("responses", self.responses)):
+            out = table.copy()
+            for dim in DIMENSIONS:
+                if dim in out.columns:
+                    out[dim] = out[dim].astype("category")
+            out.to_parquet(path / f"{name}.parquet.tmp", index=False)
+            os.replace(path / f"{name}.parquet.tmp", path / f"{name}.parquet")
+        # Written last: its mtime marks a complete index for the query cache.
+        tmp = path / "index.json.tmp"
+        tmp.write_text(json.dumps(self.meta, indent=2))
+        os.replace(tmp, path / "index.json")
+        return str(path)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "InsightIndex":
+        """The index in `index_dir`, read once per change of its files."""
+        path = Path(index_dir)
+        meta_path = path / "index.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"No insight index in {index_dir}; run ClusterLabelling first")
+        mtime = meta_path.stat().st_mtime
+        key = str(path.resolve())
+        with _load_lock:
+            cached = _loaded.get(key)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        index = cls(
+            _as_text(pd.read_parquet(path / "mentions.parquet")),
+            _as_text(pd.read_parquet(path / "responses.parquet")),
+            json.loads(meta_path.read_text()),
+        )
+        with _load_lock:
+            _loaded[key] = (mtime, index)
+        return index
+
+    def _filter(self, table: pd.DataFrame, filters: Dict[str, List[str]]) -> pd.DataFrame:
+        mask = np.ones(len(table), dtype=bool)
+        for dim, values in filters.items():
+            if dim in table.columns:
+                mask &= table[dim].str.casefold().isin(values).to_numpy()
+        return table[mask]
+
+    def values(self, dim: str) -> List[str]:
+        table = self.mentions if dim == THEME else self.responses
+        return sorted(table[dim].unique().tolist())
+
+    def query(
+        self,
+        group_by: List[str],
+        filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+        top_n: int = 5,
+        max_groups: int = 20,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Top `top_n` rows by mentions for each combination of the leading `group_by` dimensions
+        (e.g. ["channel", "general_topic_l1"] -> top themes per channel), at most `max_groups` groups.
+        Filters match case-insensitively; `start_month` / `end_month` ("YYYY-MM") bound the months.
+        """
+        unknown_dims = [d for d in [*group_by, *(filters or {})] if d not in DIMENSIONS]
+        if not group_by or unknown_dims:
+            raise ValueError(f"group_by / filters must use the dimensions {list(DIMENSIONS)} (got {unknown_dims or group_by})")
+        wanted = {
+            dim: [str(v).casefold() for v in ([values] if isinstance(values, str) else values)]
+            for dim, values in (filters or {}).items()
+        }
+        unmatched = {
+            dim: self.values(dim) for dim, values in wanted.items()
+            if not set(values) & {v.casefold() for v in self.values(dim)}
+        }
+        if unmatched:
+            return {"rows": [], "unmatched_filters": unmatched}
+
+        mentions = self._filter(self.mentions, wanted)
+        responses = self._filter(self.responses, wanted)
+        if start_month or end_month:
+            bounds = (start_month or "0000-00", end_month or "9999-99")
+            mentions = mentions[(mentions["month"] != UNKNOWN) & mentions["month"].between(*bounds)]
+            responses = responses[(responses["month"] != UNKNOWN) & responses["month"].between(*bounds)]
+
+        negative_mentions = mentions[mentions["customer_sentiment"] == "Negative"]
+        by_theme = THEME in group_by or THEME in wanted
+        if by_theme:
+            # Responses mentioning the theme, summed over response-level cells (a response
+            # mentioning two filtered themes counts for both).
+            grouped = mentions.groupby(group_by)[["mentions", "responses"]].sum()
+            negative = negative_mentions.groupby(group_by)["responses"].sum()
+        else:
+            grouped = mentions.groupby(group_by)[["mentions"]].sum()
+            grouped["responses"] = responses.groupby(group_by)["responses"].sum().reindex(grouped.index, fill_value=0)
+            negative = responses[responses["customer_sentiment"] == "Negative"].groupby(group_by)["responses"].sum()
+        grouped["negative"] = negative.reindex(grouped.index, fill_value=0)
+        grouped = grouped.reset_index()
+
+        # Theme rows: share of the responses in the same slice (filters and response-level group);
+        # otherwise: share of all responses matching the filters.
+        response_dims = [d for d in group_by if d != THEME]
+        if by_theme and response_dims:
+            totals = responses.groupby(response_dims)["responses"].sum().rename("total").reset_index()
+            grouped = grouped.merge(totals, on=response_dims, how="left")
+        else:
+            grouped["total"] = responses["responses"].sum()
+        grouped["share_of_responses"] = (grouped["responses"] / grouped["total"].clip(lower=1)).round(3)
+        if "customer_sentiment" not in wanted and "customer_sentiment" not in group_by:
+            grouped["negative_share"] = (grouped["negative"] / grouped["responses"].clip(lower=1)).round(3)
+        grouped = grouped.drop(columns=["negative", "total"]).sort_values("mentions", ascending=False, kind="stable")
+
+        leading = group_by[:-1]
+        groups = 1
+        if leading:
+            order = grouped.groupby(leading)["mentions"].sum().sort_values(ascending=False, kind="stable")
+            groups = len(order)
+            keep = order.head(max_groups).reset_index()[leading]
+            keep["group_rank"] = np.arange(len(keep))
+            grouped = grouped.merge(keep, on=leading)  # keeps the mention order within each group
+            grouped = grouped[grouped.groupby(leading).cumcount() < top_n]
+            grouped = grouped.sort_values("group_rank", kind="stable").drop(columns="group_rank")
+        else:
+            grouped = grouped.head(top_n)
+
+        return {
+            "rows": [
+                {k: (v.item() if isinstance(v, np.generic) else v) for k, v in record.items()}
+                for record in grouped.to_dict("records")
+            ],
+            "groups": int(groups),
+            "groups_truncated": bool(groups > max_groups),
+            "total_responses": int(responses["responses"].sum()),
+            "total_mentions": int(mentions["mentions"].sum()),
+        }
+
+
+# Frequent read-only calls: metrics are returned with each result but not written to the step files.
+@instrumented("queryInsights", write=False)
+async def queryInsights(
+    group_by: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+    top_n: int = 5,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    max_groups: int = 20,
+    index_dir: str = DEFAULT_INDEX_DIR,
+) -> Dict[str, Any]:
+    """
+    Answer follow-up questions from the insight index that ClusterLabelling builds (no rerun needed).
+
+    Dimensions: general_topic_l1 (theme), product, channel, state, customer_sentiment, month ("YYYY-MM").
+    - Top themes overall: group_by=["general_topic_l1"]
+    - Top issues for one product: filters={"product": "Combined"}
+    - Pain points by channel: group_by=["channel", "general_topic_l1"] (top `top_n` themes per channel)
+    - Volume by month for a theme: group_by=["month"], filters={"general_topic_l1": "<theme>"}
+
+    Filters take a value or a list of values and match case-insensitively. Each row has `mentions`,
+    `responses` (responses mentioning it), `share_of_responses` (of all responses in the same slice)
+    and, unless sentiment is filtered or grouped, `negative_share`. If a filter value does not exist,
+    no rows are returned and `unmatched_filters` lists the valid values.
+    """
+    group_by = list(group_by) if group_by else [THEME]
+    index = InsightIndex.load(index_dir)
+    result = index.query(group_by, filters, top_n, max_groups, start_month, end_month)
+    return {
+        "status": "success",
+        "group_by": group_by,
+        "filters": filters or {},
+        "top_n": int(top_n),
+        "index_built_at": index.meta.get("built_at"),
+        **result,
+    }
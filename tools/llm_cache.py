@@ -0,0 +1,59 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Tuple
+
+
+def make_cache_key(*parts: str) -> str:
+    """Content-addressed key: SHA-256 over the given parts (e.g. system prompt, model, text)."""
+    h = hashlib.sha256()
+    for part in parts:
+        data = str(part).encode("utf-8")
+        # Length prefix keeps ("ab", "c") and ("a", "bc") distinct.
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class LLMCache:
+    """
+    Small on-disk SQLite cache for parsed LLM results.
+
+    Values are stored as JSON keyed by `make_cache_key(...)`, so a row is only sent to the
+    model again when its prompt, model or text changes.
+    """
+
+    def __init__(self, path: str = "data/cache/llm_cache.sqlite"):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        # Stay well under SQLite's bound-parameter limit.
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT key, value FROM llm_cache WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            found.update({k: json.loads(v) for k, v in rows})
+        return found
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO llm_cache (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in items],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import random
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from config.constants import MODEL_OPENAI
+from tools.metrics import current_metrics
+from tools.quota import get_governor, shared_http_client
+
+if TYPE_CHECKING:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """True for rate limits (429), server errors (5xx) and transient connection failures."""
+    import openai  # already loaded by whichever client raised
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES or exc.status_code >= 500
+    return False
+
+
+def make_chat_client() -> "OpenAIChatCompletionClient":
+    """JSON-capable chat client for the pipeline tools, on the shared (quota-observed) connection pool."""
+    # autogen / openai are imported on first use so the MCP server starts without them.
+    from autogen_core.models import ModelInfo
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+    # Retries are handled by call_with_retries so backoff is not applied twice.
+    return OpenAIChatCompletionClient(
+        model=MODEL_OPENAI,
+        model_info=ModelInfo(vision=False, function_calling=True, json_output=True, structured_output=True, family="openai"),
+        max_retries=0,
+        http_client=shared_http_client(),
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English; a cheap upper-ish bound without a tokenizer.
+    return len(text) // 4 + 1
+
+
+def estimate_request_tokens(messages: Iterable[Any], completion_tokens: int) -> int:
+    """Quota estimate of a chat request: its prompt plus the expected completion."""
+    return sum(estimate_tokens(str(getattr(m, "content", m))) for m in messages) + completion_tokens
+
+
+def usage_tokens(usage: Any) -> Optional[int]:
+    """Total tokens of an API response's usage (OpenAI or autogen style), None if not reported."""
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, None)
+    return int(get("prompt_tokens") or 0) + int(get("completion_tokens") or 0)
+
+
+def _retry_after(exc: BaseException) -> float:
+    """Seconds the server asked us to wait via the Retry-After header, 0 if absent."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def call_with_retries(
+    fn: Callable[[], Awaitable[T]],
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    quota: Optional[str] = None,
+    tokens: int = 0,
+) -> T:
+    """
+    Await `fn()` and retry retryable API errors with exponential backoff and full jitter.
+    Non-retryable errors (bad request, auth, ...) are raised immediately.
+    Latency, token usage and retries are recorded on the current step's metrics, if any.
+    With `quota` ("chat" | "embeddings"), every attempt first waits for one request and `tokens`
+    (estimated prompt + completion tokens) from the shared quota governor.
+    """
+    metrics = current_metrics()
+    governor = get_governor(quota) if quota else None
+    attempt = 0
+    while True:
+        if governor:
+            await governor.acquire(tokens)
+        start = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception as exc:
+            if governor:
+                await governor.settle(tokens, None)
+            if attempt >= max_retries or not is_retryable_error(exc):
+                if metrics:
+                    metrics.record_error()
+                raise
+            if metrics:
+                metrics.record_retry()
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            await asyncio.sleep(max(delay, _retry_after(exc)))
+            attempt += 1
+            continue
+        usage = getattr(result, "usage", None)
+        if governor:
+            actual = usage_tokens(usage)
+            await governor.settle(tokens, tokens if actual is None else actual)
+        if metrics:
+            metrics.record_call(time.perf_counter() - start, usage)
+        return result
+
+
+def parse_json_content(content: Any) -> Any:
+    """Parse a model reply as JSON, stripping markdown code fences if present."""
+    content = content if isinstance(content, str) else "{}"
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return json.loads(content.strip())
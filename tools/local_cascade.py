@@ -0,0 +1,241 @@
+import argparse
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from tools.table_io import read_table
+
+# model_version written for rows the local stage answered; such rows are never used for training.
+LOCAL_MODEL_VERSION = "local-tfidf"
+DEFAULT_LOCAL_MODEL_PATH = "data/cache/local_extractor.joblib"
+
+# Models are only loaded from this directory: loading unpickles the file, and the path can come
+# from an MCP tool argument.
+LOCAL_MODEL_DIR_ENV = "SURVEY_INSIGHT_LOCAL_MODEL_DIR"
+DEFAULT_LOCAL_MODEL_DIR = "data/cache"
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _topic_key(topic: str) -> str:
+    return " ".join(str(topic).casefold().split())
+
+
+def _quote(text: str, topics: Sequence[str]) -> str:
+    """The sentence sharing the most words with the predicted topics (verbatim, <= 160 chars)."""
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()] or [text]
+    words = {w for t in topics for w in re.findall(r"\w+", t.casefold()) if len(w) > 3}
+    best = max(sentences, key=lambda s: len(words & set(re.findall(r"\w+", s.casefold()))))
+    return best[:160]
+
+
+class LocalExtractor:
+    """
+    CPU-only first stage for TopicExtraction, trained on earlier LLM extractions (df_with_topics.csv).
+
+    - vectorizer      : TF-IDF over word 1-2 grams of the transcripts
+    - topic_model     : one-vs-rest logistic regression over recurring topic phrases
+    - sentiment_model : logistic regression over Negative / Neutral / Positive
+
+    A row is answered locally only when every decision is confident: each predicted topic and the
+    sentiment have probability >= `threshold`, and no other topic is above 1 - `threshold`.
+    """
+
+    def __init__(
+        self,
+        vectorizer: Any,
+        topic_model: Any,
+        topic_labels: List[str],
+        sentiment_model: Any,
+        trained_rows: int,
+        fitted_at: Optional[str] = None,
+    ):
+        self.vectorizer = vectorizer
+        self.topic_model = topic_model
+        self.topic_labels = topic_labels
+        self.sentiment_model = sentiment_model
+        self.trained_rows = trained_rows
+        self.fitted_at = fitted_at or datetime.now().isoformat(timespec="seconds")
+
+    @classmethod
+    def fit(
+        cls,
+        df: pd.DataFrame,
+        text_column: str = "call_transcrpt",
+        min_topic_count: int = 5,
+        max_features: int = 50_000,
+    ) -> "LocalExtractor":
+        """Train on LLM-labelled rows of an extraction output (rows answered locally are skipped)."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.multiclass import OneVsRestClassifier
+        from sklearn.preprocessing import MultiLabelBinarizer
+
+        if "model_version" in df.columns:
+            df = df[df["model_version"].astype(str) != LOCAL_MODEL_VERSION]
+        df = df[df[text_column].notna() & df["all_topics_discussed"].map(len).gt(0)]
+        texts = df[text_column].astype(str).tolist()
+        row_keys = [[_topic_key(t) for t in topics] for topics in df["all_topics_discussed"]]
+
+        # Each label is shown with its most common spelling.
+        counts = Counter(k for keys in row_keys for k in set(keys))
+        spellings = Counter((_topic_key(t), str(t).strip()) for topics in df["all_topics_discussed"] for t in topics)
+        surface: Dict[str, str] = {}
+        for (key, spelling), _ in spellings.most_common():
+            surface.setdefault(key, spelling)
+        keys = sorted(k for k, n in counts.items() if n >= min_topic_count)
+        sentiments = df["customer_sentiment"].astype(str).tolist()
+        if not keys or len(set(sentiments)) < 2:
+            raise ValueError(
+                f"Not enough training data: {len(texts)} labelled rows, {len(keys)} topics seen "
+                f">= {min_topic_count} times, {len(set(sentiments))} sentiment classes"
+            )
+
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True, max_features=max_features)
+        X = vectorizer.fit_transform(texts)
+        kept = set(keys)
+        Y = MultiLabelBinarizer(classes=keys).fit_transform([[k for k in ks if k in kept] for ks in row_keys])
+        topic_model = OneVsRestClassifier(LogisticRegression(C=4.0, max_iter=1000)).fit(X, Y)
+        sentiment_model = LogisticRegression(C=4.0, max_iter=1000).fit(X, sentiments)
+        return cls(vectorizer, topic_model, [surface[k] for k in keys], sentiment_model, len(texts))
+
+    def confidence(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        X = self.vectorizer.transform([str(t) for t in texts])
+        topic_p = np.atleast_2d(self.topic_model.predict_proba(X))
+        sentiment_p = self.sentiment_model.predict_proba(X)
+        chosen = topic_p >= 0.5
+        min_chosen = np.where(chosen, topic_p, 1.0).min(axis=1)
+        max_other = np.where(chosen, 0.0, topic_p).max(axis=1)
+        conf = np.minimum(np.minimum(min_chosen, 1.0 - max_other), sentiment_p.max(axis=1))
+        conf[~chosen.any(axis=1)] = 0.0
+        return {"topic_p": topic_p, "sentiment_p": sentiment_p, "confidence": conf}
+
+    def predict(self, texts: Sequence[str], threshold: float = 0.9) -> List[Optional[Dict[str, Any]]]:
+        """Extraction payloads for rows at or above `threshold` confidence; None for rows the LLM should handle."""
+        if not len(texts):
+            return []
+        return self._payloads(texts, self.confidence(texts), threshold)
+
+    def _payloads(self, texts: Sequence[str], scored: Dict[str, np.ndarray], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        classes = self.sentiment_model.classes_
+        out: List[Optional[Dict[str, Any]]] = []
+        for i, text in enumerate(texts):
+            conf = float(scored["confidence"][i])
+            if conf < threshold:
+                out.append(None)
+                continue
+            p = scored["topic_p"][i]
+            order = [j for j in np.argsort(-p) if p[j] >= 0.5][:5]
+            topics = [self.topic_labels[j] for j in order]
+            out.append({
+                "topics": topics,
+                "supporting_quote": _quote(str(text), topics),
+                "reason": f"Predicted by the local TF-IDF classifier (confidence {conf:.2f}).",
+                "sentiment": str(classes[int(np.argmax(scored["sentiment_p"][i]))]),
+            })
+        return out
+
+    def evaluate(self, df: pd.DataFrame, thresholds: Sequence[float], text_column: str = "call_transcrpt") -> List[Dict[str, float]]:
+        """Coverage and agreement with the LLM labels of `df` at each confidence threshold."""
+        texts = df[text_column].astype(str).tolist()
+        truth_topics = [{_topic_key(t) for t in topics} for topics in df["all_topics_discussed"]]
+        truth_sentiment = df["customer_sentiment"].astype(str).tolist()
+        scored = self.confidence(texts)
+        predicted = self._payloads(texts, scored, min(thresholds))
+        conf = scored["confidence"]
+        report = []
+        for threshold in thresholds:
+            covered = [i for i, p in enumerate(predicted) if p is not None and conf[i] >= threshold]
+            jaccard = [
+                len(truth_topics[i] & {_topic_key(t) for t in predicted[i]["topics"]})
+                / max(1, len(truth_topics[i] | {_topic_key(t) for t in predicted[i]["topics"]}))
+                for i in covered
+            ]
+            report.append({
+                "threshold": threshold,
+                "coverage": round(len(covered) / max(1, len(texts)), 4),
+                "sentiment_accuracy": round(float(np.mean([predicted[i]["sentiment"] == truth_sentiment[i] for i in covered])), 4) if covered else None,
+                "topic_jaccard": round(float(np.mean(jaccard)), 4) if covered else None,
+            })
+        return report
+
+    def save(self, path: str = DEFAULT_LOCAL_MODEL_PATH) -> None:
+        import joblib
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(self, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_LOCAL_MODEL_PATH) -> "LocalExtractor":
+        """Load a saved model; `path` must resolve to a file inside the local model directory."""
+        import joblib
+
+        model_dir = Path(os.getenv(LOCAL_MODEL_DIR_ENV) or DEFAULT_LOCAL_MODEL_DIR).resolve()
+        if not Path(path).resolve().is_relative_to(model_dir):
+            raise ValueError(f"Local models are only loaded from {model_dir} (set {LOCAL_MODEL_DIR_ENV}); got {path}")
+        model = joblib.load(path)
+        if not isinstance(model, cls):
+            raise ValueError(f"{path} does not contain a LocalExtractor")
+        return model
+
+
+def train_local_extractor(
+    training_paths: Sequence[str],
+    model_path: str = DEFAULT_LOCAL_MODEL_PATH,
+    text_column: str = "call_transcrpt",
+    min_topic_count: int = 5,
+    holdout: float = 0.2,
+    thresholds: Sequence[float] = (0.7, 0.8, 0.9, 0.95),
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Fit the local stage on earlier extraction outputs, report coverage / agreement on a held-out
+    share at each threshold, then refit on everything and save it to `model_path`.
+    """
+    columns = [text_column, "all_topics_discussed", "customer_sentiment"]
+    frames = []
+    for path in training_paths:
+        frame = read_table(path)
+        frames.append(frame[columns + (["model_version"] if "model_version" in frame.columns else [])])
+    df = pd.concat(frames, ignore_index=True)
+    if "model_version" in df.columns:
+        df = df[df["model_version"].astype(str) != LOCAL_MODEL_VERSION]
+    df = df.drop_duplicates(subset=[text_column]).reset_index(drop=True)
+
+    evaluation = None
+    if holdout and len(df) >= 20:
+        test = df.sample(frac=holdout, random_state=seed)
+        evaluation = LocalExtractor.fit(df.drop(test.index), text_column, min_topic_count).evaluate(test, thresholds, text_column)
+    model = LocalExtractor.fit(df, text_column, min_topic_count)
+    model.save(model_path)
+    return {
+        "model_path": model_path,
+        "trained_rows": model.trained_rows,
+        "topic_labels": len(model.topic_labels),
+        "holdout": evaluation,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local TF-IDF extraction stage on earlier df_with_topics outputs.")
+    parser.add_argument("inputs", nargs="+", help="df_with_topics.csv / .parquet files labelled by the LLM")
+    parser.add_argument("--out", default=DEFAULT_LOCAL_MODEL_PATH)
+    parser.add_argument("--text-column", default="call_transcrpt")
+    parser.add_argument("--min-topic-count", type=int, default=5, help="topics seen fewer times are left to the LLM")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share held out for the coverage / agreement report")
+    args = parser.parse_args()
+
+    result = train_local_extractor(args.inputs, args.out, args.text_column, args.min_topic_count, args.holdout)
+    print(f"saved {result['model_path']}: {result['trained_rows']} rows, {result['topic_labels']} topic labels")
+    for row in result["holdout"] or []:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
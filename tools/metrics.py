@@ -0,0 +1,223 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+# Where step metrics are written: metrics.json (latest run per step) and metrics.prom
+# (Prometheus textfile format). Set SURVEY_INSIGHT_METRICS_DIR="" to disable writing.
+METRICS_DIR_ENV = "SURVEY_INSIGHT_METRICS_DIR"
+DEFAULT_METRICS_DIR = "data/metrics"
+
+# Upper bounds (seconds) of the LLM latency histogram buckets.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Result fields that echo settings rather than count work; not copied into the counters.
+_SETTING_FIELDS = {"max_concurrency", "batch_size", "top_n", "dimensions", "num_clusters"}
+
+_current: ContextVar[Optional["StepMetrics"]] = ContextVar("survey_insight_step_metrics", default=None)
+_write_lock = threading.Lock()
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def _usage_value(usage: Any, key: str) -> int:
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return int(value or 0)
+
+
+class StepMetrics:
+    """Wall time, per-call LLM latencies, token usage, retries and counters for one tool run."""
+
+    def __init__(self, step: str):
+        self.step = step
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.wall_s: Optional[float] = None
+        self.status = "running"
+        self.latencies: List[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.errors = 0
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_call(self, latency_s: float, usage: Any = None) -> None:
+        """One successful API call; `usage` is any object/dict with prompt_tokens / completion_tokens."""
+        with self._lock:
+            self.latencies.append(latency_s)
+            self.prompt_tokens += _usage_value(usage, "prompt_tokens")
+            self.completion_tokens += _usage_value(usage, "completion_tokens")
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+            self.errors += 1
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_fields(self, result: Dict[str, Any]) -> None:
+        """Add a tool result's numeric fields (cache hits, api calls, rows, ...) to the counters."""
+        for key, value in result.items():
+            if key in _SETTING_FIELDS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            self.count(key, value)
+
+    def finish(self, status: str = "success") -> None:
+        self.wall_s = time.perf_counter() - self._start
+        self.status = status
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            lat = sorted(self.latencies)
+        histogram = {str(b): sum(1 for v in lat if v <= b) for b in LATENCY_BUCKETS}
+        histogram["+Inf"] = len(lat)
+        wall = self.wall_s if self.wall_s is not None else time.perf_counter() - self._start
+        return {
+            "step": self.step,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_s": round(wall, 3),
+            "llm_calls": len(lat),
+            "llm_latency_s": {
+                "mean": round(sum(lat) / len(lat), 4) if lat else 0.0,
+                "p50": round(_percentile(lat, 0.50), 4),
+                "p95": round(_percentile(lat, 0.95), 4),
+                "p99": round(_percentile(lat, 0.99), 4),
+                "max": round(lat[-1], 4) if lat else 0.0,
+                "sum": round(sum(lat), 4),
+                "buckets": histogram,
+            },
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "errors": self.errors,
+            "counters": dict(self.counters),
+        }
+
+
+def current_metrics() -> Optional[StepMetrics]:
+    """Metrics of the step running in this context (propagates into gathered tasks and threads)."""
+    return _current.get()
+
+
+@contextmanager
+def track_step(step: str, write: bool = True) -> Iterator[StepMetrics]:
+    """Collect metrics for everything awaited inside the block and write them out when it ends."""
+    metrics = StepMetrics(step)
+    token = _current.set(metrics)
+    status = "error"
+    try:
+        yield metrics
+        status = "success"
+    finally:
+        _current.reset(token)
+        metrics.finish(status)
+        if write:
+            write_metrics(metrics)
+
+
+def instrumented(step: str, write: bool = True) -> Callable:
+    """
+    Decorator for async tools: tracks the call as `step`, copies the tool's numeric result
+    fields (cache hits, api calls, ...) into the counters and adds `metrics` to the result.
+    With `write=False` the metrics are only returned, not written to the metrics files.
+    """
+    def decorator(fn: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[Dict[str, Any]]]:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> Dict[str, Any]:
+            with track_step(step, write=write) as metrics:
+                result = await fn(*args, **kwargs)
+                metrics.count_fields(result)
+            result["metrics"] = metrics.summary()
+            return result
+        return wrapper
+    return decorator
+
+
+def metrics_dir() -> Optional[str]:
+    value = os.getenv(METRICS_DIR_ENV, DEFAULT_METRICS_DIR)
+    return value or None
+
+
+def _prom_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+def to_prometheus(steps: Dict[str, Dict[str, Any]]) -> str:
+    """Render the latest summary of every step in Prometheus textfile exposition format."""
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[str]) -> None:
+        lines.append(f"# HELP survey_insight_{name} {help_text}")
+        lines.append(f"# TYPE survey_insight_{name} {kind}")
+        lines.extend(samples)
+
+    def per_step(name: str, value_of: Callable[[Dict[str, Any]], float]) -> List[str]:
+        return [f'survey_insight_{name}{{step="{s}"}} {value_of(m)}' for s, m in steps.items()]
+
+    metric("step_duration_seconds", "gauge", "Wall time of the last run of each step.", per_step("step_duration_seconds", lambda m: m["wall_s"]))
+    metric("step_success", "gauge", "1 if the last run of the step succeeded.", per_step("step_success", lambda m: int(m["status"] == "success")))
+    metric("llm_calls", "gauge", "LLM/embedding API calls in the last run.", per_step("llm_calls", lambda m: m["llm_calls"]))
+    metric("llm_prompt_tokens", "gauge", "Prompt tokens used in the last run.", per_step("llm_prompt_tokens", lambda m: m["prompt_tokens"]))
+    metric("llm_completion_tokens", "gauge", "Completion tokens used in the last run.", per_step("llm_completion_tokens", lambda m: m["completion_tokens"]))
+    metric("llm_retries", "gauge", "Retried API calls in the last run.", per_step("llm_retries", lambda m: m["retries"]))
+
+    samples = []
+    for s, m in steps.items():
+        lat = m["llm_latency_s"]
+        for le, n in lat["buckets"].items():
+            samples.append(f'survey_insight_llm_latency_seconds_bucket{{step="{s}",le="{le}"}} {n}')
+        samples.append(f'survey_insight_llm_latency_seconds_sum{{step="{s}"}} {lat["sum"]}')
+        samples.append(f'survey_insight_llm_latency_seconds_count{{step="{s}"}} {m["llm_calls"]}')
+    metric("llm_latency_seconds", "histogram", "Latency of successful API calls in the last run.", samples)
+
+    counter_samples = [
+        f'survey_insight_step_counter{{step="{s}",name="{_prom_name(k)}"}} {v}'
+        for s, m in steps.items() for k, v in m.get("counters", {}).items()
+    ]
+    metric("step_counter", "gauge", "Tool-reported counts (cache hits, rows, ...) from the last run.", counter_samples)
+    return "\n".join(lines) + "\n"
+
+
+def _replace(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_metrics(metrics: StepMetrics, directory: Optional[str] = None) -> Optional[str]:
+    """Merge this step into `<dir>/metrics.json` and re-render `<dir>/metrics.prom`."""
+    directory = directory or metrics_dir()
+    if not directory:
+        return None
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    json_path = out / "metrics.json"
+    with _write_lock:
+        try:
+            steps = json.loads(json_path.read_text(encoding="utf-8")) if json_path.exists() else {}
+        except ValueError:
+            steps = {}
+        steps[metrics.step] = metrics.summary()
+        _replace(json_path, json.dumps(steps, indent=2))
+        _replace(out / "metrics.prom", to_prometheus(steps))
+    return str(json_path)
@@ -0,0 +1,141 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.table_io import read_table, write_table
+
+OUTPUT_LAYOUTS = ("exploded", "normalized", "both")
+
+# Tables of the normalized output, one file each (<name>.csv or <name>.parquet):
+#   responses      : one row per survey_id with every response column except the topic lists
+#   topic_mentions : survey_id, topic_id, cluster_id - one row per (response, topic)
+#   topics         : topic_id -> topic_discussed (and topic_canonical)
+#   themes         : cluster_id -> general_topic_l1
+NORMALIZED_TABLES = ("responses", "topic_mentions", "topics", "themes")
+
+# Columns of the exploded output that come from the mention / dimension tables, not from responses.
+_MENTION_COLUMNS = {"topic_id", "cluster_id", "topic_discussed", "topic_canonical", "general_topic_l1"}
+
+
+def normalized_dir_for(output_csv_path: str) -> str:
+    """Default directory of the normalized tables: data/output.csv -> data/output_normalized."""
+    path = Path(output_csv_path)
+    return str(path.with_name(f"{path.stem}_normalized"))
+
+
+def _table_path(directory: str, name: str) -> Optional[Path]:
+    for suffix in (".parquet", ".csv"):
+        path = Path(directory) / f"{name}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def is_normalized(path: str) -> bool:
+    """True if `path` is a directory written by `write_normalized`."""
+    return Path(path).is_dir() and _table_path(path, "topic_mentions") is not None
+
+
+def build_normalized(
+    df: pd.DataFrame,
+    cluster_labels: Dict[int, str],
+    topics_column: str = "all_topics_discussed",
+    cluster_ids_column: str = "topic_cluster_ids",
+    canonical: Optional[Dict[str, str]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Split the per-response frame of Step 3 (list columns parsed) into the normalized tables.
+    Topic and theme labels are stored once in `topics` / `themes` and referenced by integer ids.
+    """
+    if "survey_id" not in df.columns or not df["survey_id"].is_unique:
+        raise ValueError("The normalized output needs a unique `survey_id` per response")
+
+    topic_lists = df[topics_column].tolist()
+    id_lists = df[cluster_ids_column].tolist()
+    counts = np.fromiter((min(len(t), len(c)) for t, c in zip(topic_lists, id_lists)), dtype=np.int64, count=len(df))
+    topic_codes, topic_names = pd.factorize(
+        pd.Series([str(t) for lst, n in zip(topic_lists, counts) for t in lst[:n]], dtype=object), sort=True
+    )
+    mentions = pd.DataFrame({
+        "survey_id": np.repeat(df["survey_id"].to_numpy(), counts),
+        "topic_id": topic_codes.astype(np.int32),
+        "cluster_id": np.fromiter((int(c) for lst, n in zip(id_lists, counts) for c in lst[:n]), dtype=np.int32, count=int(counts.sum())),
+    })
+
+    topics = pd.DataFrame({"topic_id": np.arange(len(topic_names), dtype=np.int32), "topic_discussed": np.asarray(topic_names, dtype=object)})
+    if canonical is not None:
+        topics["topic_canonical"] = topics["topic_discussed"].map(canonical).astype("category")
+    cluster_ids = sorted(cluster_labels)
+    themes = pd.DataFrame({
+        "cluster_id": np.asarray(cluster_ids, dtype=np.int32),
+        "general_topic_l1": pd.Categorical([cluster_labels[c] for c in cluster_ids]),
+    })
+    responses = df.drop(columns=[topics_column, cluster_ids_column]).reset_index(drop=True)
+    return {"responses": responses, "topic_mentions": mentions, "topics": topics, "themes": themes}
+
+
+def write_normalized(tables: Dict[str, pd.DataFrame], directory: str, file_format: str = "csv") -> Dict[str, str]:
+    """Write each table to `<directory>/<name>.<file_format>`; returns name -> path."""
+    paths = {}
+    for name in NORMALIZED_TABLES:
+        path = str(Path(directory) / f"{name}.{file_format}")
+        stale = _table_path(directory, name)
+        if stale is not None and str(stale) != path:
+            stale.unlink()  # never leave a table of an earlier run in the other format
+        write_table(tables[name], path, list_columns=[])
+        paths[name] = path
+    return paths
+
+
+def _lookup(keys: pd.Series, dimension: pd.Series) -> pd.Categorical:
+    """Labels of `keys` from an id-indexed `dimension` column, dictionary-encoded (unknown ids -> NaN)."""
+    labels = pd.Categorical(dimension.to_numpy())
+    pos = dimension.index.get_indexer(keys.to_numpy())
+    return pd.Categorical.from_codes(np.where(pos >= 0, labels.codes[pos], -1), categories=labels.categories)
+
+
+def mentions_frame(tables: Dict[str, pd.DataFrame], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    One row per topic mention with `columns` (default: all) of the exploded output, built from
+    the normalized tables. Topic and theme labels come back as categoricals.
+    """
+    mentions = tables["topic_mentions"]
+    responses = tables["responses"]
+    if columns is None:
+        columns = ["survey_id", *[c for c in responses.columns if c != "survey_id"], "topic_discussed", "general_topic_l1"]
+    response_columns = [c for c in columns if c not in _MENTION_COLUMNS and c != "survey_id" and c in responses.columns]
+
+    out = responses.set_index("survey_id")[response_columns].reindex(mentions["survey_id"].to_numpy())
+    out = out.reset_index(drop=True)
+    if "survey_id" in columns:
+        out.insert(0, "survey_id", mentions["survey_id"].to_numpy())
+    topics = tables["topics"].set_index("topic_id")
+    for col in ("topic_id", "cluster_id"):
+        if col in columns:
+            out[col] = mentions[col].to_numpy()
+    for col in ("topic_discussed", "topic_canonical"):
+        if col in columns and col in topics.columns:
+            out[col] = _lookup(mentions["topic_id"], topics[col])
+    if "general_topic_l1" in columns:
+        out["general_topic_l1"] = _lookup(mentions["cluster_id"], tables["themes"].set_index("cluster_id")["general_topic_l1"])
+    return out[[c for c in columns if c in out.columns]]
+
+
+def read_mentions(directory: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a normalized output directory as mention rows (see `mentions_frame`), loading only what `columns` needs."""
+    paths = {name: _table_path(directory, name) for name in NORMALIZED_TABLES}
+    missing = [name for name, path in paths.items() if path is None]
+    if missing:
+        raise FileNotFoundError(f"{directory} is missing the normalized table(s): {', '.join(missing)}")
+    response_columns = None
+    if columns is not None:
+        response_columns = ["survey_id", *[c for c in columns if c not in _MENTION_COLUMNS and c != "survey_id"]]
+    tables = {
+        "responses": read_table(str(paths["responses"]), columns=response_columns, list_columns=[]),
+        "topic_mentions": read_table(str(paths["topic_mentions"]), list_columns=[]),
+        "topics": read_table(str(paths["topics"]), list_columns=[]),
+        "themes": read_table(str(paths["themes"]), list_columns=[]),
+    }
+    return mentions_frame(tables, columns)
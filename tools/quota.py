@@ -0,0 +1,303 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from tools.metrics import current_metrics
+
+QUOTA_KINDS = ("chat", "embeddings")
+PRIORITIES = ("interactive", "batch")
+
+# Optional caps per kind, e.g. SURVEY_INSIGHT_CHAT_RPM=500, SURVEY_INSIGHT_EMBEDDINGS_TPM=1000000.
+# Without a cap the limits advertised in the API's x-ratelimit-* headers are used.
+LIMIT_ENV = "SURVEY_INSIGHT_{kind}_{unit}"
+
+# Set to a directory to share the quota between processes (MCP server subprocesses, several
+# CLI runs, ...) through a locked state file per kind; otherwise it is shared within the process.
+QUOTA_DIR_ENV = "SURVEY_INSIGHT_QUOTA_DIR"
+
+# Share of each bucket that batch work leaves free, so interactive calls never queue behind it.
+INTERACTIVE_RESERVE = 0.1
+
+# Longest single sleep while waiting for quota, so header updates are picked up promptly.
+MAX_WAIT_STEP_S = 1.0
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _env_limit(kind: str, unit: str) -> Optional[float]:
+    value = os.getenv(LIMIT_ENV.format(kind=kind.upper(), unit=unit))
+    return float(value) if value else None
+
+
+def _duration_s(value: Optional[str]) -> Optional[float]:
+    """Seconds in an OpenAI reset header such as "1s", "6m0s" or "20ms"."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parts = _DURATION.findall(value)
+        return sum(float(n) * _UNITS[u] for n, u in parts) if parts else None
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _MemoryState:
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, float] = {}
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, float]]:
+        with self._lock:
+            yield self._state
+
+
+class _FileState:
+    """Quota state in a JSON file, read and rewritten under an exclusive flock by every process."""
+
+    blocking = True  # flock waits for other processes; used off the event loop
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def locked(self) -> Iterator[Dict[str, float]]:
+        import fcntl
+
+        with self._lock, open(self.path.with_suffix(".lock"), "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(self.path.read_text())
+                except (FileNotFoundError, ValueError):
+                    state = {}
+                yield state
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(state))
+                os.replace(tmp, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class QuotaGovernor:
+    """
+    Requests-per-minute and tokens-per-minute token buckets for one kind of API call.
+
+    Callers `acquire` one request and their estimated tokens before each call and `settle` the
+    estimate with the reported usage afterwards. The limits are the configured caps, lowered or
+    learned from the x-ratelimit-* headers of every response; remaining-quota headers shrink the
+    buckets (other clients may share the key) and a 429 without them pauses every caller.
+    Interactive callers go first: batch callers wait while one is waiting (in any process sharing
+    the state) and never dip into the last INTERACTIVE_RESERVE of a bucket.
+    """
+
+    def __init__(self, kind: str, rpm: Optional[float] = None, tpm: Optional[float] = None, state: Any = None):
+        self.kind = kind
+        self.rpm_cap = rpm
+        self.tpm_cap = tpm
+        self._state = state or _MemoryState()
+
+    async def _call(self, fn: Any, *args: Any) -> Any:
+        # File-backed state may block on another process's lock, so it is kept off the event loop.
+        if self._state.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _limits(self, state: Dict[str, float]) -> Tuple[Optional[float], Optional[float]]:
+        def combine(cap: Optional[float], learned: Optional[float]) -> Optional[float]:
+            values = [v for v in (cap, learned) if v]
+            return min(values) if values else None
+        return combine(self.rpm_cap, state.get("rpm")), combine(self.tpm_cap, state.get("tpm"))
+
+    def _refill(self, state: Dict[str, float], now: float) -> Tuple[Optional[float], Optional[float]]:
+        rpm, tpm = self._limits(state)
+        elapsed = max(0.0, now - state.get("updated", now))
+        for key, limit in (("requests", rpm), ("tokens", tpm)):
+            if limit:
+                state[key] = min(limit, state.get(key, limit) + elapsed * limit / 60.0)
+        state["updated"] = now
+        return rpm, tpm
+
+    def _try_take(self, tokens: int, priority: str) -> float:
+        """Take the quota and return 0, or return the seconds to wait before trying again."""
+        now = time.time()
+        with self._state.locked() as state:
+            rpm, tpm = self._refill(state, now)
+            cooldown = state.get("cooldown_until", 0.0) - now
+            if cooldown > 0:
+                return cooldown
+            if priority != "interactive" and state.get("interactive_until", 0.0) > now:
+                return state["interactive_until"] - now
+            reserve = 0.0 if priority == "interactive" else INTERACTIVE_RESERVE
+            needs = [(key, limit, min(need, limit * (1 - reserve))) for key, limit, need in
+                     (("requests", rpm, 1), ("tokens", tpm, tokens)) if limit]
+            wait = max([(need + reserve * limit - state[key]) * 60.0 / limit for key, limit, need in needs] or [0.0])
+            if wait > 0:
+                if priority == "interactive":
+                    # Renewed on every retry, so it lapses by itself once no interactive call waits.
+                    hold = now + min(wait, MAX_WAIT_STEP_S) + 0.1
+                    state["interactive_until"] = max(state.get("interactive_until", 0.0), hold)
+                return wait
+            for key, _, need in needs:
+                state[key] -= need
+            return 0.0
+
+    async def acquire(self, tokens: int = 0, priority: str = "batch") -> float:
+        """Wait until one request with `tokens` fits the quota; returns the seconds waited."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (expected one of {PRIORITIES})")
+        waited = 0.0
+        while True:
+            wait = await self._call(self._try_take, int(tokens), priority)
+            if wait <= 0:
+                break
+            step = min(wait, MAX_WAIT_STEP_S)
+            await asyncio.sleep(step)
+            waited += step
+        metrics = current_metrics()
+        if metrics and waited:
+            metrics.count("quota_wait_s", round(waited, 3))
+        return waited
+
+    async def settle(self, estimated: int, actual: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a call is known (refund if None)."""
+        await self._call(self._settle, estimated, actual)
+
+    def _settle(self, estimated: int, actual: Optional[int]) -> None:
+        with self._state.locked() as state:
+            if "tokens" in state:
+                state["tokens"] -= (actual or 0) - estimated
+
+    def observe(self, headers: Mapping[str, str], status: int) -> None:
+        """Adapt to a response's rate-limit headers (limits, remaining quota, 429 back-off)."""
+        now = time.time()
+        with self._state.locked() as state:
+            self._refill(state, now)
+            for unit, key in (("requests", "rpm"), ("tokens", "tpm")):
+                limit = _float(headers.get(f"x-ratelimit-limit-{unit}"))
+                if limit:
+                    state[key] = limit
+                    state.setdefault(unit, limit)
+                remaining = _float(headers.get(f"x-ratelimit-remaining-{unit}"))
+                if remaining is not None and unit in state:
+                    state[unit] = min(state[unit], remaining)
+            if status == 429:
+                # Buckets clamped to the remaining-* headers already wait for the refill; a bare
+                # 429 pauses for Retry-After, else the earliest reset, else a second.
+                pause = _float(headers.get("retry-after"))
+                if pause is None and not any(f"x-ratelimit-remaining-{u}" in headers for u in ("requests", "tokens")):
+                    resets = [_duration_s(headers.get(f"x-ratelimit-reset-{u}")) for u in ("requests", "tokens")]
+                    pause = min([r for r in resets if r], default=1.0)
+                if pause:
+                    state["cooldown_until"] = max(state.get("cooldown_until", 0.0), now + pause)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._state.locked() as state:
+            rpm, tpm = self._refill(state, time.time())
+            return {
+                "kind": self.kind,
+                "rpm": rpm,
+                "tpm": tpm,
+                "requests_available": round(state["requests"], 1) if "requests" in state else None,
+                "tokens_available": round(state["tokens"]) if "tokens" in state else None,
+            }
+
+
+_governors: Dict[str, QuotaGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(kind: str) -> QuotaGovernor:
+    """The process-wide governor for `kind` ("chat" | "embeddings")."""
+    if kind not in QUOTA_KINDS:
+        raise ValueError(f"Unknown quota kind '{kind}' (expected one of {QUOTA_KINDS})")
+    with _governors_lock:
+        governor = _governors.get(kind)
+        if governor is None:
+            quota_dir = os.getenv(QUOTA_DIR_ENV)
+            state = _FileState(Path(quota_dir) / f"{kind}.json") if quota_dir else None
+            governor = _governors[kind] = QuotaGovernor(kind, _env_limit(kind, "RPM"), _env_limit(kind, "TPM"), state)
+        return governor
+
+
+def _kind_of(path: str) -> Optional[str]:
+    if path.endswith("/embeddings"):
+        return "embeddings"
+    if path.endswith("/chat/completions"):
+        return "chat"
+    return None
+
+
+async def _observe_response(response: Any) -> None:
+    kind = _kind_of(response.request.url.path)
+    if kind:
+        governor = get_governor(kind)
+        await governor._call(governor.observe, response.headers, response.status_code)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_client_class() -> type:
+    import openai
+
+    class SharedAsyncHttpClient(openai.DefaultAsyncHttpxClient):
+        # Shared by every OpenAI client on the event loop, so closing one of them keeps the pool;
+        # the pool itself is closed when the loop shuts down (see _close_at_shutdown).
+        async def aclose(self) -> None:
+            pass
+
+        async def close_pool(self) -> None:
+            await super().aclose()
+
+    return SharedAsyncHttpClient
+
+
+async def _close_at_shutdown(client: Any):
+    # Parked at its first yield; asyncio.run() closes pending async generators when the loop shuts
+    # down, which runs the finally block on the loop that owns the connections.
+    try:
+        yield
+    finally:
+        await client.close_pool()
+
+
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_http_lock = threading.Lock()
+
+
+def shared_http_client() -> Any:
+    """
+    Connection pool for all OpenAI clients on the running event loop (None outside a loop), closed
+    when the loop shuts down. Every response passes through it, so the governors see all rate-limit
+    headers.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    with _http_lock:
+        client = _http_clients.get(loop)
+        if client is None:
+            client = _http_clients[loop] = _shared_client_class()(event_hooks={"response": [_observe_response]})
+            # The loop tracks async generators only weakly; the client keeps its closer alive.
+            client._closer = _close_at_shutdown(client)
+            asyncio.ensure_future(client._closer.__anext__())
+        return client
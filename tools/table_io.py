@@ -0,0 +1,72 @@
+import ast
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+# Columns holding Python lists; CSV stores them as reprs, Parquet as native list columns.
+LIST_COLUMNS = ("all_topics_discussed", "topic_cluster_ids")
+
+# Low-cardinality text columns stored dictionary-encoded (categorical) in Parquet.
+CATEGORICAL_COLUMNS = ("channel", "product", "state", "customer_sentiment", "general_topic_l1", "model_version")
+
+FILE_FORMATS = ("csv", "parquet")
+
+
+def resolve_path(path: str, file_format: str = "csv") -> str:
+    """Map a default `.csv` path to its `.parquet` sibling when `file_format` is "parquet"."""
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Unknown file_format '{file_format}' (expected one of {FILE_FORMATS})")
+    p = Path(path)
+    if file_format == "parquet" and p.suffix.lower() == ".csv":
+        return str(p.with_suffix(".parquet"))
+    return path
+
+
+def is_parquet(path: str) -> bool:
+    return Path(path).suffix.lower() in (".parquet", ".pq")
+
+
+def _to_list(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    return list(value)
+
+
+def read_table(
+    path: str,
+    columns: Optional[List[str]] = None,
+    list_columns: Iterable[str] = LIST_COLUMNS,
+) -> pd.DataFrame:
+    """
+    Read a CSV or Parquet intermediate (chosen by extension), optionally only `columns`.
+    List columns come back as Python lists either way, so callers never re-parse reprs.
+    """
+    if is_parquet(path):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+    for col in list_columns:
+        if col in df.columns:
+            df[col] = df[col].map(_to_list)
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str, list_columns: Iterable[str] = LIST_COLUMNS) -> None:
+    """Write `df` as Parquet (native list + categorical columns) or CSV (lists as reprs), by extension."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    out = df.copy(deep=False)
+    for col in list_columns:
+        if col in out.columns:
+            out[col] = out[col].map(_to_list)
+    if is_parquet(path):
+        for col in CATEGORICAL_COLUMNS:
+            if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+                out[col] = out[col].astype("category")
+        out.to_parquet(path, index=False)
+    else:
+        out.to_csv(path, index=False)
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+CANON_MODES = ("none", "normalize", "lemma")
+
+# Stored next to the cluster model, whose topic_to_cluster is keyed by the canonical phrases.
+INDEX_FILE = "topic_index.json"
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Dropped from lemma keys; negations are kept because they change the meaning of a topic.
+_STOPWORDS = {
+    "a", "an", "the", "of", "to", "for", "and", "or", "in", "on", "at", "by", "with", "about",
+    "from", "into", "is", "are", "was", "were", "be", "been", "being", "their", "its",
+}
+_IRREGULAR = {
+    "paid": "pay", "made": "make", "took": "take", "taken": "take", "gave": "give", "given": "give",
+    "got": "get", "gotten": "get", "lost": "lose", "sent": "send", "children": "child", "people": "person",
+    "better": "good", "best": "good", "worse": "bad", "worst": "bad",
+}
+_KEEP_S = ("ss", "us", "is", "ous")
+
+
+def normalize_topic(topic: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a topic phrase."""
+    text = unicodedata.normalize("NFKC", str(topic)).casefold()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _lemma(word: str) -> str:
+    """
+    Light rule-based lemmatizer (plural, -ed, -ing and trailing -e), so inflections of one
+    word share a key: delay / delays / delayed, charge / charged / charging.
+    """
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(_KEEP_S):
+        word = word[:-1]
+    if word.endswith("ing") and len(word) > 5:
+        word = word[:-3]
+    elif word.endswith("ied") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("ed") and len(word) > 4:
+        word = word[:-2]
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+        word = word[:-1]  # stopped -> stop, but keep bill / process
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def topic_key(topic: str, mode: str = "lemma") -> str:
+    """
+    Matching key of a topic phrase. "normalize" compares normalized text; "lemma" also drops
+    stopwords, lemmatizes and ignores word order, so "Delayed resolution" and "Resolution delay"
+    share a key.
+    """
+    normalized = normalize_topic(topic)
+    if mode != "lemma":
+        return normalized
+    words = [_lemma(w) for w in normalized.split() if w not in _STOPWORDS]
+    return " ".join(sorted(words)) or normalized
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _surface(topic: str) -> str:
+    text = " ".join(str(topic).split())
+    return text.strip(" .,;:!?-") or text
+
+
+def _pick_spelling(spellings: Counter) -> str:
+    """Most common spelling; ties prefer sentence / title case over all-caps or all-lowercase."""
+    return min(spellings, key=lambda s: (-spellings[s], s.isupper(), s.islower(), s))
+
+
+class TopicIndex:
+    """
+    Persisted alias -> canonical index of topic phrases.
+
+    - aliases   : every raw topic phrase seen so far -> its canonical phrase
+    - canonical : matching key -> canonical phrase (the most common spelling when the key was first seen)
+
+    Mappings are never changed once made, so topics keep their canonical phrase (and therefore
+    their cluster in delta runs) across runs.
+    """
+
+    def __init__(
+        self,
+        mode: str = "lemma",
+        aliases: Optional[Dict[str, str]] = None,
+        canonical: Optional[Dict[str, str]] = None,
+        updated_at: Optional[str] = None,
+    ):
+        if mode not in CANON_MODES:
+            raise ValueError(f"Unknown canonicalize mode '{mode}' (expected one of {CANON_MODES})")
+        self.mode = mode
+        self.aliases: Dict[str, str] = aliases or {}
+        self.canonical: Dict[str, str] = canonical or {}
+        self.updated_at = updated_at
+
+    def lookup(self, topic: str) -> str:
+        """Canonical phrase of `topic` without changing the index (the topic itself if unknown)."""
+        if self.mode == "none":
+            return topic
+        found = self.aliases.get(topic)
+        if found is None:
+            found = self.canonical.get(topic_key(topic, self.mode), topic)
+        return found
+
+    def update(self, topics: Iterable[str], fuzzy_threshold: Optional[float] = None) -> Dict[str, str]:
+        """
+        Map every topic in `topics` (with repeats; frequency picks the canonical spelling) to its
+        canonical phrase, adding new aliases and canonical phrases to the index.
+
+        With `fuzzy_threshold`, a new key whose character-trigram Jaccard similarity with an
+        existing key is at least the threshold joins that key's canonical phrase instead of
+        starting a new one (catches typos such as "claim procesing delay").
+        """
+        counts = Counter(topics)
+        if self.mode == "none":
+            return {t: t for t in counts}
+
+        new_keys: Dict[str, Counter] = {}
+        for topic, n in counts.items():
+            if topic not in self.aliases:
+                new_keys.setdefault(topic_key(topic, self.mode), Counter())[_surface(topic)] += n
+
+        # Frequent keys first, so they become the canonical phrases rare variants merge into.
+        order = sorted(new_keys, key=lambda k: (-sum(new_keys[k].values()), k))
+        fresh = [k for k in order if k not in self.canonical]
+        if fuzzy_threshold and fresh:
+            self._merge_fuzzy(fresh, new_keys, float(fuzzy_threshold))
+        for key in fresh:
+            if key not in self.canonical:
+                self.canonical[key] = _pick_spelling(new_keys[key])
+
+        for topic in counts:
+            if topic not in self.aliases:
+                self.aliases[topic] = self.canonical[topic_key(topic, self.mode)]
+        return {t: self.aliases[t] for t in counts}
+
+    def _merge_fuzzy(self, fresh: List[str], new_keys: Dict[str, Counter], threshold: float) -> None:
+        keys = list(self.canonical)
+        grams = [_trigrams(k) for k in keys]
+        postings: Dict[str, List[int]] = {}
+        for i, g in enumerate(grams):
+            for gram in g:
+                postings.setdefault(gram, []).append(i)
+
+        for key in fresh:
+            g = _trigrams(key)
+            shared = Counter(i for gram in g for i in postings.get(gram, ()))
+            best, best_score = None, threshold
+            for i, n in shared.items():
+                score = n / (len(g) + len(grams[i]) - n)
+                if score >= best_score:
+                    best, best_score = i, score
+            if best is not None:
+                self.canonical[key] = self.canonical[keys[best]]
+                continue
+            # A new canonical key; later (rarer) keys may merge into it.
+            self.canonical[key] = _pick_spelling(new_keys[key])
+            keys.append(key)
+            grams.append(g)
+            for gram in g:
+                postings.setdefault(gram, []).append(len(keys) - 1)
+
+    @property
+    def num_canonical(self) -> int:
+        return len(set(self.canonical.values()))
+
+    def save(self, model_dir: str) -> None:
+        path = Path(model_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        self.updated_at = datetime.now().isoformat(timespec="seconds")
+        meta = {"mode": self.mode, "updated_at": self.updated_at, "canonical": self.canonical, "aliases": self.aliases}
+        tmp = path / (INDEX_FILE + ".tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path / INDEX_FILE)
+
+    @staticmethod
+    def remove(model_dir: str) -> None:
+        """Delete the saved index, e.g. when a run without canonicalization replaces the model."""
+        (Path(model_dir) / INDEX_FILE).unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, model_dir: str, mode: Optional[str] = None) -> Optional["TopicIndex"]:
+        """The saved index, or None if there is none (or it was built with a different `mode`)."""
+        path = Path(model_dir) / INDEX_FILE
+        if not path.exists():
+            return None
+        meta = json.loads(path.read_text())
+        if mode is not None and meta.get("mode") != mode:
+            return None
+        return cls(meta["mode"], meta.get("aliases", {}), meta.get("canonical", {}), meta.get("updated_at"))
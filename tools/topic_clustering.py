@@ -1,20 +1,207 @@
-import ast
-from typing import Dict, Any, List
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
 
-import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from openai import AsyncOpenAI
+import pandas as pd
 from dotenv import load_dotenv
-import os 
+import os
+
+from tools.cluster_model import ClusterModel, model_dir_for
+from tools.embedding_store import EmbeddingStore, store_dir_for
+from tools.llm_utils import call_with_retries, estimate_tokens
+from tools.metrics import instrumented
+from tools.quota import shared_http_client
+from tools.table_io import read_table, resolve_path, write_table
+from tools.topic_canon import TopicIndex
+
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# OpenAI embeddings accept at most 2048 inputs and ~300k tokens per request.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+
+
+def _make_batches(topics: List[str], batch_size: int, max_batch_tokens: int) -> List[List[str]]:
+    """Split topics into batches that respect both the item and the token limit per request."""
+    batch_size = max(1, min(int(batch_size), MAX_INPUTS_PER_REQUEST))
+    max_batch_tokens = max(1, min(int(max_batch_tokens), MAX_TOKENS_PER_REQUEST))
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for topic in topics:
+        tokens = estimate_tokens(topic)
+        if current and (len(current) >= batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(topic)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def embed_missing_topics(
+    store: EmbeddingStore,
+    topics: List[str],
+    batch_size: int = 1000,
+    max_batch_tokens: int = 200_000,
+    max_concurrency: int = 4,
+    max_retries: int = 5,
+) -> int:
+    """
+    Embed the topics that are not in `store` yet, in size-limited concurrent batches,
+    and append them to the store as each batch completes. Returns the number embedded.
+    """
+    missing = store.missing(topics)
+    if not missing:
+        return 0
+
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=os.getenv('OPENAI_EMBEDDING_API_KEY'), max_retries=0, http_client=shared_http_client())
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+    async def embed_batch(batch: List[str]) -> None:
+        async with semaphore:
+            response = await call_with_retries(
+                lambda: client.embeddings.create(input=batch, model=store.model),
+                max_retries=max_retries,
+                quota="embeddings",
+                tokens=sum(estimate_tokens(t) for t in batch),
+            )
+        data = sorted(response.data, key=lambda item: item.index)
+        store.add(batch, np.array([item.embedding for item in data], dtype=np.float32))
+
+    try:
+        await asyncio.gather(*(embed_batch(b) for b in _make_batches(missing, batch_size, max_batch_tokens)))
+    finally:
+        await client.close()
+    return len(missing)
+
+
+async def cluster_topics(
+    df: pd.DataFrame,
+    topics_column: str = "all_topics_discussed",
+    num_clusters: int = 12,
+    embedding_store_dir: str = "data/cache/embeddings",
+    embedding_batch_size: int = 1000,
+    max_concurrency: int = 4,
+    delta: bool = False,
+    model_dir: str = "data/cache/cluster_model",
+    drift_threshold: float = 0.2,
+    engine: str = "auto",
+    reduce_dim: Optional[int] = None,
+    reduction: str = "pca",
+    k_selection: str = "silhouette",
+    max_clusters: int = 30,
+    canonicalize: str = "lemma",
+    fuzzy_threshold: Optional[float] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    In-memory Step 2: adds `topic_cluster_ids` to `df` (whose `topics_column` holds lists)
+    and returns it with the clustering stats. See TopicClustering for the options.
+    """
+    topics_series = df[topics_column]
+    # Aliases ("delayed resolution ", "Resolution delay") map to one canonical phrase, so each
+    # is embedded and clustered once. The index lives next to the model that is keyed by it.
+    index = TopicIndex.load(model_dir, canonicalize) or TopicIndex(canonicalize)
+    canonical = index.update((t for lst in topics_series for t in lst), fuzzy_threshold)
+    unique_topics: List[str] = sorted(set(canonical.values()))
 
+    store = EmbeddingStore(embedding_store_dir, EMBEDDING_MODEL)
+    model = ClusterModel.load(model_dir) if delta else None
+    if model is not None and model.embedding_model != EMBEDDING_MODEL:
+        model = None
+
+    # In delta mode only topics the saved model has never seen need embedding.
+    to_embed = [t for t in unique_topics if t not in model.topic_to_cluster] if model else unique_topics
+    embedded_new = await embed_missing_topics(
+        store,
+        to_embed,
+        batch_size=embedding_batch_size,
+        max_concurrency=max_concurrency,
+    )
+
+    mode = "full"
+    drift = None
+    clustering_info: Dict[str, Any] = {}
+    if model is not None:
+        new_ids, distances = model.assign(store.get(to_embed))
+        drift = model.drift(distances)
+        if drift <= drift_threshold:
+            mode = "delta"
+            model.topic_to_cluster.update({t: int(c) for t, c in zip(to_embed, new_ids)})
+        else:
+            mode = "refit"
+            embedded_new += await embed_missing_topics(
+                store, unique_topics, batch_size=embedding_batch_size, max_concurrency=max_concurrency
+            )
+
+    if mode != "delta":
+        from tools.clustering_engine import fit_clusters  # scikit-learn loads on the first fit
+
+        embeddings = store.get(unique_topics)
+        # CPU-bound; run off the event loop so concurrent tool calls are not blocked.
+        labels, clustering_info = await asyncio.to_thread(
+            fit_clusters,
+            embeddings,
+            num_clusters=num_clusters,
+            engine=engine,
+            reduce_dim=reduce_dim,
+            reduction=reduction,
+            k_selection=k_selection,
+            max_clusters=max_clusters,
+        )
+        model = ClusterModel.fit_from_assignments(unique_topics, embeddings, labels, EMBEDDING_MODEL)
+    model.save(model_dir)
+    if canonicalize != "none":
+        index.save(model_dir)
+    else:
+        # The model is now keyed by raw topics; an index from an earlier run would remap them.
+        TopicIndex.remove(model_dir)
+
+    topic_to_cluster = {t: model.topic_to_cluster[c] for t, c in canonical.items()}
+
+    df["topic_cluster_ids"] = topics_series.apply(lambda lst: [topic_to_cluster[t] for t in lst])
+
+    return df, {
+        "clusters": int(model.num_clusters),
+        "embedding_model": EMBEDDING_MODEL,
+        "raw_topics": int(len(canonical)),
+        "unique_topics": int(len(unique_topics)),
+        "topic_aliases_merged": int(len(canonical) - len(unique_topics)),
+        "embedded_new": int(embedded_new),
+        "embedding_cache_hits": int(max(0, len(to_embed if mode == "delta" else unique_topics) - embedded_new)),
+        "mode": mode,
+        "new_topics": int(len(to_embed)) if mode != "full" else int(len(unique_topics)),
+        "drift": None if drift is None else round(float(drift), 4),
+        "model_dir": model_dir,
+        **clustering_info,
+    }
+
+
+@instrumented("TopicClustering")
 async def TopicClustering(
     input_csv_path: str = "data/df_with_topics.csv",
     output_csv_path: str = "data/df_with_clusters.csv",
     topics_column: str = "all_topics_discussed",
     num_clusters: int = 12,
+    embedding_store_dir: Optional[str] = None,
+    embedding_batch_size: int = 1000,
+    max_concurrency: int = 4,
+    delta: bool = False,
+    model_dir: Optional[str] = None,
+    drift_threshold: float = 0.2,
+    engine: str = "auto",
+    reduce_dim: Optional[int] = None,
+    reduction: str = "pca",
+    k_selection: str = "silhouette",
+    max_clusters: int = 30,
+    canonicalize: str = "lemma",
+    fuzzy_threshold: Optional[float] = None,
+    file_format: str = "csv",
 ) -> Dict[str, Any]:
     """
     Step 2 tool: Cluster topic phrases across all rows using OpenAI embeddings + KMeans.
@@ -23,33 +210,59 @@ async def TopicClustering(
     - Clusters unique topic phrases into `num_clusters` groups using semantic embeddings.
     - Adds a new column `topic_cluster_ids` with the cluster id for each topic in the row.
     - Writes ONLY the updated dataframe to `output_csv_path`.
-    """
-    df = pd.read_csv(input_csv_path)
 
-    topics_series = df[topics_column].apply(ast.literal_eval)
-    unique_topics: List[str] = sorted({t for lst in topics_series for t in lst})
+    Embeddings are kept in a persistent float32 store under `embedding_store_dir` (default
+    `cache/embeddings/` next to the output); only topics not seen before are embedded, in concurrent
+    batches of at most `embedding_batch_size`.
 
-    client = AsyncOpenAI( api_key= os.getenv('OPENAI_EMBEDDING_API_KEY'))
-    response = await client.embeddings.create(
-        input=unique_topics,
-        model="text-embedding-3-small",
-    )
-    embeddings = np.array([item.embedding for item in response.data])
-    await client.close()
+    Every full fit is saved to `model_dir` (default `cache/cluster_model/` next to the output, so calls
+    writing to different directories never share a model): centroids, topic assignments, labels. With `delta=True`
+    known topics keep their cluster and new topics go to the nearest saved centroid; the model is
+    only refit when the share of new topics outside the fitted cluster radius exceeds `drift_threshold`.
 
-    kmeans = KMeans(n_clusters=num_clusters, random_state=0, n_init=10)
-    labels = kmeans.fit_predict(embeddings)
+    Clustering runs on float32 vectors. `engine` is "kmeans", "minibatch" (MiniBatchKMeans) or "auto"
+    (MiniBatchKMeans for large topic sets); `reduce_dim` optionally applies PCA / random projection
+    ("pca" | "random") first. Set `num_clusters=0` to pick k (up to `max_clusters`) by silhouette or
+    inertia elbow (`k_selection`) on a sample.
 
-    topic_to_cluster = {topic: int(label) for topic, label in zip(unique_topics, labels)}
+    Topic phrases are canonicalized first and only the canonical phrases are embedded and clustered:
+    `canonicalize="normalize"` merges case / whitespace / punctuation variants, `"lemma"` (default)
+    also lemmatizes and ignores stopwords and word order, `"none"` clusters the raw strings. With
+    `fuzzy_threshold` (e.g. 0.85) near-identical spellings are merged too. The alias -> canonical
+    index is saved as `topic_index.json` in `model_dir` and reused by later runs and ClusterLabelling.
 
-    df["topic_cluster_ids"] = topics_series.apply(lambda lst: [topic_to_cluster[t] for t in lst])
+    `file_format="parquet"` reads and writes the `.parquet` siblings of the default CSV paths.
+    """
+    input_csv_path = resolve_path(input_csv_path, file_format)
+    output_csv_path = resolve_path(output_csv_path, file_format)
+    model_dir = model_dir or model_dir_for(output_csv_path)
+    embedding_store_dir = embedding_store_dir or store_dir_for(output_csv_path)
+    df = await asyncio.to_thread(read_table, input_csv_path, list_columns=[topics_column])
 
-    df.to_csv(output_csv_path, index=False)
+    df, stats = await cluster_topics(
+        df,
+        topics_column=topics_column,
+        num_clusters=num_clusters,
+        embedding_store_dir=embedding_store_dir,
+        embedding_batch_size=embedding_batch_size,
+        max_concurrency=max_concurrency,
+        delta=delta,
+        model_dir=model_dir,
+        drift_threshold=drift_threshold,
+        engine=engine,
+        reduce_dim=reduce_dim,
+        reduction=reduction,
+        k_selection=k_selection,
+        max_clusters=max_clusters,
+        canonicalize=canonicalize,
+        fuzzy_threshold=fuzzy_threshold,
+    )
+
+    await asyncio.to_thread(write_table, df, output_csv_path)
 
     return {
         "status": "success",
-        "clusters": int(num_clusters),
+        "clusters": stats.pop("clusters"),
         "output_path": output_csv_path,
-        "embedding_model": "text-embedding-3-small",
-        "unique_topics": int(len(unique_topics)),
+        **stats,
     }
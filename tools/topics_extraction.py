@@ -1,102 +1,559 @@
+import asyncio
 import json
+import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 
 import pandas as pd
 from dotenv import load_dotenv
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_core.models import UserMessage, SystemMessage, ModelInfo
 
 from config.constants import MODEL_OPENAI
+from tools.batch_jobs import DEFAULT_BATCH_TIMEOUT_S, BatchPending, OfflineBatch, build_chat_request, get_batch_backend
+from tools.dedup import DEDUP_MODES, dedup_groups, relocate_quote
+from tools.llm_cache import LLMCache, make_cache_key
+from tools.llm_utils import call_with_retries, estimate_request_tokens, make_chat_client, parse_json_content
+from tools.local_cascade import LOCAL_MODEL_VERSION, LocalExtractor
+from tools.metrics import instrumented
+from tools.table_io import read_table, resolve_path, write_table
+
+if TYPE_CHECKING:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
 
 load_dotenv()
 
 
+EXTRACTION_PROMPT = (
+    "You extract a list of key topics or issues mentioned in each insurance customer survey comment. "
+    "Each topic should be concise yet descriptive, allowing a business user to understand what action might be needed. "
+    "A single survey response may contain multiple topics. "
+    "Return strict JSON only with keys: topics (array of 2-5 short phrases, 2-6 words each), "
+    "supporting_quote (<=160 chars, verbatim from text), reason (1-2 sentences), "
+    "sentiment (Negative|Neutral|Positive).\n"
+    "Example: \n"
+    "Survey: The claims process is confusing and slow. I waited weeks for resolution.\n"
+    "Topics: ['Confusing claims process', 'Long claim turnaround time']"
+)
+
+BATCH_EXTRACTION_PROMPT = (
+    EXTRACTION_PROMPT + "\n\n"
+    "You will receive a JSON array of survey responses, each with a survey_id and text. "
+    "Analyse every response independently and return strict JSON only, in the form "
+    "{\"results\": [{\"survey_id\": ..., \"topics\": [...], \"supporting_quote\": ..., \"reason\": ..., "
+    "\"sentiment\": ...}, ...]} with exactly one result per input survey_id, copied unchanged."
+)
+
+SENTIMENTS = ("Negative", "Neutral", "Positive")
+
+# Expected reply size per transcript (topics, quote, reason, sentiment), reserved from the
+# tokens-per-minute quota before each request and corrected with the reported usage.
+COMPLETION_TOKENS_PER_ROW = 150
+
+
+def _normalize_extraction(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Clean a parsed model reply into the topics/quote/reason/sentiment payload."""
+    topics = [str(t).strip() for t in data.get("topics", []) if str(t).strip()]
+    return {
+        "topics": list(dict.fromkeys(topics))[:5],
+        "supporting_quote": (data.get("supporting_quote") or "")[:160],
+        "reason": data.get("reason") or "",
+        "sentiment": data.get("sentiment") or "Neutral",
+    }
+
+
+def _extraction_user_message(raw_text: str) -> str:
+    return f"Extract topics in strict JSON.\nText: {raw_text}"
+
+
+async def _extract_one(
+    client: "OpenAIChatCompletionClient",
+    raw_text: str,
+    semaphore: asyncio.Semaphore,
+    max_retries: int,
+) -> Dict[str, Any]:
+    from autogen_core.models import SystemMessage, UserMessage
+
+    messages = [
+        SystemMessage(content=EXTRACTION_PROMPT),
+        UserMessage(content=_extraction_user_message(raw_text), source="user"),
+    ]
+    async with semaphore:
+        result = await call_with_retries(
+            lambda: client.create(messages), max_retries=max_retries,
+            quota="chat", tokens=estimate_request_tokens(messages, COMPLETION_TOKENS_PER_ROW),
+        )
+    return _normalize_extraction(parse_json_content(result.content))
+
+
+def _valid_batch_item(item: Any) -> bool:
+    """A batched result is usable if it has at least one topic and a known sentiment."""
+    if not isinstance(item, dict) or not isinstance(item.get("topics"), list):
+        return False
+    topics = [t for t in item["topics"] if str(t).strip()]
+    return bool(topics) and item.get("sentiment", "Neutral") in SENTIMENTS
+
+
+async def _extract_batch(
+    client: "OpenAIChatCompletionClient",
+    items: Dict[str, str],
+    semaphore: asyncio.Semaphore,
+    max_retries: int,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract several transcripts (`{survey_id: text}`) in one JSON-mode request.
+    Returns only the ids that came back well-formed; the caller retries the rest one by one.
+    """
+    from autogen_core.models import SystemMessage, UserMessage
+
+    payload = json.dumps([{"survey_id": sid, "text": text} for sid, text in items.items()], ensure_ascii=False)
+    messages = [
+        SystemMessage(content=BATCH_EXTRACTION_PROMPT),
+        UserMessage(content=f"Extract topics for each survey response in strict JSON.\nResponses: {payload}", source="user"),
+    ]
+    async with semaphore:
+        result = await call_with_retries(
+            lambda: client.create(messages, json_output=True), max_retries=max_retries,
+            quota="chat", tokens=estimate_request_tokens(messages, COMPLETION_TOKENS_PER_ROW * len(items)),
+        )
+    try:
+        data = parse_json_content(result.content)
+    except ValueError:
+        return {}
+    rows = data.get("results") if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        return {}
+    parsed: Dict[str, Dict[str, Any]] = {}
+    for item in rows:
+        sid = str(item.get("survey_id")) if isinstance(item, dict) else None
+        if sid in items and sid not in parsed and _valid_batch_item(item):
+            parsed[sid] = _normalize_extraction(item)
+    return parsed
+
+
+def _batch_ids(keys: List[str], ids: List[str], misses: Dict[str, str]) -> Dict[str, str]:
+    """Map each missed cache key to a unique request id, preferring the row's survey_id."""
+    out: Dict[str, str] = {}
+    used = set()
+    for key, sid in zip(keys, ids):
+        if key not in misses or key in out:
+            continue
+        candidate, n = sid or "row", 1
+        while candidate in used:
+            n += 1
+            candidate = f"{sid or 'row'}-{n}"
+        used.add(candidate)
+        out[key] = candidate
+    return out
+
+
+async def _enrich_frame(
+    df: pd.DataFrame,
+    client: "OpenAIChatCompletionClient",
+    cache: Optional[LLMCache],
+    text_column: str,
+    semaphore: asyncio.Semaphore,
+    max_retries: int,
+    batch_size: int = 1,
+    id_column: str = "survey_id",
+    offline: Optional[OfflineBatch] = None,
+    dedup: str = "exact",
+    near_threshold: float = 0.9,
+    local: Optional[LocalExtractor] = None,
+    local_threshold: float = 0.9,
+) -> Dict[str, int]:
+    """
+    Adds the topic/quote/reasoning/sentiment columns to `df` in place.
+    Only transcripts missing from `cache` are sent to the model; returns hit/miss counts.
+
+    Rows are first grouped by `dedup_groups` (`dedup` = "none", "exact" or "near"); every row is
+    keyed by its group representative's transcript, so one extraction per group is requested and
+    fanned back out to all members (with the supporting quote re-located in each member's text).
+
+    With `local`, uncached transcripts are first scored by the local classifier; those at or above
+    `local_threshold` confidence are answered locally (model_version LOCAL_MODEL_VERSION, not
+    cached) and only the rest go to the LLM.
+
+    With `batch_size` > 1, misses are packed `batch_size` per request, keyed by `id_column`;
+    ids that come back missing or malformed are re-extracted with one request each.
+
+    With `offline`, the misses are submitted as one batch job (custom_id = `id_column`) and joined
+    back by custom_id; rows the batch failed or returned malformed are retried synchronously.
+    """
+    texts = [str(v) for v in df[text_column].fillna("")] if text_column in df.columns else [""] * len(df)
+    rep, dedup_stats = await asyncio.to_thread(dedup_groups, texts, dedup, near_threshold)
+    row_texts, texts = texts, [texts[r] for r in rep]
+    # Single, batched and offline requests share cache entries: they return the same per-transcript
+    # payload, so a batched run reuses single-row results and vice versa. The key covers both
+    # prompts, so editing either one invalidates every entry.
+    keys = [make_cache_key("topic_extraction", EXTRACTION_PROMPT, BATCH_EXTRACTION_PROMPT, MODEL_OPENAI, t) for t in texts]
+
+    cached: Dict[str, Dict[str, Any]] = cache.get_many(keys) if cache else {}
+    # Identical transcripts share a key, so each distinct miss is sent once.
+    misses = {k: t for k, t in zip(keys, texts) if k not in cached}
+    process_times: Dict[str, str] = {}
+    calls = {"api_calls": 0, "batched_requests": 0, "individual_retries": 0, "offline_requests": 0}
+
+    local_keys = set()
+    if local is not None and misses:
+        predicted = await asyncio.to_thread(local.predict, list(misses.values()), local_threshold)
+        local_time = datetime.now().isoformat(timespec="seconds")
+        for key, payload in zip(list(misses), predicted):
+            if payload is not None:
+                cached[key] = payload
+                process_times[key] = local_time
+                local_keys.add(key)
+                del misses[key]
+
+    def store(key: str, payload: Dict[str, Any]) -> None:
+        cached[key] = payload
+        process_times[key] = datetime.now().isoformat(timespec="seconds")
+        if cache:
+            cache.put(key, payload)
+
+    async def run_one(key: str, text: str) -> None:
+        calls["api_calls"] += 1
+        store(key, await _extract_one(client, text, semaphore, max_retries))
+
+    async def run_batch(batch: List[Tuple[str, str]]) -> None:
+        calls["api_calls"] += 1
+        calls["batched_requests"] += 1
+        try:
+            parsed = await _extract_batch(client, {sid: misses[key] for key, sid in batch}, semaphore, max_retries)
+        except Exception:
+            # E.g. a non-retryable 400 for a batch over the context length: extract its rows one by one.
+            parsed = {}
+        retry = [key for key, sid in batch if sid not in parsed]
+        for key, sid in batch:
+            if sid in parsed:
+                store(key, parsed[sid])
+        calls["individual_retries"] += len(retry)
+        await _gather_all(run_one(key, misses[key]) for key in retry)
+
+    if offline is not None and misses:
+        row_ids = [str(v) for v in df[id_column]] if id_column in df.columns else [""] * len(df)
+        custom_ids = _batch_ids(keys, row_ids, misses)
+        requests = [
+            build_chat_request(cid, EXTRACTION_PROMPT, _extraction_user_message(misses[key]))
+            for key, cid in custom_ids.items()
+        ]
+        replies = await offline.run("topic_extraction", requests)
+        calls["offline_requests"] += len(requests)
+        retry = []
+        for key, cid in custom_ids.items():
+            try:
+                item = parse_json_content(replies[cid]) if replies.get(cid) else None
+            except ValueError:
+                item = None
+            if _valid_batch_item(item):
+                store(key, _normalize_extraction(item))
+            else:
+                retry.append(key)
+        calls["individual_retries"] += len(retry)
+        await _gather_all(run_one(key, misses[key]) for key in retry)
+    elif batch_size > 1 and len(misses) > 1:
+        row_ids = [str(v) for v in df[id_column]] if id_column in df.columns else [""] * len(df)
+        request_ids = list(_batch_ids(keys, row_ids, misses).items())
+        batches = [request_ids[i:i + batch_size] for i in range(0, len(request_ids), batch_size)]
+        await _gather_all(run_batch(b) for b in batches)
+    else:
+        await _gather_all(run_one(k, t) for k, t in misses.items())
+
+    run_time = datetime.now().isoformat(timespec="seconds")
+    results: List[Dict[str, Any]] = [cached[k] for k in keys]
+
+    # Add columns
+    df["all_topics_discussed"] = [r["topics"] for r in results]
+    # A member whose transcript differs from its representative's gets the quote re-located in its own text.
+    df["supporting_quote"] = [
+        r["supporting_quote"] if own == t else relocate_quote(r["supporting_quote"], own)
+        for r, own, t in zip(results, row_texts, texts)
+    ]
+    df["ai_topic_reasoning"] = [r["reason"] for r in results]
+    df["customer_sentiment"] = [r["sentiment"] for r in results]
+    df["process_time"] = [process_times.get(k, run_time) for k in keys]
+    df["model_version"] = [LOCAL_MODEL_VERSION if k in local_keys else MODEL_OPENAI for k in keys]
+
+    row_misses = sum(1 for k in keys if k in misses)
+    local_rows = sum(1 for k in keys if k in local_keys)
+    return {
+        "cache_hits": len(keys) - row_misses - local_rows,
+        "cache_misses": row_misses,
+        "local_rows": local_rows,
+        **calls,
+        **dedup_stats,
+    }
+
+
+async def _gather_all(coros) -> None:
+    # Let every request finish (and land in the cache) before surfacing the first failure.
+    outcomes = await asyncio.gather(*coros, return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+
+async def extract_topics(
+    df: pd.DataFrame,
+    text_column: str = "call_transcrpt",
+    max_concurrency: int = 8,
+    max_retries: int = 5,
+    use_cache: bool = True,
+    cache_path: str = "data/cache/llm_cache.sqlite",
+    batch_size: int = 1,
+    id_column: str = "survey_id",
+    offline: Optional[OfflineBatch] = None,
+    dedup: str = "exact",
+    near_threshold: float = 0.9,
+    local_model_path: Optional[str] = None,
+    local_threshold: float = 0.9,
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    In-memory Step 1: returns `df` with the extraction columns added, plus cache/API/dedup counts.
+    Pass an `OfflineBatch` to send the uncached transcripts through a batch job instead, and
+    `local_model_path` to answer confident rows with the local classifier first.
+    """
+    local = LocalExtractor.load(local_model_path) if local_model_path else None
+    client = make_chat_client()
+    cache = LLMCache(cache_path) if use_cache else None
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+    try:
+        stats = await _enrich_frame(
+            df, client, cache, text_column, semaphore, max_retries, int(batch_size), id_column, offline,
+            dedup, near_threshold, local, local_threshold,
+        )
+    finally:
+        await client.close()
+        if cache:
+            cache.close()
+    return df, stats
+
+
+def _checkpoint_path(output_csv_path: str) -> str:
+    return f"{output_csv_path}.checkpoint.json"
+
+
+def _load_checkpoint(output_csv_path: str) -> Optional[Dict[str, Any]]:
+    path = _checkpoint_path(output_csv_path)
+    if not os.path.exists(path) or not os.path.exists(output_csv_path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    return None if checkpoint.get("completed") else checkpoint
+
+
+def _save_checkpoint(output_csv_path: str, checkpoint: Dict[str, Any]) -> None:
+    # Write-then-rename so a crash never leaves a half-written checkpoint.
+    path = _checkpoint_path(output_csv_path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+# TopicExtraction flow (see the README for details): transcripts are grouped by `dedup_groups`,
+# looked up in the LLM cache, optionally answered by the local cascade, and the rest are sent one
+# per request, `batch_size` per request (ids missing or malformed in a reply are retried singly)
+# or as one offline batch job joined back by custom_id. Streaming mode appends each finished chunk
+# (always as CSV) and records the last completed id in `<output>.checkpoint.json`; delta mode
+# keeps the existing output rows and appends the new surveys.
+@instrumented("TopicExtraction")
 async def TopicExtraction(
     input_csv_path: str = "data/input.csv",
     output_csv_path: str = "data/df_with_topics.csv",
     text_column: str = "call_transcrpt",
+    max_concurrency: int = 8,
+    max_retries: int = 5,
+    use_cache: bool = True,
+    cache_path: str = "data/cache/llm_cache.sqlite",
+    chunk_size: Optional[int] = None,
+    resume: bool = True,
+    id_column: str = "survey_id",
+    delta: bool = False,
+    file_format: str = "csv",
+    batch_size: int = 1,
+    offline_backend: Optional[str] = None,
+    batch_job_dir: str = "data/batch",
+    poll_interval: float = 30.0,
+    batch_timeout_s: Optional[float] = DEFAULT_BATCH_TIMEOUT_S,
+    dedup: str = "exact",
+    near_threshold: float = 0.9,
+    local_model_path: Optional[str] = None,
+    local_threshold: float = 0.9,
 ) -> Dict[str, Any]:
     """
     Reads the survey CSV, calls an LLM per row to extract topics, and writes an intermediate CSV
     with new columns for topics, supporting quote, reasoning, and sentiment.
 
+    - text_column: column holding the transcripts; id_column: unique survey id.
+    - max_concurrency / max_retries: requests in flight at once; retries of rate limits and 5xx errors.
+    - use_cache / cache_path: reuse results cached on disk for unchanged transcripts.
+    - chunk_size / resume: process the input in chunks, checkpointed, and continue after a crash.
+    - delta: only extract surveys whose id is not in the existing output yet.
+    - file_format: "csv" or "parquet".
+    - batch_size: transcripts sent per request.
+    - offline_backend ("openai" | "local") / batch_job_dir / poll_interval / batch_timeout_s: send
+      uncached rows as one batch job; returns status "pending" if it is still running after
+      batch_timeout_s, and calling again with the same input collects it.
+    - dedup ("exact" | "near" | "none") / near_threshold: extract duplicate transcripts once.
+    - local_model_path / local_threshold: answer confident rows with the local classifier (a model
+      saved under data/cache/).
     """
-    df = pd.read_csv(input_csv_path)
-    
-    prompt = (
-        "You extract a list of key topics or issues mentioned in each insurance customer survey comment. "
-        "Each topic should be concise yet descriptive, allowing a business user to understand what action might be needed. "
-        "A single survey response may contain multiple topics. "
-        "Return strict JSON only with keys: topics (array of 2-5 short phrases, 2-6 words each), "
-        "supporting_quote (<=160 chars, verbatim from text), reason (1-2 sentences), "
-        "sentiment (Negative|Neutral|Positive).\n"
-        "Example: \n"
-        "Survey: The claims process is confusing and slow. I waited weeks for resolution.\n"
-        "Topics: ['Confusing claims process', 'Long claim turnaround time']"
-    )
-
-    topics_list: List[List[str]] = []
-    quotes: List[str] = []
-    reasons: List[str] = []
-    sentiments: List[str] = []
-    process_times: List[str] = []
-    model_versions: List[str] = []
-
-    client = OpenAIChatCompletionClient(
-        model=MODEL_OPENAI,
-        model_info=ModelInfo(vision=False, function_calling=True, json_output=True, structured_output=True, family="openai"),
-    )
+    if delta and chunk_size:
+        raise ValueError("delta mode reads the existing output in full; it cannot be combined with chunk_size")
+    if chunk_size and file_format != "csv":
+        raise ValueError("streaming mode (chunk_size) appends CSV; use file_format='csv'")
+    if offline_backend and (chunk_size or batch_size > 1):
+        raise ValueError("offline batch mode submits one job for the whole input; it cannot be combined with chunk_size or batch_size")
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode '{dedup}' (expected one of {DEDUP_MODES})")
+    output_csv_path = resolve_path(output_csv_path, file_format)
+    local = LocalExtractor.load(local_model_path) if local_model_path else None
+    offline = None
+    if offline_backend:
+        offline = OfflineBatch(
+            get_batch_backend(offline_backend, batch_job_dir), batch_job_dir, poll_interval, batch_timeout_s
+        )
+
+    client = make_chat_client()
+    cache = LLMCache(cache_path) if use_cache else None
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+    stats = {
+        "cache_hits": 0, "cache_misses": 0, "api_calls": 0,
+        "batched_requests": 0, "individual_retries": 0, "offline_requests": 0,
+        "distinct_transcripts": 0, "duplicate_groups": 0, "deduplicated_rows": 0, "near_duplicate_rows": 0,
+        "local_rows": 0,
+    }
     try:
-        for _, row in df.iterrows():
-            raw_text = str(row.get(text_column, ""))
-
-            messages = [
-                SystemMessage(content=prompt),
-                UserMessage(content=f"Extract topics in strict JSON.\nText: {raw_text}", source="user"),
-            ]
-
-            result = await client.create(messages)
-            content = result.content if isinstance(result.content, str) else "{}"
-            
-            # Strip markdown code fences if present
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-            data = json.loads(content)
-           
-            topics = [str(t).strip() for t in data.get("topics", []) if str(t).strip()]
-            topics = list(dict.fromkeys(topics))[:5]
-
-            topics_list.append(topics)
-            quotes.append((data.get("supporting_quote") or "")[:160])
-            reasons.append(data.get("reason") or "")
-            sentiments.append(data.get("sentiment") or "Neutral")
-            process_times.append(datetime.now().isoformat(timespec="seconds"))
-            model_versions.append(MODEL_OPENAI)
+        if chunk_size:
+            streamed = await _extract_streaming(
+                input_csv_path, output_csv_path, text_column, int(chunk_size), resume, id_column,
+                client, cache, semaphore, max_retries, stats, int(batch_size), dedup, near_threshold,
+                local, local_threshold,
+            )
+        else:
+            # File I/O runs in worker threads so concurrent tool calls on the server keep going.
+            df = await asyncio.to_thread(read_table, input_csv_path)
+            existing = None
+            if delta and os.path.exists(output_csv_path):
+                existing = await asyncio.to_thread(read_table, output_csv_path)
+                df = df[~df[id_column].astype(str).isin(existing[id_column].astype(str))].copy()
+            enriched = await _enrich_frame(
+                df, client, cache, text_column, semaphore, max_retries, int(batch_size), id_column, offline,
+                dedup, near_threshold, local, local_threshold,
+            )
+            for k, v in enriched.items():
+                stats[k] += v
+            new_rows = len(df)
+            if existing is not None:
+                df = pd.concat([existing, df], ignore_index=True)
+            await asyncio.to_thread(write_table, df, output_csv_path)
+            streamed = {"rows": int(len(df))}
+            if delta:
+                streamed["new_rows"] = int(new_rows)
+        extracted_rows = stats["cache_hits"] + stats["cache_misses"] + stats["local_rows"]
+    except BatchPending as pending:
+        return {
+            "status": "pending",
+            "batch_id": pending.batch_id,
+            "job_file": pending.job_file,
+            "output_path": output_csv_path,
+            "message": "Batch submitted and still running; call TopicExtraction again with the same input to collect it.",
+        }
     finally:
         await client.close()
-
-    # Add columns
-    df["all_topics_discussed"] = topics_list
-    df["supporting_quote"] = quotes
-    df["ai_topic_reasoning"] = reasons
-    df["customer_sentiment"] = sentiments
-    df["process_time"] = process_times
-    df["model_version"] = model_versions
-
-    df.to_csv(output_csv_path, index=False)
+        if offline:
+            await offline.backend.close()
+        if cache:
+            cache.close()
 
     return {
         "status": "success",
-        "rows": int(len(df)),
+        **streamed,
         "output_path": output_csv_path,
         "model": MODEL_OPENAI,
+        "max_concurrency": int(max_concurrency),
+        "batch_size": int(batch_size),
+        **{k: int(v) for k, v in stats.items()},
+        **({"local_fraction": round(stats["local_rows"] / max(1, extracted_rows), 4)} if local else {}),
     }
 
+
+async def _extract_streaming(
+    input_csv_path: str,
+    output_csv_path: str,
+    text_column: str,
+    chunk_size: int,
+    resume: bool,
+    id_column: str,
+    client: "OpenAIChatCompletionClient",
+    cache: Optional[LLMCache],
+    semaphore: asyncio.Semaphore,
+    max_retries: int,
+    stats: Dict[str, int],
+    batch_size: int = 1,
+    dedup: str = "exact",
+    near_threshold: float = 0.9,
+    local: Optional[LocalExtractor] = None,
+    local_threshold: float = 0.9,
+) -> Dict[str, Any]:
+    """Chunked extraction that appends to `output_csv_path` and checkpoints after every chunk."""
+    checkpoint = _load_checkpoint(output_csv_path) if resume else None
+    if checkpoint and checkpoint.get("input_path") != input_csv_path:
+        raise ValueError(
+            f"Checkpoint for {output_csv_path} was written for {checkpoint.get('input_path')}, not {input_csv_path}"
+        )
+    if checkpoint:
+        # Drop anything appended after the last checkpoint (e.g. a chunk interrupted mid-write).
+        with open(output_csv_path, "r+b") as f:
+            f.truncate(int(checkpoint["output_bytes"]))
+    else:
+        checkpoint = {"input_path": input_csv_path, "rows_done": 0, "last_survey_id": None, "output_bytes": 0}
+        if os.path.exists(output_csv_path):
+            os.remove(output_csv_path)
+
+    rows_to_skip = int(checkpoint["rows_done"])
+    resumed_from = checkpoint["last_survey_id"] if rows_to_skip else None
+    rows_seen = 0
+    rows_processed = 0
+
+    reader = pd.read_csv(input_csv_path, chunksize=chunk_size)
+    while (chunk := await asyncio.to_thread(next, reader, None)) is not None:
+        start = rows_seen
+        rows_seen += len(chunk)
+        if start < rows_to_skip:
+            if rows_seen >= rows_to_skip and id_column in chunk.columns:
+                last = chunk.iloc[rows_to_skip - start - 1][id_column]
+                if str(last) != str(resumed_from):
+                    raise ValueError(
+                        f"Checkpoint expects {id_column}={resumed_from} at row {rows_to_skip}, found {last}; "
+                        "the input changed since the checkpoint was written (rerun with resume=False)."
+                    )
+            if rows_seen <= rows_to_skip:
+                continue
+            chunk = chunk.iloc[rows_to_skip - start:]
+
+        chunk = chunk.copy()
+        enriched = await _enrich_frame(
+            chunk, client, cache, text_column, semaphore, max_retries, batch_size, id_column,
+            dedup=dedup, near_threshold=near_threshold, local=local, local_threshold=local_threshold,
+        )
+        for k, v in enriched.items():
+            stats[k] += v
+
+        write_header = checkpoint["output_bytes"] == 0
+        await asyncio.to_thread(chunk.to_csv, output_csv_path, mode="a", header=write_header, index=False)
+
+        checkpoint["rows_done"] = rows_seen
+        checkpoint["last_survey_id"] = str(chunk.iloc[-1][id_column]) if id_column in chunk.columns else None
+        checkpoint["output_bytes"] = os.path.getsize(output_csv_path)
+        _save_checkpoint(output_csv_path, checkpoint)
+        rows_processed += len(chunk)
+
+    checkpoint["completed"] = True
+    _save_checkpoint(output_csv_path, checkpoint)
+
+    return {
+        "rows": int(checkpoint["rows_done"]),
+        "rows_processed": int(rows_processed),
+        "resumed_from": resumed_from,
+        "checkpoint_path": _checkpoint_path(output_csv_path),
+    }